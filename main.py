@@ -3,7 +3,6 @@
 Main entry point for Mizuki Bot.
 """
 
-import asyncio
 import os
 import logging
 import sys
@@ -14,16 +13,28 @@ load_dotenv()
 # Ensure the project root is in the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from src.bot.core.bot import Bot
+from src.bot.core.cluster import ClusterLauncher
 from src.bot.utils.logger import setup_logger
+from src.bot.utils.performance import profile
 
 async def main():
     setup_logger()
     logger = logging.getLogger(__name__)
 
     try:
+        cluster_count = int(os.getenv("CLUSTER_COUNT", "1"))
+        shard_count = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None
+
+        if cluster_count > 1:
+            # One worker process per cluster, each running a slice of the shards
+            logger.info(f"Starting Mizuki Bot in cluster mode ({cluster_count} processes)...")
+            await ClusterLauncher(cluster_count, shard_count).run()
+            return
+
         logger.info("Starting Mizuki Bot...")
-        bot = Bot()
+        # Imported lazily so the cluster launcher never loads discord.py plugins
+        from src.bot.core.bot import Bot
+        bot = Bot(shard_count=shard_count)
         await bot.start()
 
     except KeyboardInterrupt:
@@ -33,4 +44,5 @@ async def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # PERFORMANCE_PROFILE picks the event loop and GC settings
+    profile.run(main())
@@ -1,42 +1,188 @@
+import asyncio
 import discord
 from discord.ext import commands
 import logging
+import math
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from src.bot.core.cluster import ClusterClient
+from src.bot.core.command_sync import CommandSyncer
+from src.bot.core.command_tree import MizukiCommandTree, ResponseTimer
+from src.bot.core.events import EventBus, EventHandler
+from src.bot.core.gateway_recorder import GatewayRecorder
+from src.bot.core.ingest import MemberIngestor
+from src.bot.core.outbound import OutboundScheduler
 from src.bot.core.plugin_manager import PluginManager
+from src.bot.core.plugin_watcher import PluginWatcher
+from src.bot.core.prefix import PrefixResolver
+from src.bot.core.scheduler import Scheduler
+from src.bot.core.watchdog import LoopWatchdog
+from src.bot.utils.cache import ResponseCache
 from src.bot.utils.database import db
+from src.bot.utils.performance import profile
+from src.bot.utils.ratelimit import RateLimiter
 
-class Bot(commands.Bot):
-
-    def __init__(self):
-        intents = discord.Intents.all()
-
-        super().__init__(
-            command_prefix= os.getenv("DISCORD_PREFIX"),
-            intents=intents,
-            case_insensitive=True
-        )
+class Bot(commands.AutoShardedBot):
 
+    def __init__(self, shard_ids: Optional[List[int]] = None, shard_count: Optional[int] = None,
+                 cluster: Optional[ClusterClient] = None):
         self.logger = logging.getLogger("mizuki")
+        # Rendered responses of read-only commands, invalidated on plugin changes
+        self.response_cache = ResponseCache()
+        # One discord.py listener per event, routed to filtered plugin handlers
+        self.events = EventBus(self)
         # Primary plugin manager instance (kept as `plugins` for internal use)
         self.plugins = PluginManager(self)
         # Backwards-compatible alias: some plugins expect `bot.plugin_manager`
         # so provide the same instance under that name.
         self.plugin_manager = self.plugins
+        # Per-guild prefixes served from an in-memory cache of `guilds.prefix`
+        self.prefixes = PrefixResolver()
+        # Command rate limits shared by every plugin
+        self.rate_limiter = RateLimiter()
+        # Prioritised, edit-coalescing REST dispatch for plugin responses
+        self.outbound = OutboundScheduler()
+        # Interval, cron and delayed jobs of every plugin on a single timer
+        self.scheduler = Scheduler()
+        # Event loop lag and the stacks of whatever blocks the loop
+        self.watchdog = LoopWatchdog()
+
+        # Time to first response of slash commands, from the HTTP trace of the client session
+        self.response_timer = ResponseTimer()
+
+        # Optional copy of guild member lists into the users table
+        self.ingestor = MemberIngestor(self)
+
+        # Only request the intents and caches the plugins declare
+        self.cache_policy = self.plugins.resolve_cache_policy()
+        if self.ingestor.enabled:
+            # Privileged: must also be enabled for the application in the developer portal
+            self.cache_policy["intents"].members = True
+        self._cache_report_logged = False
+        self.logger.info(
+            f"Cache policy: intents={[name for name, enabled in self.cache_policy['intents'] if enabled]}, "
+            f"member_cache={[name for name, enabled in self.cache_policy['member_cache_flags'] if enabled]}, "
+            f"chunk_guilds={self.cache_policy['chunk_guilds_at_startup']}, "
+            f"max_messages={self.cache_policy['max_messages']}"
+        )
+
+        # Without explicit shards discord.py asks Discord for the recommended count
+        if shard_count is None and os.getenv("SHARD_COUNT"):
+            shard_count = int(os.getenv("SHARD_COUNT"))
+
+        super().__init__(
+            command_prefix=self.prefixes,
+            intents=self.cache_policy["intents"],
+            member_cache_flags=self.cache_policy["member_cache_flags"],
+            chunk_guilds_at_startup=self.cache_policy["chunk_guilds_at_startup"],
+            max_messages=self.cache_policy["max_messages"],
+            case_insensitive=True,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
+            tree_cls=MizukiCommandTree,
+            http_trace=self.response_timer.trace_config()
+        )
+
+        # Optional recording of raw gateway events for offline replay (GATEWAY_RECORD)
+        self.recorder = GatewayRecorder.from_env()
+        if self.recorder:
+            self.recorder.install(self._connection)
+
+        # Optional file watcher that hot-reloads edited plugins
+        self.plugin_watcher: Optional[PluginWatcher] = None
+        # Skips slash command syncs when the command tree is unchanged
+        self.command_sync = CommandSyncer(self)
+        # IPC link to the cluster launcher when running as one of several processes
+        self.cluster = cluster
+        self._cluster_task: Optional[asyncio.Task] = None
 
     async def setup_hook(self):
         self.logger.info(f"Setup hook called")
+        profile.report()
+        # Started first so blocking plugin imports and setup are caught too
+        self.watchdog.start()
         
-        # Connect to database
-        db_connected = await db.connect()
-        if db_connected:
-            # Initialize tables
-            await db.init_tables()
-        else:
-            self.logger.warning("Bot starting without database connection")
+        # Connect to database; if it is down, keep retrying in the background
+        # and initialize the tables once it comes up
+        db.add_connect_callback(self._on_database_connected)
+        if not await db.connect(retry=True):
+            self.logger.warning("Bot starting without database connection, retrying in the background")
         
         await self.plugins.load_plugins()
         self.logger.info("Successfully loaded plugins")
+        self.rate_limiter.start()
+        self.scheduler.start()
+        if db.connected:
+            await self.scheduler.load_persisted()
+
+        if self.ingestor.enabled:
+            self.events.add(EventHandler("on_ready", self.ingestor.on_ready, "Bot"))
+            self.events.add(EventHandler("on_guild_join", self.ingestor.on_guild_join, "Bot"))
+
+        if os.getenv("PLUGIN_HOT_RELOAD", "").lower() in ("1", "true", "yes"):
+            self.plugin_watcher = PluginWatcher(self.plugins)
+            self.plugin_watcher.start()
+
+        if self.cluster and await self.cluster.connect():
+            self._cluster_task = asyncio.create_task(self._publish_cluster_stats(), name="cluster-stats")
+
+    async def _on_database_connected(self):
+        await db.init_tables()
+        await self.prefixes.warm()
+        # Persisted jobs of plugins loaded before the database came up
+        await self.scheduler.load_persisted()
+
+    async def _publish_cluster_stats(self):
+        interval = float(os.getenv("CLUSTER_STATS_INTERVAL", "15"))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.cluster.publish(self.shard_stats())
+            except Exception as e:
+                self.logger.warning(f"Failed to publish cluster stats: {e}")
+
+    def shard_stats(self) -> Dict[str, Any]:
+        """Snapshot of this process: per-shard latency and guild counts"""
+        shards = {}
+        for shard_id, latency in self.latencies:
+            shards[shard_id] = {
+                "shard_id": shard_id,
+                "latency_ms": round(latency * 1000) if math.isfinite(latency) else None,
+                "guilds": 0
+            }
+        for guild in self.guilds:
+            if guild.shard_id in shards:
+                shards[guild.shard_id]["guilds"] += 1
+
+        return {
+            "cluster": self.cluster.cluster_id if self.cluster else 0,
+            "pid": os.getpid(),
+            "ready": self.is_ready(),
+            "guilds": len(self.guilds),
+            "shards": list(shards.values()),
+            "plugins": sorted(self.plugins.plugins)
+        }
+
+    async def get_cluster_stats(self) -> Dict[str, Any]:
+        """
+        Stats for every cluster, falling back to this process alone when the
+        bot is not clustered or the launcher cannot be reached
+        """
+        clusters = [self.shard_stats()]
+        if self.cluster and self.cluster.connected:
+            try:
+                result = await self.cluster.query("stats")
+                remote = [c for c in result["clusters"] if c["cluster"] != self.cluster.cluster_id]
+                clusters = sorted(remote + clusters, key=lambda c: c["cluster"])
+            except Exception as e:
+                self.logger.warning(f"Cluster stats query failed: {e}")
+
+        return {
+            "clusters": clusters,
+            "guilds": sum(c["guilds"] for c in clusters),
+            "shards": [shard for c in clusters for shard in c["shards"]],
+            "shard_count": self.shard_count
+        }
 
     async def load_slash_commands(self):
         try:
@@ -54,14 +200,40 @@ class Bot(commands.Bot):
         self.logger.info("Starting bot")
         await super().start(token)
 
+    async def on_shard_ready(self, shard_id: int):
+        self.logger.info(f"Shard {shard_id} ready")
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        self.tree.record(interaction, command)
+
     async def on_ready(self):
-        self.logger.info(f"Logged in as {self.user} in {len(self.guilds)} guilds")
+        if self.cluster:
+            try:
+                await self.cluster.publish(self.shard_stats())
+            except Exception as e:
+                self.logger.warning(f"Failed to publish cluster stats: {e}")
+        stats = await self.get_cluster_stats()
+        self.logger.info(f"Logged in as {self.user} in {len(self.guilds)} guilds "
+                         f"(shards {len(self.shards)}/{self.shard_count}, {stats['guilds']} guilds in total)")
 
-        try:
-            synced = await self.tree.sync()
-            self.logger.info(f"Successfully synced {len(synced)} slash commands")
-        except Exception as e:
-            self.logger.error(f"Failed to sync commands: {e}")
+        if not self._cache_report_logged:
+            self._cache_report_logged = True
+            savings = self.plugins.estimate_cache_savings(self.cache_policy)
+            self.logger.info(
+                f"Estimated memory saved by cache policy: {savings['total'] / 1048576:.1f} MB "
+                f"(members {savings['members'] / 1048576:.1f} MB, "
+                f"presences {savings['presences'] / 1048576:.1f} MB, "
+                f"messages {savings['messages'] / 1048576:.1f} MB)"
+            )
+            # Plugins are loaded and the guild caches filled: keep that graph out of later collections
+            profile.freeze()
+
+        # Global commands only need to be synced once, not by every cluster
+        if self.cluster is None or self.cluster.cluster_id == 0:
+            try:
+                await self.command_sync.sync()
+            except Exception as e:
+                self.logger.error(f"Failed to sync commands: {e}")
 
         activity = discord.Activity(
             type=discord.ActivityType.watching,
@@ -72,6 +244,19 @@ class Bot(commands.Bot):
 
     async def close(self):
         self.logger.info("Closing bot")
-        # Close database connection
+        await self.watchdog.stop()
+        if self.plugin_watcher:
+            await self.plugin_watcher.stop()
+        await self.rate_limiter.stop()
+        await self.scheduler.stop()
+        await self.ingestor.close()
+        await self.outbound.close()
+        if self._cluster_task:
+            self._cluster_task.cancel()
+        if self.cluster:
+            await self.cluster.close()
+        # Flush buffered writes and close database connection
         await db.close()
         await super().close()
+        if self.recorder:
+            self.recorder.close()
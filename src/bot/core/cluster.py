@@ -0,0 +1,321 @@
+"""
+Sharded multi-process launcher for Mizuki Bot
+
+The launcher splits the shard range across worker processes ("clusters").
+Each worker runs its own AutoSharded `Bot` over its slice of shards and
+talks to the launcher through a small JSON-lines IPC channel on localhost,
+which is used for cross-cluster queries such as the total guild count.
+"""
+
+import asyncio
+import hmac
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import secrets
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+
+logger = logging.getLogger("mizuki.cluster")
+
+GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+
+
+def split_shards(shard_count: int, cluster_count: int) -> List[List[int]]:
+    """
+    Splits shard ids into contiguous, evenly sized ranges
+
+    Args:
+        shard_count: Total number of shards
+        cluster_count: Number of worker processes
+
+    Returns:
+        One list of shard ids per cluster
+    """
+    cluster_count = max(1, min(cluster_count, shard_count))
+    per_cluster = math.ceil(shard_count / cluster_count)
+    return [
+        list(range(start, min(start + per_cluster, shard_count)))
+        for start in range(0, shard_count, per_cluster)
+    ]
+
+
+async def fetch_recommended_shards(token: str) -> Dict[str, int]:
+    """
+    Asks Discord how many shards the bot should use
+
+    Returns:
+        Dict with `shards` and the identify `max_concurrency`
+    """
+    headers = {"Authorization": f"Bot {token}"}
+    async with aiohttp.ClientSession() as session:
+        async with session.get(GATEWAY_URL, headers=headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+
+    return {
+        "shards": data["shards"],
+        "max_concurrency": data["session_start_limit"]["max_concurrency"],
+    }
+
+
+class ClusterCoordinator:
+    """IPC server run by the launcher; keeps the latest snapshot of every cluster"""
+
+    def __init__(self, auth_token: str, host: str = "127.0.0.1", port: int = 0):
+        self.auth_token = auth_token
+        self.host = host
+        self.port = port
+        self.snapshots: Dict[int, Dict[str, Any]] = {}
+        self.ready_events: Dict[int, asyncio.Event] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Cluster IPC listening on {self.host}:{self.port}")
+        return self.port
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def ready_event(self, cluster_id: int) -> asyncio.Event:
+        return self.ready_events.setdefault(cluster_id, asyncio.Event())
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        cluster_id = None
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+            if hello.get("op") != "hello" or not hmac.compare_digest(
+                str(hello.get("token", "")), self.auth_token
+            ):
+                logger.warning("Rejected IPC connection with an invalid handshake")
+                return
+
+            cluster_id = int(hello["cluster"])
+            logger.info(f"Cluster {cluster_id} connected to IPC")
+
+            while line := await reader.readline():
+                message = json.loads(line)
+                op = message.get("op")
+
+                if op == "update":
+                    snapshot = message["data"]
+                    self.snapshots[cluster_id] = {**snapshot, "updated_at": time.time()}
+                    if snapshot.get("ready"):
+                        self.ready_event(cluster_id).set()
+                elif op == "query":
+                    result = {"op": "result", "id": message["id"], "data": self.query(message.get("name"))}
+                    writer.write(json.dumps(result).encode() + b"\n")
+                    await writer.drain()
+
+        except (ConnectionError, json.JSONDecodeError, KeyError, ValueError) as e:
+            logger.warning(f"IPC connection from cluster {cluster_id} failed: {e}")
+        finally:
+            if cluster_id is not None:
+                logger.info(f"Cluster {cluster_id} disconnected from IPC")
+            writer.close()
+
+    def query(self, name: Optional[str]) -> Dict[str, Any]:
+        if name == "stats":
+            return {"clusters": [self.snapshots[key] for key in sorted(self.snapshots)]}
+        return {"error": f"Unknown query {name}"}
+
+
+class ClusterClient:
+    """IPC client used by a worker's `Bot` to publish stats and query other clusters"""
+
+    def __init__(self, cluster_id: int, host: str, port: int, auth_token: str):
+        self.cluster_id = cluster_id
+        self.host = host
+        self.port = port
+        self.auth_token = auth_token
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> Optional["ClusterClient"]:
+        """Builds a client from the variables set by the launcher, if any"""
+        if not os.getenv("CLUSTER_IPC_PORT"):
+            return None
+        return cls(
+            cluster_id=int(os.getenv("CLUSTER_ID", "0")),
+            host=os.getenv("CLUSTER_IPC_HOST", "127.0.0.1"),
+            port=int(os.getenv("CLUSTER_IPC_PORT")),
+            auth_token=os.getenv("CLUSTER_IPC_TOKEN", ""),
+        )
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> bool:
+        try:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            await self._send({"op": "hello", "cluster": self.cluster_id, "token": self.auth_token})
+            self._reader_task = asyncio.create_task(self._read_loop(), name="cluster-ipc-reader")
+            return True
+        except OSError as e:
+            logger.error(f"Failed to connect to cluster IPC at {self.host}:{self.port}: {e}")
+            return False
+
+    async def close(self):
+        if self._reader_task:
+            self._reader_task.cancel()
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    async def _send(self, message: Dict[str, Any]):
+        self._writer.write(json.dumps(message).encode() + b"\n")
+        await self._writer.drain()
+
+    async def _read_loop(self):
+        try:
+            while line := await self._reader.readline():
+                message = json.loads(line)
+                future = self._pending.pop(message.get("id"), None)
+                if future and not future.done():
+                    future.set_result(message.get("data"))
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Cluster IPC connection closed"))
+            self._pending.clear()
+
+    async def publish(self, snapshot: Dict[str, Any]):
+        """Sends this cluster's latest stats snapshot to the launcher"""
+        if self.connected:
+            await self._send({"op": "update", "data": snapshot})
+
+    async def query(self, name: str, timeout: float = 5.0) -> Dict[str, Any]:
+        """
+        Runs a cross-cluster query through the launcher
+
+        Args:
+            name: Query name (e.g. "stats")
+            timeout: Seconds to wait for the answer
+
+        Returns:
+            Query result
+        """
+        if not self.connected:
+            raise ConnectionError("Cluster IPC is not connected")
+
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._send({"op": "query", "id": request_id, "name": name})
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+
+def run_worker(cluster_id: int, shard_ids: List[int], shard_count: int):
+    """Process entry point for one cluster; IPC settings come from the environment"""
+    # Imported here so the launcher process never loads discord.py or the plugins
+    from src.bot.core.bot import Bot
+    from src.bot.utils.logger import setup_logger
+    from src.bot.utils.performance import profile
+
+    setup_logger()
+    bot = Bot(shard_ids=shard_ids, shard_count=shard_count, cluster=ClusterClient.from_env())
+
+    try:
+        profile.run(bot.start())
+    except KeyboardInterrupt:
+        pass
+
+
+class ClusterLauncher:
+    """Spawns one worker process per cluster and supervises them"""
+
+    def __init__(self, cluster_count: int, shard_count: Optional[int] = None,
+                 restart_delay: float = 10.0):
+        self.cluster_count = cluster_count
+        self.shard_count = shard_count
+        self.restart_delay = restart_delay
+        self.auth_token = secrets.token_hex(16)
+        self.coordinator = ClusterCoordinator(self.auth_token)
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self._context = multiprocessing.get_context("spawn")
+
+    def _spawn(self, cluster_id: int, shard_ids: List[int], shard_count: int) -> multiprocessing.Process:
+        os.environ.update({
+            "CLUSTER_ID": str(cluster_id),
+            "CLUSTER_IPC_HOST": self.coordinator.host,
+            "CLUSTER_IPC_PORT": str(self.coordinator.port),
+            "CLUSTER_IPC_TOKEN": self.auth_token,
+        })
+        process = self._context.Process(
+            target=run_worker,
+            args=(cluster_id, shard_ids, shard_count),
+            name=f"mizuki-cluster-{cluster_id}",
+        )
+        process.start()
+        self.processes[cluster_id] = process
+        logger.info(f"Cluster {cluster_id} started (pid {process.pid}) with shards "
+                    f"{shard_ids[0]}-{shard_ids[-1]} of {shard_count}")
+        return process
+
+    async def run(self):
+        token = os.getenv("DISCORD_TOKEN")
+        if not token:
+            logger.error("Environment variable DISCORD_TOKEN not set")
+            return
+
+        max_concurrency = 1
+        if not self.shard_count:
+            recommended = await fetch_recommended_shards(token)
+            self.shard_count = recommended["shards"]
+            max_concurrency = recommended["max_concurrency"]
+
+        ranges = split_shards(self.shard_count, self.cluster_count)
+        logger.info(f"Launching {len(ranges)} clusters for {self.shard_count} shards")
+
+        await self.coordinator.start()
+        try:
+            # Start clusters one after another so IDENTIFY calls respect the
+            # session start rate limit shared by every process
+            for cluster_id, shard_ids in enumerate(ranges):
+                self._spawn(cluster_id, shard_ids, self.shard_count)
+                identify_time = 5.0 * math.ceil(len(shard_ids) / max_concurrency)
+                try:
+                    await asyncio.wait_for(
+                        self.coordinator.ready_event(cluster_id).wait(),
+                        timeout=60 + identify_time
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(f"Cluster {cluster_id} not ready in time, starting next cluster")
+
+            await self._supervise(ranges)
+        finally:
+            for process in self.processes.values():
+                if process.is_alive():
+                    process.terminate()
+                process.join(timeout=10)
+            await self.coordinator.close()
+
+    async def _supervise(self, ranges: List[List[int]]):
+        while True:
+            await asyncio.sleep(self.restart_delay)
+            for cluster_id, process in list(self.processes.items()):
+                if process.is_alive():
+                    continue
+                logger.error(f"Cluster {cluster_id} exited with code {process.exitcode}, restarting")
+                self.coordinator.snapshots.pop(cluster_id, None)
+                self.coordinator.ready_event(cluster_id).clear()
+                self._spawn(cluster_id, ranges[cluster_id], self.shard_count)
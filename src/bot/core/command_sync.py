@@ -0,0 +1,113 @@
+import discord
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Optional
+
+
+class CommandSyncer:
+    """
+    Syncs the application command tree only when it actually changed.
+
+    The payload of every registered app command is hashed (globally and per
+    guild) and the hashes of the last successful sync are stored in a local
+    JSON file, so reconnects and restarts with an unchanged command set skip
+    the rate-limited sync calls entirely.
+    """
+
+    def __init__(self, bot, path: Optional[str] = None):
+        self.bot = bot
+        self.path = path or os.getenv("COMMAND_SYNC_STATE", "data/command_sync.json")
+        self.logger = logging.getLogger("mizuki.command_sync")
+
+    def fingerprint(self, guild_id: Optional[int] = None) -> str:
+        """Stable hash of the commands registered globally or for one guild"""
+        guild = discord.Object(id=guild_id) if guild_id else None
+        payload = sorted(
+            (command.to_dict(self.bot.tree) for command in self.bot.tree.get_commands(guild=guild)),
+            key=lambda data: (data.get("type", 1), data["name"])
+        )
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        # Hashes recorded for another application are meaningless here
+        if state.get("application_id") != self.bot.application_id:
+            return {}
+        return state
+
+    def _save_state(self, state: Dict[str, Any]):
+        state["application_id"] = self.bot.application_id
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def _plugin_guild_ids(self) -> Iterable[int]:
+        for plugin in self.bot.plugins.plugins.values():
+            yield from plugin.get_command_guild_ids()
+
+    async def sync(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Syncs the global commands and every guild whose command set changed
+
+        Args:
+            force: Sync everything even if the fingerprints match
+
+        Returns:
+            Dict with whether the global set was synced and the synced guild ids
+        """
+        state = self._load_state()
+        guild_state: Dict[str, str] = dict(state.get("guilds", {}))
+        result = {"global": False, "guilds": [], "skipped": 0}
+
+        global_hash = self.fingerprint()
+        if force or state.get("global") != global_hash:
+            synced = await self.bot.tree.sync()
+            self.logger.info(f"Successfully synced {len(synced)} global slash commands")
+            result["global"] = True
+        else:
+            result["skipped"] += 1
+        new_state = {"global": global_hash, "guilds": {}}
+
+        # Guilds that had commands last time must be synced again to clear them
+        guild_ids = set(self._plugin_guild_ids()) | {int(guild_id) for guild_id in guild_state}
+        for guild_id in sorted(guild_ids):
+            guild_hash = self.fingerprint(guild_id)
+            has_commands = bool(self.bot.tree.get_commands(guild=discord.Object(id=guild_id)))
+
+            if not force and guild_state.get(str(guild_id)) == guild_hash:
+                result["skipped"] += 1
+            else:
+                try:
+                    synced = await self.bot.tree.sync(guild=discord.Object(id=guild_id))
+                except discord.HTTPException as e:
+                    self.logger.error(f"Failed to sync commands for guild {guild_id}: {e}")
+                    if str(guild_id) in guild_state:
+                        new_state["guilds"][str(guild_id)] = guild_state[str(guild_id)]
+                    continue
+                self.logger.info(f"Synced {len(synced)} slash commands for guild {guild_id}")
+                result["guilds"].append(guild_id)
+
+            if has_commands:
+                new_state["guilds"][str(guild_id)] = guild_hash
+
+        try:
+            self._save_state(new_state)
+        except OSError as e:
+            self.logger.warning(f"Could not persist command sync state to {self.path}: {e}")
+
+        if not result["global"] and not result["guilds"]:
+            self.logger.info("Slash commands unchanged, sync skipped")
+        return result
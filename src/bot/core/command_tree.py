@@ -0,0 +1,114 @@
+import aiohttp
+import discord
+import time
+from discord import app_commands
+from typing import Dict, Optional, Tuple
+
+
+# Key of a command's `extras` holding the CommandStats its invocations are recorded in
+COMMAND_STATS = "mizuki.command_stats"
+
+
+class RateLimited(app_commands.CheckFailure):
+    """Raised by a rate limit check once the caller has been told when to retry"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class ResponseTimer:
+    """
+    Times application commands from the tree's check to their completion.
+
+    The first response is timed from the HTTP trace of the client session:
+    an interaction is answered (message, defer, modal...) when Discord
+    accepts the request to its `/interactions/{id}/{token}/callback` route.
+    """
+
+    # Interactions that never complete (e.g. an unknown command) are forgotten past this
+    MAX_TRACKED = 10000
+
+    def __init__(self):
+        self._started: Dict[int, float] = {}
+        self._responded: Dict[int, float] = {}
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """TraceConfig to pass to the client as `http_trace`"""
+        trace = aiohttp.TraceConfig()
+        trace.on_request_end.append(self._on_request_end)
+        return trace
+
+    async def _on_request_end(self, session, context, params: aiohttp.TraceRequestEndParams):
+        parts = params.url.path.rstrip("/").split("/")
+        if len(parts) < 4 or parts[-1] != "callback" or parts[-4] != "interactions":
+            return
+        try:
+            interaction_id = int(parts[-3])
+        except ValueError:
+            return
+        if interaction_id in self._started:
+            self._responded.setdefault(interaction_id, time.perf_counter())
+
+    def start(self, interaction_id: int):
+        if len(self._started) >= self.MAX_TRACKED:
+            oldest = next(iter(self._started))
+            del self._started[oldest]
+            self._responded.pop(oldest, None)
+        self._started[interaction_id] = time.perf_counter()
+
+    def finish(self, interaction_id: int) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Stops timing an interaction
+
+        Returns:
+            (total ms, ms until the first response) of the interaction; None
+            for what was not measured
+        """
+        start = self._started.pop(interaction_id, None)
+        responded = self._responded.pop(interaction_id, None)
+        if start is None:
+            return None, None
+        first_response = (responded - start) * 1000 if responded is not None else None
+        return (time.perf_counter() - start) * 1000, first_response
+
+
+class MizukiCommandTree(app_commands.CommandTree):
+    """
+    Command tree that records the CommandStats of plugin commands.
+
+    Uses only the tree's public hooks: `interaction_check` starts the clock,
+    and the `app_command_completion` event (see Bot) or `on_error` stops it.
+    """
+
+    def __init__(self, client, **kwargs):
+        super().__init__(client, **kwargs)
+        self.timer: ResponseTimer = getattr(client, "response_timer", None) or ResponseTimer()
+
+    async def interaction_check(self, interaction: discord.Interaction, /) -> bool:
+        if interaction.type is discord.InteractionType.application_command:
+            self.timer.start(interaction.id)
+        return True
+
+    def record(self, interaction: discord.Interaction, command, error: Optional[Exception] = None):
+        """
+        Records a finished invocation in the command's CommandStats
+
+        Args:
+            interaction: Interaction that invoked the command
+            command: Invoked command or context menu, None if it was not found
+            error: Error the invocation ended with, if any
+        """
+        wall, first_response = self.timer.finish(interaction.id)
+        stats = command.extras.get(COMMAND_STATS) if command is not None else None
+        # Throttled calls are counted by the check and never ran
+        if stats is None or wall is None or isinstance(error, RateLimited):
+            return
+        stats.record(wall, first_response, getattr(error, "original", error))
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError, /) -> None:
+        self.record(interaction, interaction.command, error)
+        if isinstance(error, RateLimited):
+            # Already answered by the plugin's on_rate_limited
+            return
+        await super().on_error(interaction, error)
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple, Union
+
+from src.bot.utils.metrics import LatencyHistogram
+
+
+logger = logging.getLogger("mizuki.events")
+
+Predicate = Callable[[Any], bool]
+
+
+def _guild_id(subject) -> Optional[int]:
+    # Raw gateway payloads carry ids, models carry the objects
+    guild_id = getattr(subject, "guild_id", None)
+    if guild_id is None:
+        guild = getattr(subject, "guild", None)
+        guild_id = guild.id if guild is not None else None
+    return guild_id
+
+
+def _channel_id(subject) -> Optional[int]:
+    channel_id = getattr(subject, "channel_id", None)
+    if channel_id is None:
+        channel = getattr(subject, "channel", None)
+        channel_id = channel.id if channel is not None else None
+    return channel_id
+
+
+def _subject(args: tuple):
+    # Events such as on_ready have no arguments; filters then see None
+    return args[0] if args else None
+
+
+def _is_bot(subject) -> bool:
+    # Messages have an author; member and user events are about the user itself
+    author = getattr(subject, "author", subject)
+    return getattr(author, "bot", False)
+
+
+def compile_filters(guild_ids: Optional[Collection[int]] = None, channel_ids: Optional[Collection[int]] = None,
+                    ignore_bots: bool = False, startswith: Union[str, Tuple[str, ...], None] = None,
+                    check: Optional[Callable[..., bool]] = None) -> Tuple[Predicate, ...]:
+    """
+    Builds the predicates a handler's event must pass, cheapest first
+
+    The built-in predicates look at the first event argument (the message,
+    member, payload...); `check` receives every argument.
+
+    Args:
+        guild_ids: Only events from these guilds
+        channel_ids: Only events from these channels
+        ignore_bots: Skip events whose author (or member) is a bot
+        startswith: Only messages whose content starts with this text or one of these texts
+        check: Extra synchronous predicate
+
+    Returns:
+        Tuple of predicates taking the event arguments
+    """
+    predicates: List[Predicate] = []
+    if ignore_bots:
+        predicates.append(lambda args: not _is_bot(_subject(args)))
+    if guild_ids is not None:
+        guilds = frozenset(guild_ids)
+        predicates.append(lambda args: _guild_id(_subject(args)) in guilds)
+    if channel_ids is not None:
+        channels = frozenset(channel_ids)
+        predicates.append(lambda args: _channel_id(_subject(args)) in channels)
+    if startswith is not None:
+        prefixes = (startswith,) if isinstance(startswith, str) else tuple(startswith)
+        predicates.append(lambda args: (getattr(_subject(args), "content", None) or "").startswith(prefixes))
+    if check is not None:
+        predicates.append(lambda args: check(*args))
+    return tuple(predicates)
+
+
+class EventHandler:
+    """One plugin listener on the bus, with its filters and accounting"""
+
+    __slots__ = ("event", "callback", "owner", "predicates", "max_pending",
+                 "in_flight", "calls", "errors", "filtered", "dropped", "timing")
+
+    def __init__(self, event: str, callback: Callable[..., Any], owner: str,
+                 predicates: Tuple[Predicate, ...] = (), max_pending: int = 100):
+        self.event = event
+        self.callback = callback
+        self.owner = owner
+        self.predicates = predicates
+        self.max_pending = max_pending
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.filtered = 0
+        self.dropped = 0
+        self.timing = LatencyHistogram()
+
+    @property
+    def name(self) -> str:
+        return f"{self.owner}.{getattr(self.callback, '__name__', 'listener')}"
+
+    def matches(self, args: tuple) -> bool:
+        """Runs the predicates; one that raises rejects the event and counts as an error"""
+        try:
+            for predicate in self.predicates:
+                if not predicate(args):
+                    self.filtered += 1
+                    return False
+        except Exception:
+            self.errors += 1
+            self.filtered += 1
+            logger.exception(f"Error in the filters of {self.name} on {self.event}")
+            return False
+        return True
+
+    def reserve(self) -> bool:
+        """Takes an in-flight slot for a matched event, or drops it when the handler is saturated"""
+        if self.in_flight >= self.max_pending:
+            # Still busy with earlier events: shed this one instead of piling up
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Handler {self.name} is saturated on {self.event}, "
+                               f"{self.dropped} events dropped so far")
+            return False
+        # Reserved now: concurrent dispatches must see it before the call starts
+        self.in_flight += 1
+        return True
+
+    async def run(self, args: tuple, kwargs: Dict[str, Any]):
+        """Runs the callback of an accepted event"""
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            await self.callback(*args, **kwargs)
+        except Exception:
+            self.errors += 1
+            logger.exception(f"Error in {self.name} handling {self.event}")
+        finally:
+            self.timing.observe((time.perf_counter() - start) * 1000)
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "handler": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "filtered": self.filtered,
+            "dropped": self.dropped,
+            "in_flight": self.in_flight,
+            **self.timing.summary(),
+        }
+
+
+class EventBus:
+    """
+    Routes gateway events to plugin handlers through one listener per event.
+
+    discord.py starts a task for every registered listener of an event;
+    the bus registers a single listener and, inside that one task, runs
+    each handler's predicates before any handler coroutine is created. A
+    lone matching handler is awaited in place and several run concurrently.
+    Handlers with `max_pending` calls still running drop further events.
+    """
+
+    def __init__(self, bot, max_pending: Optional[int] = None):
+        self.bot = bot
+        self.max_pending = max_pending or int(os.getenv("EVENT_MAX_PENDING", "100"))
+        # Replaced rather than mutated, so a dispatch in progress keeps its snapshot
+        self._handlers: Dict[str, Tuple[EventHandler, ...]] = {}
+        self._dispatchers: Dict[str, Callable[..., Any]] = {}
+        self.dispatched: Dict[str, int] = {}
+
+    def add(self, handler: EventHandler):
+        event = handler.event
+        self._handlers[event] = self._handlers.get(event, ()) + (handler,)
+        if event not in self._dispatchers:
+            dispatcher = self._dispatchers[event] = self._make_dispatcher(event)
+            self.bot.add_listener(dispatcher, event)
+
+    def remove(self, handler: EventHandler):
+        event = handler.event
+        handlers = tuple(h for h in self._handlers.get(event, ()) if h is not handler)
+        if handlers:
+            self._handlers[event] = handlers
+            return
+
+        self._handlers.pop(event, None)
+        dispatcher = self._dispatchers.pop(event, None)
+        if dispatcher is not None:
+            self.bot.remove_listener(dispatcher, event)
+
+    def _make_dispatcher(self, event: str):
+        async def dispatch(*args, **kwargs):
+            self.dispatched[event] = self.dispatched.get(event, 0) + 1
+            matched = [handler for handler in self._handlers.get(event, ()) if handler.matches(args)]
+            # Slots are only taken once every predicate ran, so a failing filter cannot leak them
+            matched = [handler for handler in matched if handler.reserve()]
+            if not matched:
+                return
+            if len(matched) == 1:
+                await matched[0].run(args, kwargs)
+            else:
+                await asyncio.gather(*(handler.run(args, kwargs) for handler in matched))
+
+        dispatch.__name__ = event
+        return dispatch
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Dispatch counts and per handler accounting
+
+        Returns:
+            Dict of event name to the times it was dispatched and its handlers' stats
+        """
+        return {
+            event: {
+                "dispatched": self.dispatched.get(event, 0),
+                "handlers": [handler.stats() for handler in handlers],
+            }
+            for event, handlers in self._handlers.items()
+        }
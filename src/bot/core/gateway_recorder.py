@@ -0,0 +1,216 @@
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+
+logger = logging.getLogger("mizuki.recorder")
+
+RECORDING_FORMAT = "mizuki-gateway"
+RECORDING_VERSION = 1
+
+# Personal data and secrets found in dispatch payloads: profiles, message text,
+# slash command and modal input (`value`, `values`), embeds and attachments
+DEFAULT_REDACT = ("content", "username", "global_name", "nick", "avatar", "banner", "bio",
+                  "email", "phone", "token", "ip",
+                  "value", "values", "title", "description", "fields", "text",
+                  "filename", "url", "proxy_url", "icon_url")
+
+# (milliseconds since the session started, event type, payload)
+RecordedEvent = Tuple[float, str, Dict[str, Any]]
+
+
+def redact(value: Any, keys: FrozenSet[str]) -> Any:
+    """
+    Copy of a payload with the values under `keys` blanked at any depth
+
+    Strings become "" (so a message keeps its shape), everything else None.
+    Snowflake ids are kept, since replaying needs them to stay consistent.
+    """
+    if isinstance(value, dict):
+        return {
+            key: ("" if isinstance(item, str) else None) if key in keys else redact(item, keys)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item, keys) for item in value]
+    return value
+
+
+class GatewayRecorder:
+    """
+    Appends the gateway dispatch events a bot receives to a gzip file.
+
+    Each line is `[ms, "EVENT_TYPE", payload]`, preceded by a header line
+    for every recording session, so several sessions can share one file.
+    The event loop only serializes the (redacted) payload and queues the
+    line; compression and disk writes happen on a background thread. If the
+    queue is full the event is dropped and counted rather than slowing the
+    gateway down. The stream is sync-flushed every `flush_interval`
+    seconds, so a crash loses at most that much of the recording.
+    """
+
+    def __init__(self, path: str, redact_keys: Optional[List[str]] = None,
+                 events: Optional[List[str]] = None, max_queue: int = 10000, flush_interval: float = 5.0):
+        """
+        Args:
+            path: Recording file, appended to if it exists
+            redact_keys: Payload keys blanked before writing
+            events: Event types to record, or None for all of them
+            max_queue: Lines waiting for the writer before events are dropped
+            flush_interval: Seconds between flushes to disk
+        """
+        self.path = path
+        self.redact_keys = frozenset(DEFAULT_REDACT if redact_keys is None else redact_keys)
+        self.events = frozenset(events) if events else None
+        self.flush_interval = flush_interval
+
+        self.recorded = 0
+        self.dropped = 0
+        self.failed: Optional[str] = None
+        self.started = time.monotonic()
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["GatewayRecorder"]:
+        """Recorder configured by GATEWAY_RECORD*, or None when recording is off"""
+        path = os.getenv("GATEWAY_RECORD")
+        if not path:
+            return None
+
+        redact_keys = os.getenv("GATEWAY_RECORD_REDACT")
+        events = os.getenv("GATEWAY_RECORD_EVENTS")
+        return cls(
+            path,
+            redact_keys=[key.strip() for key in redact_keys.split(",") if key.strip()] if redact_keys is not None else None,
+            events=[event.strip().upper() for event in events.split(",") if event.strip()] if events else None,
+        )
+
+    def install(self, state):
+        """
+        Wraps the dispatch parsers of a ConnectionState so every event is recorded
+
+        Must run before the gateway connects: the websocket keeps a reference
+        to the parser table, not a copy, so entries replaced here are the ones it calls.
+        """
+        for event, parser in list(state.parsers.items()):
+            if self.events is None or event in self.events:
+                state.parsers[event] = self._wrap(event, parser)
+        self.start()
+
+    def _wrap(self, event: str, parser: Callable[[Dict[str, Any]], None]):
+        def record(data: Dict[str, Any]):
+            # Before parsing: parsers may modify the payload
+            self.record(event, data)
+            parser(data)
+        return record
+
+    def record(self, event: str, data: Dict[str, Any]):
+        if self.failed:
+            self.dropped += 1
+            return
+        elapsed = round((time.monotonic() - self.started) * 1000, 1)
+        try:
+            line = json.dumps([elapsed, event, redact(data, self.redact_keys)],
+                              separators=(",", ":"), ensure_ascii=False, default=str)
+            self._queue.put_nowait(line.encode("utf-8") + b"\n")
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Gateway recorder is falling behind, {self.dropped} events dropped so far")
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self._write, name="gateway-recorder", daemon=True)
+        self._thread.start()
+        logger.info(f"Recording gateway events to {self.path} "
+                    f"(redacting {', '.join(sorted(self.redact_keys)) or 'nothing'})")
+
+    def _write(self):
+        try:
+            self._write_stream()
+        except Exception as e:
+            # Stop queueing for a writer that is gone; close() must not wait on it either
+            self.failed = f"{type(e).__name__}: {e}"
+            logger.error(f"Gateway recorder stopped, cannot write {self.path}: {self.failed}")
+
+    def _write_stream(self):
+        header = {
+            "format": RECORDING_FORMAT,
+            "version": RECORDING_VERSION,
+            "started": time.time(),
+            "redacted": sorted(self.redact_keys),
+        }
+        # Append mode adds a new gzip member; readers see the members as one stream
+        with gzip.open(self.path, "ab") as stream:
+            stream.write(json.dumps(header).encode("utf-8") + b"\n")
+            last_flush = time.monotonic()
+            while True:
+                try:
+                    line = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    line = b""
+                if line is None:
+                    break
+                if line:
+                    stream.write(line)
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    stream.flush(zlib.Z_SYNC_FLUSH)
+                    last_flush = time.monotonic()
+
+    def close(self):
+        """Writes what is queued and finishes the gzip member"""
+        if self._thread is None:
+            return
+        while self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+        self._thread = None
+        logger.info(f"Gateway recording stopped: {self.recorded} events recorded, {self.dropped} dropped")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "recorded": self.recorded, "dropped": self.dropped,
+                "queued": self._queue.qsize(), "failed": self.failed}
+
+
+def read_recording(path: str) -> Iterator[RecordedEvent]:
+    """
+    Yields the events of a recording in order
+
+    Timestamps of later sessions continue after the end of the previous one,
+    so a file holding several sessions replays as one continuous run. A
+    recording cut short by a crash is read up to its last flushed event.
+    """
+    offset = 0.0
+    session_end = 0.0
+    with gzip.open(path, "rb") as stream:
+        try:
+            for line in stream:
+                entry = json.loads(line)
+                if isinstance(entry, dict):
+                    if entry.get("format") != RECORDING_FORMAT or entry.get("version") != RECORDING_VERSION:
+                        raise ValueError(f"{path} is not a version {RECORDING_VERSION} gateway recording")
+                    offset = session_end
+                    continue
+                elapsed, event, data = entry
+                session_end = offset + elapsed
+                yield session_end, event, data
+        except EOFError:
+            logger.warning(f"Recording {path} ends abruptly, replaying up to its last complete event")
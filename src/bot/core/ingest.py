@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+
+import discord
+
+from src.bot.utils.database import db
+
+
+logger = logging.getLogger("mizuki.ingest")
+
+
+class MemberIngestor:
+    """
+    Copies guilds and their member lists into the `guilds` and `users` tables.
+
+    Members are read in chunks, from the member cache when the guild is
+    chunked and from the paginated REST endpoint otherwise, and handed to a
+    writer through a small bounded queue: at most `queue_chunks` chunks are
+    held in memory while the previous one is merged with COPY. Fetching and
+    writing therefore overlap, and a slow database slows down the fetch
+    instead of growing the backlog. Guilds are ingested one at a time.
+    """
+
+    def __init__(self, bot: discord.Client, chunk_size: Optional[int] = None, queue_chunks: int = 2):
+        self.bot = bot
+        self.enabled = os.getenv("MEMBER_INGEST", "").lower() in ("1", "true", "yes")
+        self.chunk_size = chunk_size or int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+        self.queue_chunks = queue_chunks
+
+        self._lock = asyncio.Lock()
+        self._queued: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._startup_done = False
+
+        self.guilds = 0
+        self.members = 0
+        self.written = 0
+        self.failures = 0
+        self.seconds = 0.0
+        self.last: Dict[str, Any] = {}
+
+    async def on_ready(self):
+        """Ingests every guild once, after the first READY"""
+        if self._startup_done:
+            return
+        self._startup_done = True
+        self._spawn(self.ingest_all(self.bot.guilds), "member-ingest-startup")
+
+    async def on_guild_join(self, guild: discord.Guild):
+        self._spawn(self.ingest_all([guild]), f"member-ingest-{guild.id}")
+
+    def _spawn(self, coro, name: str):
+        # The event handler returns right away; the ingest runs on its own task
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def ingest_all(self, guilds: Iterable[discord.Guild]):
+        """
+        Upserts the guild rows, then ingests the members of each guild in turn
+
+        Args:
+            guilds: Guilds to ingest; guilds already queued are skipped
+        """
+        guilds = [guild for guild in guilds if guild.id not in self._queued]
+        if not guilds:
+            return
+        self._queued.update(guild.id for guild in guilds)
+
+        try:
+            start = time.perf_counter()
+            for offset in range(0, len(guilds), self.chunk_size):
+                batch = guilds[offset:offset + self.chunk_size]
+                await db.bulk_upsert("guilds", ("guild_id",), ("name",),
+                                     [(guild.id, guild.name[:100]) for guild in batch],
+                                     timestamp_column="updated_at")
+            logger.info(f"Ingested {len(guilds)} guilds in {time.perf_counter() - start:.2f}s")
+
+            for guild in guilds:
+                async with self._lock:
+                    try:
+                        await self.ingest_members(guild)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        self.failures += 1
+                        logger.error(f"Failed to ingest members of guild {guild.id}: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Failed to ingest guilds: {e}")
+        finally:
+            self._queued.difference_update(guild.id for guild in guilds)
+
+    async def _member_chunks(self, guild: discord.Guild) -> AsyncIterator[List[tuple]]:
+        if guild.chunked:
+            members = guild.members
+            for offset in range(0, len(members), self.chunk_size):
+                yield [(member.id, member.name[:32]) for member in members[offset:offset + self.chunk_size]]
+                # Long member lists would otherwise hold the loop between chunks
+                await asyncio.sleep(0)
+            return
+
+        chunk = []
+        async for member in guild.fetch_members(limit=None):
+            chunk.append((member.id, member.name[:32]))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def ingest_members(self, guild: discord.Guild) -> Dict[str, Any]:
+        """
+        Streams the member list of a guild into `users`
+
+        Args:
+            guild: Guild whose members are ingested
+
+        Returns:
+            Members read, rows written and throughput of this guild
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_chunks)
+        members = written = 0
+
+        async def produce():
+            nonlocal members
+            cancelled = False
+            try:
+                async for chunk in self._member_chunks(guild):
+                    members += len(chunk)
+                    await queue.put(chunk)
+            except asyncio.CancelledError:
+                # The writer is gone; waiting for room in the queue would block forever
+                cancelled = True
+                raise
+            finally:
+                if not cancelled:
+                    await queue.put(None)
+
+        async def consume():
+            nonlocal written
+            while (chunk := await queue.get()) is not None:
+                written += await db.bulk_upsert("users", ("user_id",), ("username",), chunk,
+                                                timestamp_column="updated_at")
+
+        start = time.perf_counter()
+        producer = asyncio.create_task(produce(), name=f"member-fetch-{guild.id}")
+        try:
+            await consume()
+            await producer
+        finally:
+            # A failed write must not leave the fetch blocked on a full queue
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+        elapsed = time.perf_counter() - start
+
+        self.guilds += 1
+        self.members += members
+        self.written += written
+        self.seconds += elapsed
+        self.last = {
+            "guild": guild.id,
+            "members": members,
+            "written": written,
+            "seconds": round(elapsed, 3),
+            "rows_per_s": round(members / elapsed) if elapsed else 0,
+        }
+        logger.info(f"Ingested {members} members of guild {guild.id} ({written} new or changed) "
+                    f"in {elapsed:.2f}s, {self.last['rows_per_s']} rows/s")
+        return self.last
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "guilds": self.guilds,
+            "members": self.members,
+            "written": self.written,
+            "failures": self.failures,
+            "rows_per_s": round(self.members / self.seconds) if self.seconds else 0,
+            "running": len(self._tasks),
+            "last": self.last,
+        }
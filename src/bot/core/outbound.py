@@ -0,0 +1,287 @@
+import asyncio
+import discord
+import heapq
+import itertools
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from src.bot.utils.metrics import LatencyHistogram
+
+
+# Lower runs first. Interaction responses must reach Discord within 3 seconds
+PRIORITY_INTERACTION = 0
+PRIORITY_DEFAULT = 1
+
+# Keyword pairs that cannot be sent together; the newer one wins when edits merge
+_EXCLUSIVE_KWARGS = {"embed": "embeds", "embeds": "embed"}
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "call", "kwargs", "future", "bucket", "edit_key", "queued_at")
+
+    def __init__(self, priority: int, seq: int, call: Callable[..., Awaitable[Any]], kwargs: Dict[str, Any],
+                 future: asyncio.Future, bucket: Tuple[str, Hashable], edit_key: Optional[Hashable] = None):
+        self.priority = priority
+        self.seq = seq
+        self.call = call
+        self.kwargs = kwargs
+        self.future = future
+        self.bucket = bucket
+        self.edit_key = edit_key
+        self.queued_at = 0.0
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _BucketQueue:
+    __slots__ = ("jobs", "worker", "in_flight")
+
+    def __init__(self):
+        self.jobs: List[_Job] = []
+        self.worker: Optional[asyncio.Task] = None
+        self.in_flight = 0
+
+
+class _PriorityGate:
+    """Concurrency limit whose waiters are woken in priority order"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: int):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may already have been handed over to us
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot over without letting a newcomer jump the queue
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class OutboundScheduler:
+    """
+    Outbound REST dispatch shared by the plugins.
+
+    Calls are queued per Discord route bucket (a channel, or one
+    interaction) and run one at a time within a bucket, while a global
+    concurrency gate lets interaction responses overtake ordinary sends.
+    Edits of the same message are throttled to one per `edit_window`
+    seconds: an isolated edit runs right away, and further edits arriving
+    while one is queued are merged into it, so only the last state is sent.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, edit_window: Optional[float] = None):
+        self.concurrency = concurrency or int(os.getenv("OUTBOUND_CONCURRENCY", "10"))
+        self.edit_window = edit_window if edit_window is not None else float(os.getenv("OUTBOUND_EDIT_WINDOW", "0.25"))
+        self.logger = logging.getLogger("mizuki.outbound")
+        self._gate = _PriorityGate(self.concurrency)
+        self._buckets: Dict[Tuple[str, Hashable], _BucketQueue] = {}
+        self._edits: Dict[Hashable, _Job] = {}
+        self._last_edit: Dict[Hashable, float] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._seq = itertools.count()
+        # Aggregated per bucket kind; live depth is reported per bucket
+        self._wait: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, kind: str, counter: str):
+        counters = self._counters.setdefault(kind, {"completed": 0, "failed": 0, "coalesced": 0})
+        counters[counter] += 1
+
+    # Public API
+
+    async def respond(self, interaction: discord.Interaction, **kwargs) -> Any:
+        """Sends the initial response to an interaction ahead of ordinary traffic"""
+        return await self._submit(("interaction", interaction.id), PRIORITY_INTERACTION,
+                                  interaction.response.send_message, kwargs)
+
+    async def followup(self, interaction: discord.Interaction, **kwargs) -> discord.WebhookMessage:
+        """Sends a followup message for an interaction ahead of ordinary traffic"""
+        return await self._submit(("interaction", interaction.id), PRIORITY_INTERACTION,
+                                  interaction.followup.send, kwargs)
+
+    async def edit_original(self, interaction: discord.Interaction, **kwargs) -> discord.InteractionMessage:
+        """Edits an interaction's original response, merging edits that arrive in a burst"""
+        return await self._edit(("interaction", interaction.id), ("original", interaction.id),
+                                PRIORITY_INTERACTION, interaction.edit_original_response, kwargs)
+
+    async def send(self, destination: discord.abc.Messageable, **kwargs) -> discord.Message:
+        """Sends a message to a channel, user or command context"""
+        # Contexts expose their channel; channels and users are their own bucket
+        channel = getattr(destination, "channel", destination)
+        return await self._submit(("channel", channel.id), PRIORITY_DEFAULT, destination.send, kwargs)
+
+    async def edit(self, message: discord.Message, **kwargs) -> discord.Message:
+        """Edits a message, merging edits that arrive in a burst"""
+        return await self._edit(("channel", message.channel.id), ("message", message.id),
+                                PRIORITY_DEFAULT, message.edit, kwargs)
+
+    # Scheduling
+
+    def _submit(self, bucket: Tuple[str, Hashable], priority: int,
+                call: Callable[..., Awaitable[Any]], kwargs: Dict[str, Any]) -> Awaitable[Any]:
+        job = _Job(priority, next(self._seq), call, kwargs, asyncio.get_running_loop().create_future(), bucket)
+        self._enqueue(job)
+        # Shielded so a cancelled caller does not cancel a request other callers share
+        return asyncio.shield(job.future)
+
+    def _edit(self, bucket: Tuple[str, Hashable], edit_key: Hashable, priority: int,
+              call: Callable[..., Awaitable[Any]], kwargs: Dict[str, Any]) -> Awaitable[Any]:
+        pending = self._edits.get(edit_key)
+        if pending is not None:
+            for key in kwargs:
+                if key in _EXCLUSIVE_KWARGS:
+                    pending.kwargs.pop(_EXCLUSIVE_KWARGS[key], None)
+            pending.kwargs.update(kwargs)
+            self._count(bucket[0], "coalesced")
+            return asyncio.shield(pending.future)
+
+        loop = asyncio.get_running_loop()
+        job = _Job(priority, next(self._seq), call, dict(kwargs), loop.create_future(), bucket, edit_key)
+        self._edits[edit_key] = job
+
+        delay = self._last_edit.get(edit_key, 0.0) + self.edit_window - time.monotonic()
+        if delay > 0:
+            self._timers[edit_key] = loop.call_later(delay, self._release_edit, job)
+        else:
+            self._enqueue(job)
+        return asyncio.shield(job.future)
+
+    def _release_edit(self, job: _Job):
+        self._timers.pop(job.edit_key, None)
+        self._enqueue(job)
+
+    def _enqueue(self, job: _Job):
+        job.queued_at = time.monotonic()
+        queue = self._buckets.get(job.bucket)
+        if queue is None:
+            queue = self._buckets[job.bucket] = _BucketQueue()
+        heapq.heappush(queue.jobs, job)
+        if queue.worker is None:
+            queue.worker = asyncio.create_task(self._drain(job.bucket, queue), name=f"outbound-{job.bucket[0]}")
+
+    async def _drain(self, bucket: Tuple[str, Hashable], queue: _BucketQueue):
+        try:
+            while queue.jobs:
+                job = heapq.heappop(queue.jobs)
+                await self._gate.acquire(job.priority)
+                try:
+                    await self._run(job, queue)
+                finally:
+                    self._gate.release()
+        finally:
+            if self._buckets.get(bucket) is queue and not queue.jobs:
+                del self._buckets[bucket]
+            queue.worker = None
+
+    async def _run(self, job: _Job, queue: _BucketQueue):
+        now = time.monotonic()
+        kind = job.bucket[0]
+        if job.edit_key is not None:
+            # Edits made from here on start a new request
+            if self._edits.get(job.edit_key) is job:
+                del self._edits[job.edit_key]
+            self._last_edit[job.edit_key] = now
+            self._prune_last_edits(now)
+
+        self._wait.setdefault(kind, LatencyHistogram()).observe((now - job.queued_at) * 1000)
+        if job.future.done():
+            return
+
+        queue.in_flight += 1
+        try:
+            result = await job.call(**job.kwargs)
+        except Exception as e:
+            self._count(kind, "failed")
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self._count(kind, "completed")
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            queue.in_flight -= 1
+
+    def _prune_last_edits(self, now: float):
+        if len(self._last_edit) > 1024:
+            cutoff = now - self.edit_window
+            self._last_edit = {key: started for key, started in self._last_edit.items() if started > cutoff}
+
+    async def close(self):
+        """Cancels queued requests and stops the bucket workers"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+        jobs = [job for queue in self._buckets.values() for job in queue.jobs] + list(self._edits.values())
+        for job in jobs:
+            if not job.future.done():
+                job.future.cancel()
+        self._edits.clear()
+
+        workers = [queue.worker for queue in self._buckets.values() if queue.worker]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._buckets.clear()
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """
+        Queue depth and wait times of the outbound buckets
+
+        Args:
+            top: Number of busiest buckets to include
+
+        Returns:
+            Dict with the gate usage, per bucket kind counters and wait
+            histograms, and the deepest live buckets
+        """
+        now = time.monotonic()
+        live = sorted(
+            self._buckets.items(),
+            key=lambda item: len(item[1].jobs) + item[1].in_flight,
+            reverse=True
+        )[:top]
+
+        return {
+            "gate": {"limit": self.concurrency, "active": self._gate.active, "waiting": self._gate.waiting},
+            "pending_edits": len(self._edits),
+            "kinds": {
+                kind: {**self._counters.get(kind, {}), "wait": histogram.summary()}
+                for kind, histogram in self._wait.items()
+            },
+            "buckets": [
+                {
+                    "bucket": f"{kind}:{key}",
+                    "queued": len(queue.jobs),
+                    "in_flight": queue.in_flight,
+                    "oldest_wait_ms": round(max(((now - job.queued_at) * 1000 for job in queue.jobs), default=0.0), 3),
+                }
+                for (kind, key), queue in live
+            ],
+        }
@@ -1,9 +1,22 @@
+import asyncio
+import discord
 import importlib
 import pkgutil
 import logging
 import os
-from typing import List, Dict, Any, Optional
+import sys
+import time
+from typing import List, Dict, Any, Optional, Sequence, Type
+from src.bot.core.plugin_manifest import LazySlashCommand, PluginManifest, make_prefix_stub, plugin_mtime
 from src.bot.plugins.base_plugin import BasePlugin
+from src.bot.utils.cache import PLUGINS_TAG, plugin_tag
+from src.bot.utils.performance import profile
+
+# Rough per-object sizes used to estimate what the cache policy saves
+MEMBER_BYTES = 1500
+PRESENCE_BYTES = 600
+MESSAGE_BYTES = 2500
+DEFAULT_MAX_MESSAGES = 1000
 
 class PluginManager:
     def __init__(self, bot):
@@ -11,67 +24,398 @@ class PluginManager:
         self.logger = logging.getLogger("PluginManager")
         self.plugins: Dict[str, BasePlugin] = {}
         self.plugins_package = "src.bot.plugins"
+        self.setup_timeout = float(os.getenv("PLUGIN_SETUP_TIMEOUT", "30"))
+        # Per-plugin cold start breakdown in milliseconds
+        self.load_timings: Dict[str, Dict[str, float]] = {}
+
+        # Cached plugin index, so unchanged plugins need no import to be described
+        self.manifest = PluginManifest()
+        self.manifest.load()
+        # Plugins registered as stubs and only imported on first use ("*" for all)
+        self.lazy_plugins = {name.strip() for name in os.getenv("LAZY_PLUGINS", "").split(",") if name.strip()}
+        self._stubs: Dict[str, List[Any]] = {}
+        self._load_locks: Dict[str, asyncio.Lock] = {}
+
+    def discover_plugins(self) -> List[str]:
+        plugins_package = importlib.import_module(self.plugins_package)
+        return [name for _, name, ispkg in pkgutil.iter_modules(plugins_package.__path__) if ispkg]
+
+    def source_mtime(self, plugin_name: str) -> float:
+        plugins_package = importlib.import_module(self.plugins_package)
+        return plugin_mtime(os.path.join(plugins_package.__path__[0], plugin_name))
+
+    def _import_plugin_class(self, plugin_name: str, fresh: bool = False) -> Optional[Type[BasePlugin]]:
+        module_path = f"{self.plugins_package}.{plugin_name}.plugin"
+        backup = self._purge_modules(plugin_name) if fresh else {}
+        first_import = module_path not in sys.modules
+        start = time.perf_counter()
+        try:
+            module = importlib.import_module(module_path)
+        except Exception:
+            # Keep the previous code importable for whatever still runs on it
+            sys.modules.update(backup)
+            raise
+        if first_import:
+            self.load_timings.setdefault(plugin_name, {})["import_ms"] = (time.perf_counter() - start) * 1000
+
+        for attr_name in dir(module):
+            attr = getattr(module, attr_name)
+            if (isinstance(attr, type) and
+                issubclass(attr, BasePlugin) and
+                attr != BasePlugin):
+                self.manifest.record_class(plugin_name, attr, self.source_mtime(plugin_name))
+                return attr
+        return None
+
+    def _purge_modules(self, plugin_name: str) -> Dict[str, Any]:
+        """Drops a plugin package and its submodules from sys.modules so the next import re-executes them"""
+        package = f"{self.plugins_package}.{plugin_name}"
+        purged = {
+            name: sys.modules.pop(name)
+            for name in list(sys.modules)
+            if name == package or name.startswith(package + ".")
+        }
+        importlib.invalidate_caches()
+        return purged
+
+    def _plugin_entry(self, plugin_name: str) -> Optional[Dict[str, Any]]:
+        """Manifest entry for a plugin, importing it only when the cached one is stale"""
+        entry = self.manifest.get(plugin_name, self.source_mtime(plugin_name))
+        if entry is not None:
+            return entry
+
+        if not self._import_plugin_class(plugin_name):
+            return None
+        return self.manifest.entries.get(plugin_name)
+
+    def resolve_cache_policy(self) -> Dict[str, Any]:
+        """
+        Computes the minimal intents and caches needed by the available plugins.
+        Runs before the bot connects, reading the manifest or plugin class attributes only.
+        """
+        intents = discord.Intents.none()
+        intents.guilds = True
+        member_cache = discord.MemberCacheFlags.none()
+        max_messages = 0
+        chunk_guilds = False
+        requirements = {}
+
+        for plugin_name in self.discover_plugins():
+            try:
+                entry = self._plugin_entry(plugin_name)
+            except Exception as e:
+                self.logger.error(f"Failed to inspect plugin {plugin_name} : {e}")
+                continue
+            if not entry:
+                continue
+
+            for flag in entry["intents"]:
+                if flag in discord.Intents.VALID_FLAGS:
+                    setattr(intents, flag, True)
+                else:
+                    self.logger.warning(f"Plugin {plugin_name} requests unknown intent {flag}")
+
+            for flag in entry["member_cache"]:
+                if flag in discord.MemberCacheFlags.VALID_FLAGS:
+                    setattr(member_cache, flag, True)
+                else:
+                    self.logger.warning(f"Plugin {plugin_name} requests unknown member cache {flag}")
+
+            max_messages = max(max_messages, entry["message_cache_size"])
+            chunk_guilds = chunk_guilds or entry["chunk_guilds"]
+            requirements[plugin_name] = list(entry["intents"])
+
+        # Member cache flags are only valid with the intents that feed them
+        if member_cache.joined or chunk_guilds:
+            intents.members = True
+            member_cache.joined = True
+        if member_cache.voice:
+            intents.voice_states = True
+
+        return {
+            "intents": intents,
+            "member_cache_flags": member_cache,
+            "chunk_guilds_at_startup": chunk_guilds,
+            "max_messages": max_messages or None,
+            "requirements": requirements
+        }
+
+    def estimate_cache_savings(self, policy: Dict[str, Any]) -> Dict[str, int]:
+        """Estimates memory saved by the policy compared to Intents.all() with default caches"""
+        member_total = sum(guild.member_count or 0 for guild in self.bot.guilds)
+        cached_members = sum(len(guild.members) for guild in self.bot.guilds)
+        intents = policy["intents"]
+
+        members = max(member_total - cached_members, 0) * MEMBER_BYTES
+        presences = 0 if intents.presences else member_total * PRESENCE_BYTES
+        messages = max(DEFAULT_MAX_MESSAGES - (policy["max_messages"] or 0), 0) * MESSAGE_BYTES
+
+        return {
+            "members": members,
+            "presences": presences,
+            "messages": messages,
+            "total": members + presences + messages
+        }
+
+    def _resolve_load_order(self, dependencies: Dict[str, Sequence[str]]) -> List[List[str]]:
+        """
+        Groups plugins into waves: every plugin only depends on plugins from
+        earlier waves, so the plugins within one wave can be set up concurrently.
+        Plugins with missing or circular dependencies are left out.
+        """
+        pending = {}
+        for plugin_name, deps in dependencies.items():
+            missing = [dep for dep in deps if dep not in dependencies]
+            if missing:
+                self.logger.error(f"Plugin {plugin_name} depends on missing plugins: {', '.join(missing)}")
+                continue
+            pending[plugin_name] = set(deps)
+
+        # Dependents of a skipped plugin cannot load either
+        skipped = set(dependencies) - set(pending)
+        while skipped:
+            blocked = {name for name, deps in pending.items() if deps & skipped}
+            for name in blocked:
+                self.logger.error(f"Plugin {name} skipped: a dependency cannot be loaded")
+                del pending[name]
+            skipped = blocked
+
+        waves = []
+        placed = set()
+        while pending:
+            wave = sorted(name for name, deps in pending.items() if deps <= placed)
+            if not wave:
+                self.logger.error(f"Circular plugin dependencies between: {', '.join(sorted(pending))}")
+                break
+            waves.append(wave)
+            placed.update(wave)
+            for name in wave:
+                del pending[name]
+        return waves
+
+    def _is_lazy(self, plugin_name: str, entry: Dict[str, Any], dependencies: Dict[str, Sequence[str]]) -> bool:
+        if plugin_name not in self.lazy_plugins and "*" not in self.lazy_plugins:
+            return False
+        # Stubs need the commands recorded from a previous setup() of the same sources
+        if "commands" not in entry or not entry.get("lazy_capable"):
+            return False
+        # Keep dependency chains eager so setup order stays predictable
+        if entry["dependencies"] or any(plugin_name in deps for deps in dependencies.values()):
+            return False
+        return True
+
+    def _register_stubs(self, plugin_name: str, entry: Dict[str, Any]):
+        async def loader() -> bool:
+            return await self.ensure_loaded(plugin_name)
+
+        stubs = [make_prefix_stub(spec, loader) for spec in entry["commands"]["prefix"]]
+        stubs += [LazySlashCommand(spec, loader) for spec in entry["commands"]["slash"]]
+        self._add_stubs(plugin_name, stubs)
+        self._invalidate_responses()
+        self.logger.info(f"Plugin {entry['name']} v{entry['version']} registered lazily "
+                         f"({len(stubs)} command stubs)")
+
+    def _add_stubs(self, plugin_name: str, stubs: List[Any]):
+        for stub in stubs:
+            if not isinstance(stub, LazySlashCommand):
+                self.bot.add_command(stub)
+            elif stub.guild_ids:
+                self.bot.tree.add_command(stub, guilds=[discord.Object(id=guild_id) for guild_id in stub.guild_ids])
+            else:
+                self.bot.tree.add_command(stub)
+        self._stubs[plugin_name] = stubs
+
+    def _remove_stubs(self, plugin_name: str):
+        for stub in self._stubs.pop(plugin_name, []):
+            if isinstance(stub, LazySlashCommand):
+                if stub.guild_ids:
+                    for guild_id in stub.guild_ids:
+                        self.bot.tree.remove_command(stub.name, guild=discord.Object(id=guild_id))
+                else:
+                    self.bot.tree.remove_command(stub.name)
+            else:
+                self.bot.remove_command(stub.name)
+
+    async def ensure_loaded(self, plugin_name: str) -> bool:
+        """Loads a lazily registered plugin, once, replacing its command stubs"""
+        lock = self._load_locks.setdefault(plugin_name, asyncio.Lock())
+        async with lock:
+            if plugin_name in self.plugins:
+                return True
+
+            self.logger.info(f"Loading lazy plugin {plugin_name} on first use")
+            success = await self.load_plugin(plugin_name)
+            self.manifest.save()
+            return success
 
     async def load_plugins(self) -> bool:
         self.logger.info("Loading plugins")
 
         try:
-            plugins_package = importlib.import_module(self.plugins_package)
+            entries = {}
+            for plugin_name in self.discover_plugins():
+                try:
+                    entry = self._plugin_entry(plugin_name)
+                except Exception as e:
+                    self.logger.error(f"Failed to import plugin {plugin_name} : {e}")
+                    continue
+                if not entry:
+                    self.logger.error(f"Not found plugin {plugin_name}")
+                    continue
+                entries[plugin_name] = entry
+
+            dependencies = {name: entry["dependencies"] for name, entry in entries.items()}
+            for plugin_name, entry in entries.items():
+                if self._is_lazy(plugin_name, entry, dependencies):
+                    self._register_stubs(plugin_name, entry)
+                    del dependencies[plugin_name]
 
-            for _, plugin_name, iskpg in pkgutil.iter_modules(plugins_package.__path__):
-                if iskpg:
-                    success = await self.load_plugin(plugin_name)
+            start = time.perf_counter()
+            failed = set()
+            for wave in self._resolve_load_order(dependencies):
+                ready = [name for name in wave if not set(dependencies[name]) & failed]
+                for name in set(wave) - set(ready):
+                    self.logger.error(f"Plugin {name} skipped: a dependency failed to load")
+                    failed.add(name)
+
+                results = await asyncio.gather(*(self._load_eager(name) for name in ready))
+                for plugin_name, success in zip(ready, results):
                     if not success:
                         self.logger.error(f"Failed to load plugin {plugin_name}")
+                        failed.add(plugin_name)
 
-            self.logger.info(f"{plugins_package.__name__} loaded")
+            self.manifest.save()
+            self.logger.info(f"{self.plugins_package} loaded in {(time.perf_counter() - start) * 1000:.1f}ms")
+            self._log_load_report()
             return True
 
         except Exception as e:
-            self.logger.error(f"Failed to load plugin {plugins_package.__name__} : {e}")
+            self.logger.error(f"Failed to load plugin {self.plugins_package} : {e}")
             return False
 
-    async def load_plugin(self, plugin_name: str) -> bool:
+    async def _load_eager(self, plugin_name: str) -> bool:
         try:
-            module_path = f"{self.plugins_package}.{plugin_name}.plugin"
-            module = importlib.import_module(module_path)
+            plugin_class = self._import_plugin_class(plugin_name)
+        except Exception as e:
+            self.logger.error(f"Failed to import plugin {plugin_name} : {e}")
+            return False
+        if not plugin_class:
+            self.logger.error(f"Not found plugin {plugin_name}")
+            return False
+        return await self._setup_plugin(plugin_name, plugin_class)
 
-            plugin_class = None
-            for attr_name in dir(module):
-                attr = getattr(module, attr_name)
-                if (isinstance(attr, type) and
-                    issubclass(attr, BasePlugin) and
-                    attr != BasePlugin):
-                    plugin_class = attr
-                    break
+    async def load_plugin(self, plugin_name: str, fresh: bool = False) -> bool:
+        try:
+            plugin_class = self._import_plugin_class(plugin_name, fresh=fresh)
 
             if not plugin_class:
                 self.logger.error(f"Not found plugin {plugin_name}")
                 return False
 
-            plugin_instance = plugin_class(self.bot)
-            await plugin_instance.setup()
-
-            self.plugins[plugin_name] = plugin_instance
+            missing = [dep for dep in plugin_class.PLUGIN_DEPENDENCIES if dep not in self.plugins]
+            if missing:
+                self.logger.error(f"Plugin {plugin_name} requires unloaded plugins: {', '.join(missing)}")
+                return False
 
-            metadata = plugin_instance.get_metadata()
-            command_count = plugin_instance.get_command_count()
+            return await self._setup_plugin(plugin_name, plugin_class)
 
-            self.logger.info(f"Plugin {metadata['name']} v{metadata['version']} loaded")
-            self.logger.info(f"{command_count['prefix_commands']} prefix commands loaded,"
-                         f"{command_count['slash_commands']} slash commands loaded")
+        except Exception as e:
+            self.logger.error(f"Failed to load plugin {plugin_name} : {e}")
+            return False
 
-            return True
+    async def _setup_plugin(self, plugin_name: str, plugin_class: Type[BasePlugin]) -> bool:
+        plugin_instance = None
+        start = time.perf_counter()
+        try:
+            plugin_instance = plugin_class(self.bot)
+            await asyncio.wait_for(plugin_instance.setup(), timeout=self.setup_timeout)
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                self.logger.error(f"Plugin {plugin_name} setup timed out after {self.setup_timeout:g}s")
+            else:
+                self.logger.error(f"Failed to load plugin {plugin_name} : {e}")
+            if plugin_instance is not None:
+                try:
+                    await plugin_instance.teardown()
+                except Exception as cleanup_error:
+                    self.logger.error(f"Failed to clean up plugin {plugin_name} : {cleanup_error}")
+            return False
+        finally:
+            self.load_timings.setdefault(plugin_name, {})["setup_ms"] = (time.perf_counter() - start) * 1000
 
+        # Swap the previous instance (or lazy stubs) for the new one without
+        # yielding to the event loop, so no command lookup sees a gap.
+        # Invocations already running keep executing the old callbacks.
+        previous = self.plugins.get(plugin_name)
+        stubs = self._stubs.get(plugin_name)
+        try:
+            if previous:
+                previous.detach()
+            self._remove_stubs(plugin_name)
+            plugin_instance.attach()
         except Exception as e:
-            self.logger.error(f"Failed to load plugin {plugin_name} : {e}")
+            self.logger.error(f"Failed to register commands of plugin {plugin_name} : {e}")
+            if previous:
+                previous.attach()
+            if stubs:
+                self._add_stubs(plugin_name, stubs)
             return False
 
+        self.plugins[plugin_name] = plugin_instance
+        self.manifest.record_commands(plugin_name, plugin_instance)
+        self._invalidate_responses(previous, plugin_instance)
+
+        if previous:
+            try:
+                await previous.teardown()
+            except Exception as e:
+                self.logger.error(f"Failed to tear down previous {plugin_name} instance : {e}")
+
+        metadata = plugin_instance.get_metadata()
+        command_count = plugin_instance.get_command_count()
+
+        self.logger.info(f"Plugin {metadata['name']} v{metadata['version']} loaded")
+        self.logger.info(f"{command_count['prefix_commands']} prefix commands loaded,"
+                     f"{command_count['slash_commands']} slash commands loaded")
+
+        return True
+
+    def _invalidate_responses(self, *plugins: Optional[BasePlugin]):
+        """Drops cached responses built from the plugin list or by the changed plugins"""
+        tags = [PLUGINS_TAG] + [plugin_tag(plugin.PLUGIN_NAME) for plugin in plugins if plugin is not None]
+        self.bot.response_cache.invalidate_tags(*tags)
+
+    def get_load_report(self) -> List[Dict[str, Any]]:
+        report = []
+        for plugin_name, timings in self.load_timings.items():
+            import_ms = timings.get("import_ms", 0.0)
+            setup_ms = timings.get("setup_ms", 0.0)
+            report.append({
+                "plugin": plugin_name,
+                "import_ms": round(import_ms, 2),
+                "setup_ms": round(setup_ms, 2),
+                "total_ms": round(import_ms + setup_ms, 2),
+                "loaded": plugin_name in self.plugins
+            })
+        return sorted(report, key=lambda entry: entry["total_ms"], reverse=True)
+
+    def _log_load_report(self):
+        for entry in self.get_load_report():
+            self.logger.info(f"  {entry['plugin']:<20} import {entry['import_ms']:>8.2f}ms  "
+                             f"setup {entry['setup_ms']:>8.2f}ms"
+                             f"{'' if entry['loaded'] else '  (failed)'}")
+
     async def unload_plugin(self, plugin_name: str) -> bool:
+        dependents = [name for name, plugin in self.plugins.items() if plugin_name in plugin.PLUGIN_DEPENDENCIES]
+        if dependents:
+            self.logger.warning(f"Unloading {plugin_name} while {', '.join(dependents)} depend on it")
+
         if plugin_name in self.plugins:
+            # The plugin's modules may be frozen, and frozen cycles are never collected
+            profile.unfreeze(f"unloading plugin {plugin_name}")
             try:
                 await self.plugins[plugin_name].teardown()
-                del self.plugins[plugin_name]
+                self._invalidate_responses(self.plugins.pop(plugin_name))
                 self.logger.info(f"Plugin {plugin_name} unloaded")
                 return True
             except Exception as e:
@@ -80,9 +424,36 @@ class PluginManager:
         return False
 
     async def reload_plugin(self, plugin_name: str) -> bool:
-        if await self.unload_plugin(plugin_name):
-            return await self.load_plugin(plugin_name)
-        return False
+        """
+        Re-imports a plugin's modules from disk and swaps it in. The running
+        instance stays active until the new one has been set up successfully.
+        A plugin that is not running, e.g. because it failed at startup, is
+        loaded from scratch instead.
+        """
+        if plugin_name not in self.plugins and plugin_name not in self._stubs:
+            if plugin_name not in self.discover_plugins():
+                return False
+            # Modules left over from the failed import must not be reused
+            return await self.load_plugin(plugin_name, fresh=True)
+
+        # The old modules are dropped from sys.modules; if frozen they would never be collected
+        profile.unfreeze(f"reloading plugin {plugin_name}")
+        start = time.perf_counter()
+        try:
+            plugin_class = self._import_plugin_class(plugin_name, fresh=True)
+        except Exception as e:
+            self.logger.error(f"Failed to reload plugin {plugin_name}, keeping the running version : {e}")
+            return False
+
+        if not plugin_class:
+            self.logger.error(f"Not found plugin {plugin_name}")
+            return False
+
+        success = await self._setup_plugin(plugin_name, plugin_class)
+        self.manifest.save()
+        if success:
+            self.logger.info(f"Plugin {plugin_name} reloaded in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return success
 
     def get_plugin_info(self, plugin_name: str) -> Optional[Dict[str, Any]]:
         if plugin_name in self.plugins:
@@ -93,12 +464,35 @@ class PluginManager:
             return {
                 **metadata,
                 "commands": command_count,
+                "dependencies": list(plugin.PLUGIN_DEPENDENCIES),
+                "load_timings": self.load_timings.get(plugin_name, {}),
+                "command_stats": plugin.get_command_stats(),
                 "loaded": True
             }
+
+        if plugin_name in self._stubs:
+            entry = self.manifest.entries[plugin_name]
+            commands = entry["commands"]
+            return {
+                "name": entry["name"],
+                "version": entry["version"],
+                "description": entry["description"],
+                "author": entry["author"],
+                "email": entry["email"],
+                "commands": {
+                    "prefix_commands": len(commands["prefix"]),
+                    "slash_commands": len(commands["slash"]),
+                    "event_listeners": commands["event_listeners"]
+                },
+                "dependencies": entry["dependencies"],
+                "load_timings": {},
+                "command_stats": {},
+                "loaded": False
+            }
         return None
 
     def list_plugins(self) -> List[Dict[str, Any]]:
         plugins_info = []
-        for plugin_name, plugin in self.plugins.items():
+        for plugin_name in [*self.plugins, *self._stubs]:
             plugins_info.append(self.get_plugin_info(plugin_name))
         return plugins_info
@@ -0,0 +1,172 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.bot.plugins.base_plugin import BasePlugin
+
+
+MANIFEST_VERSION = 1
+
+
+def plugin_mtime(plugin_dir: str) -> float:
+    """Latest modification time of any Python source inside a plugin package"""
+    latest = 0.0
+    for root, _, files in os.walk(plugin_dir):
+        for filename in files:
+            if filename.endswith(".py"):
+                latest = max(latest, os.path.getmtime(os.path.join(root, filename)))
+    return latest
+
+
+class PluginManifest:
+    """
+    Cached index of the available plugins.
+
+    Each entry holds what the bot needs to know about a plugin without
+    importing it: class path, metadata, gateway requirements, dependencies
+    and the commands it registered the last time it was set up. An entry is
+    only trusted while the plugin's sources keep the mtime it was built from.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("PLUGIN_MANIFEST", "data/plugin_manifest.json")
+        self.logger = logging.getLogger("mizuki.manifest")
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+            return
+
+        self.entries = data.get("plugins", {}) if data.get("version") == MANIFEST_VERSION else {}
+
+    def save(self):
+        if not self._dirty:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "plugins": self.entries}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            self.logger.warning(f"Could not write plugin manifest to {self.path}: {e}")
+
+    def get(self, plugin_name: str, mtime: float) -> Optional[Dict[str, Any]]:
+        """Returns the entry for a plugin if it was built from the current sources"""
+        entry = self.entries.get(plugin_name)
+        if entry and entry.get("mtime") == mtime:
+            return entry
+        return None
+
+    def record_class(self, plugin_name: str, plugin_class: type, mtime: float):
+        """Stores the class-level metadata of a freshly imported plugin"""
+        entry = self.entries.get(plugin_name, {})
+        if entry.get("mtime") != mtime:
+            # Commands recorded for older sources are no longer trustworthy
+            entry = {}
+
+        entry.update({
+            "class_path": f"{plugin_class.__module__}:{plugin_class.__qualname__}",
+            "mtime": mtime,
+            "name": plugin_class.PLUGIN_NAME,
+            "version": plugin_class.PLUGIN_VERSION,
+            "description": plugin_class.PLUGIN_DESCRIPTION,
+            "author": plugin_class.PLUGIN_AUTHOR,
+            "email": plugin_class.PLUGIN_EMAIL,
+            "dependencies": list(plugin_class.PLUGIN_DEPENDENCIES),
+            "intents": list(plugin_class.REQUIRED_INTENTS),
+            "member_cache": list(plugin_class.MEMBER_CACHE),
+            "message_cache_size": plugin_class.MESSAGE_CACHE_SIZE,
+            "chunk_guilds": plugin_class.CHUNK_GUILDS,
+        })
+        self.entries[plugin_name] = entry
+        self._dirty = True
+
+    def record_commands(self, plugin_name: str, plugin: BasePlugin):
+        """Stores the commands a plugin registered during setup()"""
+        entry = self.entries.get(plugin_name)
+        if entry is None:
+            return
+
+        slash = []
+        lazy_capable = not plugin._event_listeners
+        for command in plugin._slash_commands:
+            if not isinstance(command, app_commands.Command):
+                # Groups and context menus cannot be represented by a stub
+                lazy_capable = False
+                continue
+            slash.append({
+                "name": command.name,
+                "payload": command.to_dict(plugin.bot.tree),
+                "guild_ids": plugin._slash_command_guilds.get(command.name, []),
+            })
+
+        entry["commands"] = {
+            "prefix": [
+                {"name": command.name, "aliases": list(command.aliases), "help": command.help}
+                for command in plugin._prefix_commands
+            ],
+            "slash": slash,
+            "event_listeners": len(plugin._event_listeners),
+        }
+        entry["lazy_capable"] = lazy_capable
+        self._dirty = True
+
+
+class LazySlashCommand(app_commands.Command):
+    """
+    Placeholder for a slash command of a plugin that is not imported yet.
+    It reports the recorded payload so command syncs see no difference, and
+    loads the real plugin the first time it is invoked.
+    """
+
+    def __init__(self, spec: Dict[str, Any], loader: Callable[[], Awaitable[bool]]):
+        async def _stub(interaction: discord.Interaction):
+            command = await self._load(interaction)
+            return await command._invoke_with_namespace(interaction, interaction.namespace)
+
+        payload = spec["payload"]
+        super().__init__(name=spec["name"], description=payload.get("description") or "...", callback=_stub)
+        self._payload = payload
+        self.guild_ids = list(spec.get("guild_ids") or [])
+        self._loader = loader
+
+    async def _load(self, interaction: discord.Interaction) -> app_commands.Command:
+        if await self._loader():
+            guild = discord.Object(id=interaction.guild_id) if self.guild_ids and interaction.guild_id else None
+            command = interaction.client.tree.get_command(self.name, guild=guild)
+            if command is not None and command is not self:
+                return command
+        raise app_commands.CommandNotFound(self.name, [])
+
+    def to_dict(self, tree) -> Dict[str, Any]:
+        return dict(self._payload)
+
+    async def _invoke_autocomplete(self, interaction: discord.Interaction, name: str, namespace):
+        command = await self._load(interaction)
+        return await command._invoke_autocomplete(interaction, name, namespace)
+
+
+def make_prefix_stub(spec: Dict[str, Any], loader: Callable[[], Awaitable[bool]]) -> commands.Command:
+    """Placeholder prefix command that loads the real plugin and re-dispatches the message"""
+
+    async def _stub(ctx: commands.Context, *, _arguments: str = ""):
+        if await loader():
+            await ctx.bot.process_commands(ctx.message)
+
+    return commands.Command(_stub, name=spec["name"], aliases=spec.get("aliases", []), help=spec.get("help"))
+
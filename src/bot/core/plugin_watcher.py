@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+
+class PluginWatcher:
+    """
+    Polls the plugin packages for source changes and hot-reloads them.
+
+    A change is only acted on once the plugin's mtime has been stable for
+    one full interval, so an editor saving several files in a row triggers
+    a single reload. New plugin packages are loaded and removed ones are
+    unloaded.
+    """
+
+    def __init__(self, manager, interval: Optional[float] = None):
+        self.manager = manager
+        self.interval = interval or float(os.getenv("PLUGIN_WATCH_INTERVAL", "1.0"))
+        self.logger = logging.getLogger("mizuki.plugin_watcher")
+        self._mtimes: Dict[str, float] = {}
+        self._pending: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _scan(self) -> Dict[str, float]:
+        return {name: self.manager.source_mtime(name) for name in self.manager.discover_plugins()}
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._mtimes = self._scan()
+        self._task = asyncio.create_task(self._run(), name="plugin-watcher")
+        self.logger.info(f"Watching {len(self._mtimes)} plugins for changes every {self.interval:g}s")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                self.logger.error(f"Plugin watcher poll failed: {e}")
+
+    async def poll(self):
+        current = await asyncio.to_thread(self._scan)
+
+        for plugin_name in self._mtimes.keys() - current.keys():
+            self.logger.info(f"Plugin {plugin_name} removed, unloading")
+            await self.manager.unload_plugin(plugin_name)
+            self._pending.pop(plugin_name, None)
+
+        for plugin_name, mtime in current.items():
+            if self._mtimes.get(plugin_name) == mtime:
+                self._pending.pop(plugin_name, None)
+                continue
+
+            # Wait until the files stop changing before reloading
+            if self._pending.get(plugin_name) != mtime:
+                self._pending[plugin_name] = mtime
+                continue
+            del self._pending[plugin_name]
+
+            if plugin_name in self._mtimes:
+                self.logger.info(f"Plugin {plugin_name} changed on disk, reloading")
+                await self.manager.reload_plugin(plugin_name)
+            else:
+                self.logger.info(f"New plugin {plugin_name} found, loading")
+                await self.manager.load_plugin(plugin_name)
+            self._mtimes[plugin_name] = mtime
+
+        for plugin_name in self._mtimes.keys() - current.keys():
+            del self._mtimes[plugin_name]
@@ -0,0 +1,88 @@
+import logging
+import os
+from typing import Dict, Optional
+
+import discord
+
+from src.bot.utils.database import db
+
+
+class PrefixResolver:
+    """
+    Callable `command_prefix` that serves per-guild prefixes from memory.
+
+    Prefixes live in the `guilds.prefix` column and are read through the
+    `guilds` entity cache of the database, which bulk-loads them once at
+    startup and drops a guild whenever any bot process writes its row. A
+    message only reaches the database when its guild is not cached yet.
+    """
+
+    def __init__(self, default_prefix: Optional[str] = None,
+                 maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        self.default_prefix = default_prefix or os.getenv("DISCORD_PREFIX", "!")
+        self.guilds = db.entity(
+            "guilds", "guild_id", ("prefix",),
+            maxsize=maxsize or int(os.getenv("PREFIX_CACHE_SIZE", "10000")),
+            ttl=ttl if ttl is not None else float(os.getenv("PREFIX_CACHE_TTL", "3600")),
+        )
+        self.logger = logging.getLogger("mizuki.prefix")
+
+    async def __call__(self, bot, message: discord.Message) -> str:
+        if message.guild is None:
+            return self.default_prefix
+        return await self.get_prefix(message.guild.id)
+
+    async def get_prefix(self, guild_id: int) -> str:
+        if guild_id not in self.guilds and not db.available:
+            return self.default_prefix
+
+        try:
+            row = await self.guilds.get(guild_id)
+        except Exception as e:
+            self.logger.error(f"Failed to fetch prefix for guild {guild_id}: {e}")
+            return self.default_prefix
+
+        return (row["prefix"] if row is not None else None) or self.default_prefix
+
+    async def warm(self) -> int:
+        """Bulk-load stored prefixes into the cache, up to its capacity"""
+        if not db.connected:
+            return 0
+
+        try:
+            rows = await db.fetch(
+                "SELECT guild_id, prefix FROM guilds ORDER BY updated_at DESC LIMIT $1",
+                self.guilds.cache.maxsize,
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to warm prefix cache: {e}")
+            return 0
+
+        loaded = self.guilds.prime_many(reversed(rows))
+        self.logger.info(f"Prefix cache warmed with {loaded} guilds")
+        return loaded
+
+    async def set_prefix(self, guild: discord.Guild, prefix: str) -> None:
+        """Persist a guild prefix and drop the cached value in every process"""
+        await db.execute(
+            """
+            INSERT INTO guilds (guild_id, name, prefix)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (guild_id)
+            DO UPDATE SET prefix = EXCLUDED.prefix, name = EXCLUDED.name,
+                          updated_at = CURRENT_TIMESTAMP
+            """,
+            guild.id, guild.name[:100], prefix,
+        )
+        # Other processes are notified by the table trigger
+        db.invalidate_entities("guilds", [guild.id])
+
+    def invalidate(self, guild_id: Optional[int] = None) -> None:
+        """Drop one guild from the cache, or every guild when no id is given"""
+        if guild_id is None:
+            self.guilds.invalidate()
+        else:
+            self.guilds.invalidate(guild_id)
+
+    def stats(self) -> Dict[str, object]:
+        return {"default_prefix": self.default_prefix, **self.guilds.stats()}
@@ -0,0 +1,450 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Set, Tuple, Union
+
+from src.bot.utils.database import db
+from src.bot.utils.metrics import LatencyHistogram
+
+
+logger = logging.getLogger("mizuki.scheduler")
+
+# Seconds from now, or an absolute datetime (naive ones are read as UTC)
+When = Union[float, int, datetime]
+
+_CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+# minute, hour, day of month, month, day of week (0 or 7 is Sunday)
+_CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def to_timestamp(when: When) -> float:
+    """Converts a delay in seconds or a datetime to a UNIX timestamp"""
+    if isinstance(when, datetime):
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return when.timestamp()
+    return time.time() + float(when)
+
+
+class CronSchedule:
+    """
+    Five-field cron expression evaluated in UTC
+
+    Fields accept `*`, values, ranges `a-b`, lists `a,b` and steps `*/n` or
+    `a-b/n`. As in cron, when both day fields are restricted a day matches
+    if either does.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = _CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression {expression!r} needs 5 fields")
+
+        parsed = [self._parse(field, low, high) for field, (low, high) in zip(fields, _CRON_RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> FrozenSet[int]:
+        values = set()
+        for part in field.split(","):
+            span, _, step = part.partition("/")
+            if span == "*":
+                start, end = low, high
+            elif "-" in span:
+                start, end = (int(value) for value in span.split("-", 1))
+            else:
+                start = end = int(span)
+            if not low <= start <= end <= high:
+                raise ValueError(f"Cron field {field!r} is outside {low}-{high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return frozenset(values)
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, timestamp: float) -> float:
+        """
+        Returns the first matching minute strictly after a timestamp
+
+        Raises:
+            ValueError: If the expression never matches, e.g. February 30th
+        """
+        moment = datetime.fromtimestamp(timestamp, timezone.utc).replace(second=0, microsecond=0)
+        moment += timedelta(minutes=1)
+        limit = moment.year + 5
+
+        # Skip whole months, days and hours that cannot match
+        while moment.year <= limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+
+class Job:
+    """A scheduled callback with its trigger, limits and run accounting"""
+
+    def __init__(self, name: str, owner: str, callback: Callable[..., Awaitable[Any]], *,
+                 interval: Optional[float] = None, cron: Optional[CronSchedule] = None,
+                 run_at: Optional[float] = None, jitter: float = 0.0, max_concurrency: int = 1,
+                 job_id: Optional[str] = None, payload: Any = None, persisted: bool = False):
+        self.id = job_id or uuid.uuid4().hex
+        self.name = name
+        self.owner = owner
+        self.callback = callback
+        self.interval = interval
+        self.cron = cron
+        self.run_at = run_at
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        self.payload = payload
+        self.persisted = persisted
+
+        self.next_run: Optional[float] = None
+        self.cancelled = False
+        self.finished = False
+        self.running = 0
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.run_time = LatencyHistogram()
+        self.lag = LatencyHistogram()
+        self._entry = 0
+        self._base = 0.0
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def kind(self) -> str:
+        if self.interval is not None:
+            return f"every {self.interval:g}s"
+        if self.cron is not None:
+            return f"cron {self.cron.expression}"
+        return "once"
+
+    def first_run(self, now: float) -> float:
+        if self.run_at is not None:
+            self._base = self.run_at
+        elif self.interval is not None:
+            # A full interval first, so jobs added at startup do not all fire at once
+            self._base = now + self.interval
+        else:
+            self._base = self.cron.next_after(now)
+        return self._base + random.uniform(0, self.jitter)
+
+    def following_run(self, now: float) -> Optional[float]:
+        if self.interval is not None:
+            # Keep the cadence, but never try to catch up on missed runs: after a
+            # stall the next run is the first slot of the cadence still ahead
+            self._base += self.interval
+            if self._base <= now:
+                self._base += (math.floor((now - self._base) / self.interval) + 1) * self.interval
+        elif self.cron is not None:
+            self._base = self.cron.next_after(max(self._base, now))
+        else:
+            return None
+        return self._base + random.uniform(0, self.jitter)
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "owner": self.owner,
+            "kind": self.kind,
+            "persisted": self.persisted,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "running": self.running,
+            "next_run_in": round(self.next_run - now, 3) if self.next_run is not None else None,
+            "run_time": self.run_time.summary(),
+            "lag": self.lag.summary(),
+        }
+
+
+class Scheduler:
+    """
+    Periodic, cron and delayed jobs for every plugin, driven by one timer.
+
+    All jobs share a heap ordered by next run time and a single loop timer
+    armed for the earliest one. Each run is a task; a job already running
+    `max_concurrency` times skips its turn. Jobs scheduled with
+    `schedule_persistent` are stored in `scheduled_jobs` and run by
+    whichever process claims (deletes) the row first, so they survive
+    restarts and run at most once.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self.handlers: Dict[Tuple[str, str], Callable[[Any], Awaitable[Any]]] = {}
+        self._heap: List[Tuple[float, int, Job]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at = math.inf
+        self._started = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    # Jobs
+
+    def add(self, job: Job) -> Job:
+        if job.cancelled or job.id in self.jobs:
+            return job
+        self.jobs[job.id] = job
+        self._push(job, job.first_run(time.time()))
+        return job
+
+    def cancel(self, job: Job):
+        """
+        Stops a job and any run of it still in progress
+
+        Runs of a persisted job are left to finish: they have already claimed
+        (deleted) the job's row, so cancelling them would lose the job.
+        """
+        job.cancelled = True
+        job.next_run = None
+        if self.jobs.get(job.id) is job:
+            del self.jobs[job.id]
+        if job.persisted:
+            return
+        for task in list(job._tasks):
+            # A job may cancel itself from its own callback; let that run finish
+            if task is not asyncio.current_task():
+                task.cancel()
+
+    def _push(self, job: Job, when: float):
+        job.next_run = when
+        job._entry = next(self._seq)
+        heapq.heappush(self._heap, (when, job._entry, job))
+        if self._started and when < self._timer_at:
+            self._arm()
+
+    def _arm(self):
+        # Cancelled jobs are dropped lazily, when they reach the top
+        while self._heap and (self._heap[0][2].cancelled or self._heap[0][1] != self._heap[0][2]._entry):
+            heapq.heappop(self._heap)
+
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._timer_at = math.inf
+        if not self._heap:
+            return
+
+        self._timer_at = self._heap[0][0]
+        self._timer = asyncio.get_running_loop().call_later(max(0.0, self._timer_at - time.time()), self._tick)
+
+    def _tick(self):
+        self._timer = None
+        self._timer_at = math.inf
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            when, entry, job = heapq.heappop(self._heap)
+            if job.cancelled or entry != job._entry:
+                continue
+            self._fire(job, when)
+
+            following = job.following_run(now)
+            if following is None:
+                job.next_run = None
+                job.finished = True
+                self.jobs.pop(job.id, None)
+            else:
+                self._push(job, following)
+        self._arm()
+
+    def _fire(self, job: Job, scheduled: float):
+        if job.running >= job.max_concurrency:
+            job.skipped += 1
+            logger.debug(f"Skipping {job.owner}.{job.name}, {job.running} runs still in progress")
+            return
+
+        job.running += 1
+        task = asyncio.create_task(self._execute(job, scheduled), name=f"job:{job.owner}.{job.name}")
+        job._tasks.add(task)
+        task.add_done_callback(job._tasks.discard)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, job: Job, scheduled: float):
+        start = time.time()
+        job.lag.observe((start - scheduled) * 1000)
+        try:
+            if job.persisted:
+                # Whoever deletes the row runs the job; other processes see nothing
+                claimed = await db.fetchval("DELETE FROM scheduled_jobs WHERE job_id = $1 RETURNING job_id", job.id)
+                if claimed is None:
+                    return
+                try:
+                    await job.callback(job.payload)
+                except asyncio.CancelledError:
+                    # Interrupted by a shutdown: give the row back so the job runs again
+                    await self._restore(job)
+                    raise
+            else:
+                await job.callback()
+            job.runs += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            job.failures += 1
+            logger.exception(f"Job {job.owner}.{job.name} failed")
+        finally:
+            job.running -= 1
+            job.run_time.observe((time.time() - start) * 1000)
+
+    # Persisted jobs
+
+    @staticmethod
+    async def _restore(job: Job):
+        try:
+            await db.execute(
+                "INSERT INTO scheduled_jobs (job_id, owner, name, run_at, payload) VALUES ($1, $2, $3, $4, $5) "
+                "ON CONFLICT (job_id) DO NOTHING",
+                job.id, job.owner, job.name, job.run_at, json.dumps(job.payload)
+            )
+        except Exception as e:
+            logger.error(f"Failed to restore interrupted job {job.owner}.{job.name} ({job.id}): {e}")
+
+    def register_handler(self, owner: str, name: str, callback: Callable[[Any], Awaitable[Any]]):
+        """Makes persisted jobs of `owner`/`name` runnable, loading the pending ones"""
+        self.handlers[(owner, name)] = callback
+        if db.connected and self._started:
+            asyncio.create_task(self.load_persisted(owner, name), name=f"jobs:load:{owner}.{name}")
+
+    def unregister_handler(self, owner: str, name: str):
+        """Stops the in-memory timers of a handler's jobs; their rows are kept"""
+        self.handlers.pop((owner, name), None)
+        for job in list(self.jobs.values()):
+            if job.persisted and job.owner == owner and job.name == name:
+                self.cancel(job)
+
+    async def schedule_persistent(self, owner: str, name: str, when: When, payload: Any = None) -> str:
+        """
+        Stores a one-shot job in the database and schedules it
+
+        Args:
+            owner: Plugin name
+            name: Handler name registered by the plugin
+            when: Seconds from now or a datetime
+            payload: JSON-serializable value passed to the handler
+
+        Returns:
+            Job id, usable with cancel_persistent
+        """
+        job_id = uuid.uuid4().hex
+        run_at = to_timestamp(when)
+        await db.execute(
+            "INSERT INTO scheduled_jobs (job_id, owner, name, run_at, payload) VALUES ($1, $2, $3, $4, $5)",
+            job_id, owner, name, run_at, json.dumps(payload)
+        )
+
+        callback = self.handlers.get((owner, name))
+        if callback is not None:
+            self.add(Job(name, owner, callback, run_at=run_at, job_id=job_id, payload=payload, persisted=True))
+        return job_id
+
+    async def cancel_persistent(self, job_id: str) -> bool:
+        """Deletes a persisted job; returns whether it was still pending"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            self.cancel(job)
+        status = await db.execute("DELETE FROM scheduled_jobs WHERE job_id = $1", job_id)
+        return status == "DELETE 1"
+
+    async def load_persisted(self, owner: Optional[str] = None, name: Optional[str] = None) -> int:
+        """
+        Schedules the stored jobs whose handler is registered
+
+        Overdue jobs run right away.
+
+        Returns:
+            Number of jobs scheduled
+        """
+        try:
+            if owner is None:
+                rows = await db.fetch("SELECT job_id, owner, name, run_at, payload FROM scheduled_jobs")
+            else:
+                rows = await db.fetch(
+                    "SELECT job_id, owner, name, run_at, payload FROM scheduled_jobs WHERE owner = $1 AND name = $2",
+                    owner, name
+                )
+        except Exception as e:
+            logger.error(f"Failed to load persisted jobs: {e}")
+            return 0
+
+        loaded = 0
+        for row in rows:
+            callback = self.handlers.get((row["owner"], row["name"]))
+            if callback is None or row["job_id"] in self.jobs:
+                continue
+            self.add(Job(row["name"], row["owner"], callback, run_at=row["run_at"], job_id=row["job_id"],
+                         payload=json.loads(row["payload"]), persisted=True))
+            loaded += 1
+
+        if loaded:
+            logger.info(f"Scheduled {loaded} persisted jobs")
+        return loaded
+
+    # Lifecycle
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        self._arm()
+
+    async def stop(self):
+        """Stops the timer and cancels the runs in progress; interrupted persisted jobs are stored again"""
+        self._started = False
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._timer_at = math.inf
+
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Scheduler state and per-job accounting
+
+        Returns:
+            Dict with the job count, the next timer and each job's runs, failures,
+            skips, run time and lag
+        """
+        now = time.time()
+        jobs = sorted(self.jobs.values(), key=lambda job: job.next_run if job.next_run is not None else math.inf)
+        return {
+            "jobs": len(jobs),
+            "next_timer_in": round(self._timer_at - now, 3) if self._timer else None,
+            "handlers": len(self.handlers),
+            "per_job": [job.stats(now) for job in jobs],
+        }
@@ -0,0 +1,142 @@
+import asyncio
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from src.bot.utils.metrics import LatencyHistogram
+from src.bot.utils.profiler import format_stack, plugin_of
+
+
+logger = logging.getLogger("mizuki.watchdog")
+
+
+class LoopWatchdog:
+    """
+    Measures event loop lag and catches the code that blocks the loop.
+
+    A heartbeat task sleeps `interval` seconds at a time and records how
+    late it wakes up. A daemon thread watches the heartbeat: once it is
+    `threshold_ms` overdue, the loop is stuck in one callback, so the thread
+    captures the loop thread's stack, the running task and the plugin
+    whose code is on that stack while the blocking call is still running.
+    The stall is logged with its full duration when the loop recovers.
+    """
+
+    def __init__(self, threshold_ms: Optional[float] = None, interval: Optional[float] = None, history: int = 20):
+        """
+        Args:
+            threshold_ms: Lag at which the loop counts as blocked (LOOP_LAG_THRESHOLD_MS)
+            interval: Seconds between heartbeats (LOOP_WATCHDOG_INTERVAL)
+            history: Stalls kept for /profile
+        """
+        self.enabled = os.getenv("LOOP_WATCHDOG", "true").lower() in ("1", "true", "yes")
+        self.threshold = (threshold_ms if threshold_ms is not None
+                          else float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250"))) / 1000
+        self.interval = interval if interval is not None else float(os.getenv("LOOP_WATCHDOG_INTERVAL", "0.1"))
+
+        self.lag = LatencyHistogram()
+        self.stalls: Deque[Dict[str, Any]] = collections.deque(maxlen=history)
+        self.stall_count = 0
+
+        self._beat = time.monotonic()
+        self._beats = 0
+        # (heartbeat the stall was caught after, stall) written by the watchdog thread
+        self._captured: Optional[Tuple[int, Dict[str, Any]]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Starts the heartbeat and the watchdog thread; call from the event loop"""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-watchdog")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event loop watchdog started (threshold {self.threshold * 1000:.0f}ms)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.lag.observe(lag * 1000)
+
+            beat = self._beats
+            self._beat = now
+            self._beats += 1
+            captured = self._captured
+            if captured is not None and captured[0] == beat:
+                self._record(captured[1], lag)
+            elif lag >= self.threshold:
+                # Too short for the thread to catch it in the act
+                self._record({"task": None, "coroutine": None, "plugin": None, "stack": [], "at": time.time()}, lag)
+
+    def _watch(self):
+        checked = -1
+        while not self._stopping.wait(self.interval / 2):
+            beat = self._beats
+            overdue = time.monotonic() - self._beat - self.interval
+            if overdue < self.threshold or beat == checked:
+                continue
+            # The loop is blocked right now; its thread's stack shows by what
+            checked = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            try:
+                task = asyncio.current_task(self._loop)
+            except RuntimeError:
+                task = None
+            self._captured = (beat, {
+                "task": task.get_name() if task else None,
+                "coroutine": getattr(task.get_coro(), "__qualname__", None) if task else None,
+                "plugin": plugin_of(frame),
+                "stack": format_stack(frame),
+                "at": time.time(),
+            })
+            del frame
+
+    def _record(self, stall: Dict[str, Any], lag: float):
+        stall["lag_ms"] = round(lag * 1000, 1)
+        self.stalls.append(stall)
+        self.stall_count += 1
+        self._captured = None
+
+        culprit = f"plugin {stall['plugin']}" if stall['plugin'] else "core code"
+        if stall['stack']:
+            logger.warning(f"Event loop blocked for {stall['lag_ms']:.0f}ms by {culprit} "
+                           f"(task {stall['task']}), stack when caught:\n  " + "\n  ".join(stall['stack']))
+        else:
+            logger.warning(f"Event loop blocked for {stall['lag_ms']:.0f}ms")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold * 1000,
+            "lag": self.lag.summary(),
+            "stalls": self.stall_count,
+            "recent": list(self.stalls),
+        }
@@ -1,7 +1,24 @@
+import asyncio
 import discord
+import io
+import threading
+import time
+from datetime import datetime, timezone
 from discord import app_commands
 from discord.ext import commands
+from typing import Dict, List, Tuple
 from src.bot.plugins.base_plugin import BasePlugin
+from src.bot.utils.cache import PLUGINS_TAG
+from src.bot.utils.database import db
+from src.bot.utils.profiler import SamplingProfiler
+
+# Seconds the usage lines of /plugins are reused before being recomputed
+USAGE_TTL = 5.0
+
+
+async def is_bot_owner(interaction: discord.Interaction) -> bool:
+    """App command check: the process-wide commands are for the bot owner, not guild admins"""
+    return await interaction.client.is_owner(interaction.user)
 
 
 class AdminPlugin(BasePlugin):
@@ -12,31 +29,431 @@ class AdminPlugin(BasePlugin):
     PLUGIN_AUTHOR = "Mizuki Team"
 
     async def setup(self):
+        self._profiling = asyncio.Lock()
+
         @app_commands.command(name="plugins", description="List all loaded plugins")
         @app_commands.default_permissions(administrator=True)
         async def plugins_list(interaction: discord.Interaction):
-            plugins_info = self.bot.plugin_manager.list_plugins()
+            # The plugin list only changes on load/unload/reload; usage is refreshed every few seconds
+            fields = await self.cached_response("plugins", self._render_plugin_fields, tags=(PLUGINS_TAG,))
+            usage = await self.cached_response("plugins:usage", self._render_plugin_usage,
+                                               tags=(PLUGINS_TAG,), ttl=USAGE_TTL)
 
-            if not plugins_info:
+            if not fields:
                 await interaction.response.send_message("❌ No plugins loaded")
                 return
 
+            # The cluster query can outlast Discord's 3s window for the first response
+            await interaction.response.defer(thinking=True)
+            cluster_stats = await self.bot.get_cluster_stats()
+
             embed = discord.Embed(title="🔌 Loaded Plugins", color=0x7289DA)
 
-            for plugin_info in plugins_info:
-                if plugin_info:
-                    value = (f"**Version:** {plugin_info['version']}\n"
-                             f"**Description:** {plugin_info['description']}\n"
-                             f"**Author:** {plugin_info['author']}\n"
-                             f"**Commands:** {plugin_info['commands']['prefix_commands']} prefix, "
-                             f"{plugin_info['commands']['slash_commands']} slash")
+            for plugin_name, name, value in fields:
+                if plugin_name in usage:
+                    value += usage[plugin_name]
+                embed.add_field(name=name, value=value, inline=False)
 
-                    embed.add_field(
-                        name=f"📦 {plugin_info['name']}",
-                        value=value,
-                        inline=False
-                    )
+            # Clusters whose plugin set differs from this one (e.g. after a partial reload)
+            local_plugins = sorted(self.bot.plugin_manager.plugins)
+            clusters = cluster_stats['clusters']
+            in_sync = sum(1 for cluster in clusters if cluster['plugins'] == local_plugins)
+            embed.set_footer(text=f"Same plugins on {in_sync}/{len(clusters)} clusters")
 
-            await interaction.response.send_message(embed=embed)
+            await interaction.followup.send(embed=embed)
 
         self.register_slash_command(plugins_list)
+
+        @app_commands.command(name="prefix", description="Change the command prefix for this server")
+        @app_commands.describe(prefix="New prefix (max 10 characters)")
+        @app_commands.default_permissions(administrator=True)
+        @app_commands.guild_only()
+        async def prefix_set(interaction: discord.Interaction, prefix: app_commands.Range[str, 1, 10]):
+            try:
+                await self.bot.prefixes.set_prefix(interaction.guild, prefix)
+            except Exception as e:
+                self.logger.error(f"Failed to set prefix for guild {interaction.guild_id}: {e}")
+                await interaction.response.send_message("❌ Could not save the new prefix", ephemeral=True)
+                return
+
+            await interaction.response.send_message(f"✅ Prefix changed to `{prefix}`")
+
+        self.register_slash_command(prefix_set)
+
+        @app_commands.command(name="cache", description="Show prefix and response cache statistics")
+        @app_commands.default_permissions(administrator=True)
+        async def cache_stats(interaction: discord.Interaction):
+            stats = self.bot.prefixes.stats()
+            responses = self.bot.response_cache.stats()
+
+            embed = discord.Embed(title="🗃️ Caches", color=0x7289DA)
+            embed.add_field(name="Entries", value=f"{stats['size']}/{stats['maxsize']}", inline=True)
+            embed.add_field(name="Hit ratio", value=f"{stats['hit_ratio']:.1%}", inline=True)
+            embed.add_field(name="TTL", value=f"{stats['ttl']:.0f}s" if stats['ttl'] else "none", inline=True)
+            embed.add_field(name="Hits", value=str(stats['hits']), inline=True)
+            embed.add_field(name="Misses", value=str(stats['misses']), inline=True)
+            embed.add_field(name="Evictions", value=str(stats['evictions']), inline=True)
+
+            invalidations = f"{stats['invalidations']} dropped · "
+            if db.listener is None:
+                invalidations += "local writes only"
+            else:
+                listener = db.listener.stats()
+                invalidations += (f"{'🟢 listening' if listener['live'] else '🔴 listener down'} · "
+                                  f"{listener['notifications']} notifications")
+            embed.add_field(name="Invalidations", value=invalidations, inline=False)
+            embed.add_field(
+                name="Response cache",
+                value=(f"{responses['size']}/{responses['max_entries']} entries · "
+                       f"{responses['bytes'] / 1024:.1f}/{responses['max_bytes'] / 1024:.0f} KiB\n"
+                       f"hit ratio {responses['hit_ratio']:.1%} · {responses['invalidations']} invalidated · "
+                       f"{responses['evictions']} evicted"),
+                inline=False
+            )
+
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
+        self.register_slash_command(cache_stats)
+
+        @app_commands.command(name="dbstats", description="Show database pool and query statistics")
+        @app_commands.default_permissions(administrator=True)
+        async def db_stats(interaction: discord.Interaction):
+            stats = db.get_stats(top=5)
+            pool = stats['pool']
+            wait = stats['acquire_wait']
+
+            health = stats['health']
+
+            embed = discord.Embed(title="🗄️ Database", color=0x7289DA)
+            if pool['connected']:
+                if 'limit' in pool:
+                    pool_value = (f"**In use:** {pool['in_use']}/{pool['limit']} "
+                                  f"(range {pool['min_size']}-{pool['max_size']}, {pool['resizes']} resizes)\n"
+                                  f"**Open:** {pool['size']} · **Waiting:** {pool['waiting']}\n")
+                else:
+                    pool_value = f"**In use:** {pool['size'] - pool['idle']}/{pool['max_size']}\n"
+                pool_value += f"**Exhausted:** {pool['exhausted']} times"
+                if 'write_queue' in pool:
+                    pool_value += (f"\n**Write queue:** {pool['write_queue']} · "
+                                   f"{pool['writes_per_commit']} writes/commit")
+            elif health['reconnecting']:
+                pool_value = f"🔄 Reconnecting (attempt {health['reconnect_attempts']})"
+            else:
+                pool_value = "❌ Not connected"
+            embed.add_field(name="Pool", value=pool_value, inline=True)
+
+            health_icon = {"closed": "🟢", "half-open": "🟡", "open": "🔴"}[health['state']]
+            health_value = (f"{health_icon} Circuit {health['state']} · opened {health['times_opened']} times · "
+                            f"{health['rejected']} calls rejected")
+            if health['state'] != "closed" or not pool['connected']:
+                health_value += f"\n`{(health['last_error'] or 'unknown error')[:200]}`"
+            embed.add_field(name="Health", value=health_value, inline=False)
+            embed.add_field(
+                name="Acquire wait",
+                value=f"p50 `{wait['p50_ms']}ms` · p95 `{wait['p95_ms']}ms` · max `{wait['max_ms']}ms`",
+                inline=True
+            )
+
+            ingest = self.bot.ingestor.stats()
+            if ingest['enabled']:
+                embed.add_field(
+                    name="Member ingest",
+                    value=(f"{ingest['members']} members from {ingest['guilds']} guilds · "
+                           f"{ingest['written']} written · {ingest['rows_per_s']} rows/s · "
+                           f"{ingest['failures']} failures"
+                           + (" · 🔄 running" if ingest['running'] else "")),
+                    inline=False
+                )
+
+            for query in stats['queries']:
+                label = query['query'] if len(query['query']) <= 200 else query['query'][:197] + "..."
+                embed.add_field(
+                    name=f"{'⚡ ' if query['prepared'] else ''}{query['count']} calls · {query['total_ms']:.0f}ms total",
+                    value=(f"```sql\n{label}```"
+                           f"p50 `{query['p50_ms']}ms` · p99 `{query['p99_ms']}ms` · "
+                           f"slow {query['slow']} · errors {query['errors']}"),
+                    inline=False
+                )
+
+            embed.set_footer(text=f"Backend: {stats['backend']} · Slow query threshold: {stats['slow_query_ms']:.0f}ms")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
+        self.register_slash_command(db_stats)
+
+        @app_commands.command(name="outbound", description="Show outbound REST queue statistics")
+        @app_commands.default_permissions(administrator=True)
+        async def outbound_stats(interaction: discord.Interaction):
+            stats = self.bot.outbound.stats(top=5)
+            gate = stats['gate']
+
+            embed = discord.Embed(title="📤 Outbound Queue", color=0x7289DA)
+            embed.add_field(
+                name="In flight",
+                value=f"{gate['active']}/{gate['limit']} · {gate['waiting']} waiting · {stats['pending_edits']} pending edits",
+                inline=False
+            )
+
+            for kind, kind_stats in stats['kinds'].items():
+                wait = kind_stats['wait']
+                embed.add_field(
+                    name=kind.capitalize(),
+                    value=(f"{kind_stats['completed']} sent · {kind_stats['failed']} failed · "
+                           f"{kind_stats['coalesced']} edits merged\n"
+                           f"wait p50 `{wait['p50_ms']}ms` · p95 `{wait['p95_ms']}ms` · max `{wait['max_ms']}ms`"),
+                    inline=False
+                )
+
+            if stats['buckets']:
+                embed.add_field(
+                    name="Busiest buckets",
+                    value="\n".join(
+                        f"`{bucket['bucket']}` {bucket['queued']} queued, oldest {bucket['oldest_wait_ms']:.0f}ms"
+                        for bucket in stats['buckets']
+                    ),
+                    inline=False
+                )
+
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
+        self.register_slash_command(outbound_stats)
+
+        @app_commands.command(name="events", description="Show event bus dispatch statistics")
+        @app_commands.default_permissions(administrator=True)
+        async def event_stats(interaction: discord.Interaction):
+            stats = self.bot.events.stats()
+
+            embed = discord.Embed(title="📡 Event Bus", color=0x7289DA)
+            if not stats:
+                embed.description = "No plugin listens to gateway events"
+
+            for event, event_stats in list(stats.items())[:25]:
+                embed.add_field(
+                    name=f"{event} · {event_stats['dispatched']} dispatched",
+                    value="\n".join(
+                        f"`{handler['handler']}` {handler['calls']} calls · {handler['filtered']} filtered · "
+                        f"{handler['dropped']} dropped · {handler['errors']} errors · "
+                        f"p50 `{handler['p50_ms']}ms` p99 `{handler['p99_ms']}ms`"
+                        for handler in event_stats['handlers']
+                    )[:1024],
+                    inline=False
+                )
+
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
+        self.register_slash_command(event_stats)
+
+        @app_commands.command(name="jobs", description="Show scheduled background jobs")
+        @app_commands.default_permissions(administrator=True)
+        async def job_stats(interaction: discord.Interaction):
+            stats = self.bot.scheduler.stats()
+
+            embed = discord.Embed(title="⏰ Scheduled Jobs", color=0x7289DA)
+            embed.description = f"{stats['jobs']} jobs · {stats['handlers']} persisted job handlers"
+
+            for job in stats['per_job'][:20]:
+                next_run = f"in {job['next_run_in']:.0f}s" if job['next_run_in'] is not None else "running"
+                embed.add_field(
+                    name=f"{'💾 ' if job['persisted'] else ''}{job['owner']}.{job['name']} · {job['kind']}",
+                    value=(f"next {next_run} · {job['runs']} runs · {job['failures']} failed · "
+                           f"{job['skipped']} skipped\n"
+                           f"run p50 `{job['run_time']['p50_ms']}ms` · lag p95 `{job['lag']['p95_ms']}ms`"),
+                    inline=False
+                )
+
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
+        self.register_slash_command(job_stats)
+
+        @app_commands.command(name="shards", description="Show latency and guilds per shard")
+        @app_commands.default_permissions(administrator=True)
+        async def shards_info(interaction: discord.Interaction):
+            # The cluster query can outlast Discord's 3s window for the first response
+            await interaction.response.defer(ephemeral=True, thinking=True)
+            stats = await self.bot.get_cluster_stats()
+
+            embed = discord.Embed(
+                title="🛰️ Shards",
+                description=(f"**Guilds:** {stats['guilds']}\n"
+                             f"**Shards:** {len(stats['shards'])}/{stats['shard_count']} "
+                             f"in {len(stats['clusters'])} clusters"),
+                color=0x7289DA
+            )
+
+            for cluster in stats['clusters'][:25]:
+                lines = []
+                for shard in cluster['shards']:
+                    latency = f"{shard['latency_ms']}ms" if shard['latency_ms'] is not None else "n/a"
+                    lines.append(f"`#{shard['shard_id']}` {latency} · {shard['guilds']} guilds")
+                embed.add_field(
+                    name=f"Cluster {cluster['cluster']}{'' if cluster['ready'] else ' (starting)'}",
+                    value="\n".join(lines)[:1024] or "No shards",
+                    inline=True
+                )
+
+            await interaction.followup.send(embed=embed, ephemeral=True)
+
+        self.register_slash_command(shards_info)
+
+        @app_commands.command(name="sync", description="Sync slash commands with Discord")
+        @app_commands.describe(force="Sync even if the command tree has not changed")
+        @app_commands.default_permissions(administrator=True)
+        async def sync_commands(interaction: discord.Interaction, force: bool = False):
+            await interaction.response.defer(ephemeral=True, thinking=True)
+
+            try:
+                result = await self.bot.command_sync.sync(force=force)
+            except Exception as e:
+                self.logger.error(f"Failed to sync commands: {e}")
+                await interaction.followup.send(f"❌ Sync failed: {e}", ephemeral=True)
+                return
+
+            if not result['global'] and not result['guilds']:
+                await interaction.followup.send("✅ Commands already up to date, nothing synced", ephemeral=True)
+                return
+
+            await interaction.followup.send(
+                f"✅ Synced {'global commands' if result['global'] else 'no global commands'}"
+                f" and {len(result['guilds'])} guilds",
+                ephemeral=True
+            )
+
+        self.register_slash_command(sync_commands)
+
+        @app_commands.command(name="reload", description="Reload a plugin from disk without restarting")
+        @app_commands.describe(plugin="Plugin package name (e.g. ping)")
+        @app_commands.default_permissions(administrator=True)
+        async def reload_plugin(interaction: discord.Interaction, plugin: str):
+            # Import and setup may take up to PLUGIN_SETUP_TIMEOUT
+            await interaction.response.defer(ephemeral=True, thinking=True)
+
+            start = time.perf_counter()
+            success = await self.bot.plugin_manager.reload_plugin(plugin)
+            elapsed = (time.perf_counter() - start) * 1000
+
+            if success:
+                await interaction.followup.send(f"✅ Plugin `{plugin}` reloaded in {elapsed:.1f}ms", ephemeral=True)
+            else:
+                await interaction.followup.send(
+                    f"❌ Could not reload `{plugin}`, the running version was kept", ephemeral=True
+                )
+
+        self.register_slash_command(reload_plugin)
+
+        @app_commands.command(name="profile", description="Sample the running bot and report where the event loop spends its time")
+        @app_commands.describe(seconds="How long to sample for", top="Rows per table in the report")
+        @app_commands.default_permissions(administrator=True)
+        @app_commands.check(is_bot_owner)
+        async def profile_bot(interaction: discord.Interaction,
+                              seconds: app_commands.Range[int, 1, 60] = 10,
+                              top: app_commands.Range[int, 5, 100] = 25):
+            if self._profiling.locked():
+                await interaction.response.send_message("⏳ A profile is already running", ephemeral=True)
+                return
+
+            await interaction.response.defer(ephemeral=True, thinking=True)
+            async with self._profiling:
+                # The sampler runs on a worker thread and samples this (the event loop's) thread
+                profiler = SamplingProfiler(threading.get_ident())
+                await asyncio.to_thread(profiler.run, seconds)
+
+            report = profiler.report(top=top, header=self._watchdog_report())
+            summary = profiler.summary(top=5)
+            lag = self.bot.watchdog.stats()['lag']
+
+            embed = discord.Embed(title="🔬 Profile", color=0x7289DA)
+            embed.description = (f"{summary['samples']} samples in {summary['duration']:.1f}s · "
+                                 f"event loop busy {summary['busy_ratio']:.1%}")
+            embed.add_field(
+                name="Busy by plugin",
+                value="\n".join(f"`{plugin}` {count / (summary['busy'] or 1):.1%}"
+                                 for plugin, count in summary['plugins']) or "Idle the whole time",
+                inline=True
+            )
+            embed.add_field(
+                name="Loop lag",
+                value=(f"p50 `{lag['p50_ms']}ms` · p99 `{lag['p99_ms']}ms` · max `{lag['max_ms']}ms`\n"
+                       f"{self.bot.watchdog.stall_count} stalls"),
+                inline=True
+            )
+            if summary['functions']:
+                embed.add_field(
+                    name="Hottest functions (self time)",
+                    value="\n".join(f"`{name[:80]}` {count / summary['busy']:.1%}"
+                                     for name, count in summary['functions'])[:1024],
+                    inline=False
+                )
+
+            filename = f"profile-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.txt"
+            await interaction.followup.send(
+                embed=embed, file=discord.File(io.BytesIO(report.encode("utf-8")), filename=filename), ephemeral=True
+            )
+
+        @profile_bot.error
+        async def profile_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+            if isinstance(error, app_commands.CheckFailure) and not interaction.response.is_done():
+                await interaction.response.send_message("❌ Only the bot owner can profile the bot", ephemeral=True)
+
+        self.register_slash_command(profile_bot)
+
+    def _watchdog_report(self) -> List[str]:
+        """Watchdog lines for the profile report header"""
+        stats = self.bot.watchdog.stats()
+        if not stats['enabled']:
+            return ["Loop watchdog disabled (LOOP_WATCHDOG=false)"]
+
+        lag = stats['lag']
+        lines = [f"Loop lag p50 {lag['p50_ms']}ms, p99 {lag['p99_ms']}ms, max {lag['max_ms']}ms; "
+                 f"{stats['stalls']} stalls over {stats['threshold_ms']:.0f}ms since startup"]
+        for stall in reversed(stats['recent']):
+            when = datetime.fromtimestamp(stall['at'], timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            lines.append(f"  {when} UTC blocked {stall['lag_ms']:.0f}ms, plugin {stall['plugin'] or '-'}, "
+                         f"task {stall['task'] or '-'} ({stall['coroutine'] or '-'})")
+            lines += [f"      {frame}" for frame in stall['stack']]
+        return lines
+
+    def _render_plugin_fields(self) -> List[Tuple[str, str, str]]:
+        fields = []
+        for plugin_info in self.bot.plugin_manager.list_plugins():
+            if not plugin_info:
+                continue
+            value = (f"**Version:** {plugin_info['version']}\n"
+                     f"**Description:** {plugin_info['description']}\n"
+                     f"**Author:** {plugin_info['author']}\n"
+                     f"**Commands:** {plugin_info['commands']['prefix_commands']} prefix, "
+                     f"{plugin_info['commands']['slash_commands']} slash")
+            timings = plugin_info['load_timings']
+            if timings:
+                value += (f"\n**Startup:** import {timings.get('import_ms', 0):.1f}ms, "
+                          f"setup {timings.get('setup_ms', 0):.1f}ms")
+            fields.append((
+                plugin_info['name'],
+                f"📦 {plugin_info['name']}{'' if plugin_info['loaded'] else ' (lazy)'}",
+                value
+            ))
+        return fields
+
+    def _render_plugin_usage(self) -> Dict[str, str]:
+        lines = {}
+        for plugin in self.bot.plugin_manager.plugins.values():
+            usage = plugin.get_command_stats()
+            if not usage['invocations']:
+                continue
+            line = f"\n**Usage:** {usage['invocations']} calls, {usage['errors']} errors"
+            if usage['throttled']:
+                line += f", {usage['throttled']} throttled"
+            slowest = self._slowest_command(usage)
+            if slowest:
+                line += f", slowest {slowest[0]} p95 {slowest[1]:.0f}ms"
+            lines[plugin.PLUGIN_NAME] = line
+        return lines
+
+    @staticmethod
+    def _slowest_command(usage: dict):
+        """Returns the display name and p95 wall time of the slowest command that ran"""
+        candidates = [
+            (f"/{name}" if kind == "slash" else f"`{name}`", stats['wall']['p95_ms'])
+            for kind in ("slash", "prefix")
+            for name, stats in usage.get(kind, {}).items()
+            if stats['invocations']
+        ]
+        return max(candidates, key=lambda candidate: candidate[1], default=None)
@@ -1,9 +1,22 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
+import inspect
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Callable, Collection, Iterable, Union
+
+from src.bot.core.command_tree import COMMAND_STATS, RateLimited
+from src.bot.core.events import EventHandler, compile_filters
+from src.bot.core.scheduler import CronSchedule, Job, When, to_timestamp
+from src.bot.utils.cache import plugin_tag
+from src.bot.utils.metrics import CommandStats
+from src.bot.utils.ratelimit import SCOPES, Bucket, RateLimit, RateLimits
+
+
+_NOT_CACHED = object()
+
 
 class BasePlugin(ABC):
     PLUGIN_NAME: str = "BasePlugin"
@@ -11,6 +24,20 @@ class BasePlugin(ABC):
     PLUGIN_VERSION: str = "1.0"
     PLUGIN_AUTHOR: str = ""
     PLUGIN_EMAIL: str = ""
+    # Plugin package names that must be set up before this one
+    PLUGIN_DEPENDENCIES: Tuple[str, ...] = ()
+
+    # Gateway needs, read from the class before the bot connects.
+    # The bot only requests the union of what the loaded plugins declare.
+    REQUIRED_INTENTS: Tuple[str, ...] = ()    # discord.Intents flag names, e.g. ("members",)
+    MEMBER_CACHE: Tuple[str, ...] = ()        # discord.MemberCacheFlags names: "joined", "voice"
+    MESSAGE_CACHE_SIZE: int = 0               # messages kept for edit/delete events
+    CHUNK_GUILDS: bool = False                # request full member lists at startup
+
+    # Default limits for every command of the plugin, scope -> (calls, seconds).
+    # Scopes are "user", "channel", "guild" and "plugin" (shared by all callers
+    # of all the plugin's commands). Commands can override them at registration.
+    RATE_LIMITS: Dict[str, Tuple[int, float]] = {}
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
@@ -18,7 +45,17 @@ class BasePlugin(ABC):
 
         self._prefix_commands: List[commands.Command] = []
         self._slash_commands: List[app_commands.Command] = []
-        self._event_listeners: Dict[str, Any] = {}
+        # Guild ids for slash commands registered per guild instead of globally
+        self._slash_command_guilds: Dict[str, List[int]] = {}
+        self._event_listeners: List[EventHandler] = []
+        # Background jobs and persisted job handlers, started and cancelled with the plugin
+        self._jobs: List[Job] = []
+        self._job_handlers: Dict[str, Callable[[Any], Any]] = {}
+        # Registrations made during setup() are staged and added to the bot in
+        # one synchronous step by attach(), so a reload swaps commands atomically
+        self._attached = False
+        # Per-command accounting, filled in by the wrappers added at registration
+        self._command_stats: Dict[str, Dict[str, CommandStats]] = {"prefix": {}, "slash": {}}
 
     @abstractmethod
     async def setup(self) -> None:
@@ -29,26 +66,344 @@ class BasePlugin(ABC):
         self.logger.info(f"Plugin {self.PLUGIN_NAME} teardown")
 
     async def _cleanup_commands(self):
+        self.detach()
+
+    def _slash_targets(self, command) -> List[Optional[discord.Object]]:
+        guild_ids = self._slash_command_guilds.get(command.name)
+        if guild_ids:
+            return [discord.Object(id=guild_id) for guild_id in guild_ids]
+        return [None]
+
+    def attach(self):
+        """Adds every staged command and listener to the bot"""
+        if self._attached:
+            return
+
+        self._attached = True
+        try:
+            for command in self._prefix_commands:
+                self.bot.add_command(command)
+            for command in self._slash_commands:
+                self._add_slash_command(command)
+            for handler in self._event_listeners:
+                self.bot.events.add(handler)
+            for job in self._jobs:
+                self.bot.scheduler.add(job)
+            for name, callback in self._job_handlers.items():
+                self.bot.scheduler.register_handler(self.PLUGIN_NAME, name, callback)
+        except Exception:
+            self.detach()
+            raise
+
+    def detach(self):
+        """Removes this plugin's commands and listeners from the bot, leaving others untouched"""
+        if not self._attached:
+            return
+
         for command in self._prefix_commands:
-            self.bot.remove_command(command.name)
+            if self.bot.get_command(command.name) is command:
+                self.bot.remove_command(command.name)
 
         for command in self._slash_commands:
-            self.bot.tree.remove_command(command.name, type=command.type)
+            # Only context menus carry a type; slash commands and groups are chat input
+            command_type = getattr(command, "type", discord.AppCommandType.chat_input)
+            for guild in self._slash_targets(command):
+                if self.bot.tree.get_command(command.name, guild=guild, type=command_type) is command:
+                    self.bot.tree.remove_command(command.name, guild=guild, type=command_type)
+
+        for handler in self._event_listeners:
+            self.bot.events.remove(handler)
+
+        for job in self._jobs:
+            self.bot.scheduler.cancel(job)
+        for name in self._job_handlers:
+            self.bot.scheduler.unregister_handler(self.PLUGIN_NAME, name)
+
+        self._attached = False
+
+    def _add_slash_command(self, command):
+        guilds = [guild for guild in self._slash_targets(command) if guild is not None]
+        if guilds:
+            self.bot.tree.add_command(command, guilds=guilds)
+        else:
+            self.bot.tree.add_command(command)
 
-        for event_name, listener in self._event_listeners.items():
-            self.bot.remove_listener(listener, event_name)
+    def _rate_limit_buckets(self, command_name: str,
+                            rate_limits: Optional[RateLimits]) -> List[Tuple[str, Bucket]]:
+        overrides = rate_limits or {}
+        buckets = []
+        for scope, limit in {**self.RATE_LIMITS, **overrides}.items():
+            if scope not in SCOPES:
+                raise ValueError(f"Unknown rate limit scope {scope!r}, expected one of {', '.join(SCOPES)}")
+            if limit is None:
+                continue
+            # The plugin-wide default is one bucket for all commands; overrides get their own
+            owner = "*" if scope == "plugin" and scope not in overrides else command_name
+            buckets.append((scope, self.bot.rate_limiter.bucket((self.PLUGIN_NAME, owner, scope), RateLimit(*limit))))
+        return buckets
 
-    def register_prefix_command(self, command: commands.Command):
-        self.bot.add_command(command)
+    def _throttle(self, buckets: List[Tuple[str, Bucket]], user_id: int,
+                  channel_id: Optional[int], guild_id: Optional[int]) -> float:
+        keys = {"user": user_id, "channel": channel_id, "guild": guild_id, "plugin": 0}
+        return self.bot.rate_limiter.check([(bucket, keys[scope]) for scope, bucket in buckets if keys[scope] is not None])
+
+    async def on_rate_limited(self, target, retry_after: float):
+        """Tells a throttled caller when to retry; override to customise the reply"""
+        message = f"⏳ Slow down! Try again in {retry_after:.1f}s"
+        try:
+            if isinstance(target, discord.Interaction):
+                await self.bot.outbound.respond(target, content=message, ephemeral=True)
+            else:
+                await self.bot.outbound.send(target, content=message, delete_after=min(retry_after, 10))
+        except discord.HTTPException as e:
+            self.logger.debug(f"Could not send rate limit notice: {e}")
+
+    def _instrument_prefix_command(self, command: commands.Command, rate_limits: Optional[RateLimits] = None):
+        stats = self._command_stats["prefix"].setdefault(command.qualified_name, CommandStats())
+        buckets = self._rate_limit_buckets(command.qualified_name, rate_limits)
+        original = command.invoke
+
+        async def invoke(ctx: commands.Context, /):
+            if buckets:
+                retry_after = self._throttle(buckets, ctx.author.id, ctx.channel.id, ctx.guild.id if ctx.guild else None)
+                if retry_after:
+                    stats.throttled += 1
+                    await self.on_rate_limited(ctx, retry_after)
+                    return
+
+            start = time.perf_counter()
+            error = None
+            try:
+                await original(ctx)
+            except Exception as e:
+                error = e.original if isinstance(e, commands.CommandInvokeError) else e
+                raise
+            finally:
+                stats.record((time.perf_counter() - start) * 1000, error=error)
+
+        command.invoke = invoke
+
+    def _instrument_app_command(self, command, rate_limits: Optional[RateLimits] = None):
+        if isinstance(command, app_commands.Group):
+            for subcommand in command.walk_commands():
+                if isinstance(subcommand, app_commands.Command):
+                    self._instrument_app_command(subcommand, rate_limits)
+            return
+
+        command_name = getattr(command, "qualified_name", command.name)
+        stats = self._command_stats["slash"].setdefault(command_name, CommandStats())
+        buckets = self._rate_limit_buckets(command_name, rate_limits)
+        # Timed and recorded by the command tree's hooks (see MizukiCommandTree)
+        command.extras[COMMAND_STATS] = stats
+        if not buckets:
+            return
+
+        async def rate_limit(interaction: discord.Interaction) -> bool:
+            retry_after = self._throttle(buckets, interaction.user.id, interaction.channel_id, interaction.guild_id)
+            if retry_after:
+                stats.throttled += 1
+                await self.on_rate_limited(interaction, retry_after)
+                raise RateLimited(retry_after)
+            return True
+
+        command.add_check(rate_limit)
+
+    def register_prefix_command(self, command: commands.Command,
+                                rate_limits: Optional[RateLimits] = None):
+        self._instrument_prefix_command(command, rate_limits)
         self._prefix_commands.append(command)
+        if self._attached:
+            self.bot.add_command(command)
 
-    def register_slash_command(self, command: app_commands.Command):
-        self.bot.tree.add_command(command)
+    def register_slash_command(self, command: app_commands.Command, guild_ids: Optional[List[int]] = None,
+                               rate_limits: Optional[RateLimits] = None):
+        if guild_ids:
+            self._slash_command_guilds[command.name] = list(guild_ids)
+        self._instrument_app_command(command, rate_limits)
         self._slash_commands.append(command)
+        if self._attached:
+            self._add_slash_command(command)
+
+    def register_event_listener(self, event: str, listener, *, guild_ids: Optional[Collection[int]] = None,
+                                channel_ids: Optional[Collection[int]] = None, ignore_bots: bool = False,
+                                startswith: Union[str, Tuple[str, ...], None] = None,
+                                check: Optional[Callable[..., bool]] = None,
+                                max_pending: Optional[int] = None) -> EventHandler:
+        """
+        Adds a listener routed through the bot's event bus
+
+        The filters are checked before the listener's coroutine is created,
+        so events they reject cost no task. Several listeners may share an event.
+
+        Args:
+            event: Event name, e.g. "on_message" or "message"
+            listener: Coroutine function receiving the event arguments
+            guild_ids: Only events from these guilds
+            channel_ids: Only events from these channels
+            ignore_bots: Skip events whose author or member is a bot
+            startswith: Only messages starting with this text or one of these texts
+            check: Extra synchronous predicate receiving the event arguments
+            max_pending: Calls allowed to run at once before events are dropped
+
+        Returns:
+            The registered EventHandler
+        """
+        if not event.startswith("on_"):
+            event = f"on_{event}"
+        handler = EventHandler(
+            event, listener, self.PLUGIN_NAME,
+            compile_filters(guild_ids, channel_ids, ignore_bots, startswith, check),
+            max_pending=max_pending or self.bot.events.max_pending,
+        )
+        self._event_listeners.append(handler)
+        if self._attached:
+            self.bot.events.add(handler)
+        return handler
 
-    def register_event_listener(self, event: str, listener):
-        self.bot.add_listener(listener, event)
-        self._event_listeners[event] = listener
+    async def cached_response(self, command: str, render: Callable[[], Any], *, args: Tuple = (),
+                              scope: str = "global", source=None, tags: Iterable[str] = (),
+                              ttl: Optional[float] = None) -> Any:
+        """
+        Returns the cached output of `render` for a command, its arguments and a scope
+
+        Args:
+            command: Command name
+            render: Sync or async callable building the response
+            args: Command arguments that change the response
+            scope: "global", "guild" or "user"
+            source: Interaction or Context the guild or user is taken from
+            tags: Extra tags to invalidate the entry with
+            ttl: Seconds the entry stays valid, or None until invalidated
+
+        Returns:
+            The cached or freshly rendered response
+        """
+        if scope == "global":
+            scope_id = None
+        elif scope == "guild":
+            scope_id = source.guild.id if source.guild else None
+        elif scope == "user":
+            scope_id = (getattr(source, "user", None) or source.author).id
+        else:
+            raise ValueError(f"Unknown cache scope {scope!r}, expected global, guild or user")
+
+        key = (self.PLUGIN_NAME, command, tuple(args), scope, scope_id)
+        cache = self.bot.response_cache
+        value = cache.get(key, _NOT_CACHED)
+        if value is _NOT_CACHED:
+            value = render()
+            if inspect.isawaitable(value):
+                value = await value
+            # Responses of a plugin are dropped when it is reloaded or unloaded
+            cache.set(key, value, tags=(plugin_tag(self.PLUGIN_NAME), *tags), ttl=ttl)
+        return value
+
+    def _add_job(self, job: Job) -> Job:
+        # Finished one-shot jobs are forgotten as new ones come in
+        self._jobs = [existing for existing in self._jobs if not existing.finished]
+        self._jobs.append(job)
+        if self._attached:
+            self.bot.scheduler.add(job)
+        return job
+
+    def schedule_interval(self, callback: Callable[[], Any], seconds: float, *, name: Optional[str] = None,
+                          jitter: float = 0.0, max_concurrency: int = 1) -> Job:
+        """
+        Runs a coroutine function every `seconds`, first after one full interval
+
+        Args:
+            callback: Coroutine function without arguments
+            seconds: Interval between runs
+            name: Job name shown in /jobs, defaults to the callback name
+            jitter: Up to this many seconds are added to every run, spreading jobs out
+            max_concurrency: Runs allowed at once; a run due beyond it is skipped
+
+        Returns:
+            The Job, cancelled automatically when the plugin unloads
+        """
+        return self._add_job(Job(name or callback.__name__, self.PLUGIN_NAME, callback,
+                                 interval=seconds, jitter=jitter, max_concurrency=max_concurrency))
+
+    def schedule_cron(self, callback: Callable[[], Any], expression: str, *, name: Optional[str] = None,
+                      jitter: float = 0.0, max_concurrency: int = 1) -> Job:
+        """
+        Runs a coroutine function on a five-field cron expression, in UTC
+
+        Args:
+            callback: Coroutine function without arguments
+            expression: e.g. "*/5 * * * *" or "@daily"
+            name: Job name shown in /jobs, defaults to the callback name
+            jitter: Up to this many seconds are added to every run
+            max_concurrency: Runs allowed at once; a run due beyond it is skipped
+
+        Returns:
+            The Job, cancelled automatically when the plugin unloads
+        """
+        return self._add_job(Job(name or callback.__name__, self.PLUGIN_NAME, callback,
+                                 cron=CronSchedule(expression), jitter=jitter, max_concurrency=max_concurrency))
+
+    def schedule_once(self, callback: Callable[[], Any], when: When, *, name: Optional[str] = None) -> Job:
+        """
+        Runs a coroutine function once, after a delay in seconds or at a datetime
+
+        The job only lives in memory; use `schedule_persistent` for work that
+        has to survive a restart.
+
+        Returns:
+            The Job, cancelled automatically when the plugin unloads
+        """
+        return self._add_job(Job(name or callback.__name__, self.PLUGIN_NAME, callback, run_at=to_timestamp(when)))
+
+    def cancel_job(self, job: Job):
+        """Cancels a job scheduled by this plugin"""
+        self.bot.scheduler.cancel(job)
+        if job in self._jobs:
+            self._jobs.remove(job)
+
+    def register_job_handler(self, name: str, callback: Callable[[Any], Any]):
+        """
+        Registers the coroutine function that runs persisted jobs named `name`
+
+        Pending jobs stored for it are scheduled as soon as the plugin is attached.
+
+        Args:
+            name: Handler name used with schedule_persistent
+            callback: Coroutine function receiving the job payload
+        """
+        self._job_handlers[name] = callback
+        if self._attached:
+            self.bot.scheduler.register_handler(self.PLUGIN_NAME, name, callback)
+
+    async def schedule_persistent(self, handler: str, when: When, payload: Any = None) -> str:
+        """
+        Stores a one-shot job in the database so that it survives restarts
+
+        The job runs at most once, in whichever bot process claims it first.
+
+        Args:
+            handler: Name given to register_job_handler
+            when: Seconds from now or a datetime
+            payload: JSON-serializable value passed to the handler
+
+        Returns:
+            Job id, usable with cancel_persistent
+        """
+        return await self.bot.scheduler.schedule_persistent(self.PLUGIN_NAME, handler, when, payload)
+
+    async def cancel_persistent(self, job_id: str) -> bool:
+        """Deletes a persisted job; returns whether it was still pending"""
+        return await self.bot.scheduler.cancel_persistent(job_id)
+
+    def get_event_stats(self) -> List[Dict[str, Any]]:
+        """Calls, filtered and dropped events and latency of each listener"""
+        return [{"event": handler.event, **handler.stats()} for handler in self._event_listeners]
+
+    def invalidate_responses(self, *tags: str) -> int:
+        """Drops cached responses carrying any of the tags"""
+        return self.bot.response_cache.invalidate_tags(*tags)
+
+    def get_command_guild_ids(self) -> List[int]:
+        return sorted({guild_id for guild_ids in self._slash_command_guilds.values() for guild_id in guild_ids})
 
     def get_metadata(self) -> Dict[str, str]:
         return {
@@ -65,3 +420,17 @@ class BasePlugin(ABC):
             "slash_commands": len(self._slash_commands),
             "event_listeners": len(self._event_listeners)
         }
+
+    def get_command_stats(self) -> Dict[str, Any]:
+        """Invocation counts, latency and errors per command, plus plugin totals"""
+        per_command = {
+            kind: {name: stats.summary() for name, stats in commands_stats.items()}
+            for kind, commands_stats in self._command_stats.items()
+        }
+        all_stats = [stats for commands_stats in self._command_stats.values() for stats in commands_stats.values()]
+        return {
+            **per_command,
+            "invocations": sum(stats.invocations for stats in all_stats),
+            "errors": sum(stats.errors for stats in all_stats),
+            "throttled": sum(stats.throttled for stats in all_stats),
+        }
@@ -2,6 +2,9 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 from src.bot.plugins.base_plugin import BasePlugin
+from src.bot.plugins.ping.telemetry import SERIES, LatencySampler, MetricsServer
+import asyncio
+import os
 import time
 
 
@@ -15,9 +18,24 @@ class PingPlugin(BasePlugin):
     PLUGIN_VERSION = "1.0.0"
     PLUGIN_DESCRIPTION = "Check bot latency and response time"
     PLUGIN_AUTHOR = "ItsJhonAlex"
+    # The prefix command needs to read message content
+    REQUIRED_INTENTS = ("guild_messages", "dm_messages", "message_content")
 
     async def setup(self):
-        """Setup ping commands (slash and prefix)"""
+        """Setup ping commands (slash and prefix) and the latency sampler"""
+
+        self.sampler = LatencySampler(self.bot)
+        self.sampler.start()
+
+        self.metrics_server = None
+        self._metrics_task = None
+        if os.getenv("STATS_HTTP_PORT"):
+            self.metrics_server = MetricsServer(
+                self.sampler,
+                host=os.getenv("STATS_HTTP_HOST", "127.0.0.1"),
+                port=int(os.getenv("STATS_HTTP_PORT"))
+            )
+            self._metrics_task = asyncio.create_task(self._start_metrics_server())
         
         # Slash Command: /ping
         @app_commands.command(name="ping", description="Check bot latency")
@@ -30,11 +48,12 @@ class PingPlugin(BasePlugin):
             start_time = time.time()
             
             # Send initial response
-            await interaction.response.send_message("🏓 Pinging...")
+            await self.bot.outbound.respond(interaction, content="🏓 Pinging...")
             
             # Calculate response time
             end_time = time.time()
             api_latency = round((end_time - start_time) * 1000)
+            self.sampler.record("rest", (end_time - start_time) * 1000)
             
             # Get WebSocket latency
             ws_latency = round(self.bot.latency * 1000)
@@ -61,7 +80,7 @@ class PingPlugin(BasePlugin):
             embed.set_footer(text=f"Requested by {interaction.user.name}")
             
             # Edit the initial response with the embed
-            await interaction.edit_original_response(content=None, embed=embed)
+            await self.bot.outbound.edit_original(interaction, content=None, embed=embed)
             
             self.logger.info(f"Ping command used by {interaction.user} (WS: {ws_latency}ms, API: {api_latency}ms)")
         
@@ -76,11 +95,12 @@ class PingPlugin(BasePlugin):
             start_time = time.time()
             
             # Send initial message
-            message = await ctx.send("🏓 Pinging...")
+            message = await self.bot.outbound.send(ctx, content="🏓 Pinging...")
             
             # Calculate response time
             end_time = time.time()
             api_latency = round((end_time - start_time) * 1000)
+            self.sampler.record("rest", (end_time - start_time) * 1000)
             
             # Get WebSocket latency
             ws_latency = round(self.bot.latency * 1000)
@@ -107,16 +127,67 @@ class PingPlugin(BasePlugin):
             embed.set_footer(text=f"Requested by {ctx.author.name}")
             
             # Edit the initial message with the embed
-            await message.edit(content=None, embed=embed)
+            await self.bot.outbound.edit(message, content=None, embed=embed)
             
             self.logger.info(f"Ping command used by {ctx.author} (WS: {ws_latency}ms, API: {api_latency}ms)")
         
-        # Register both commands
+        # Slash Command: /stats
+        @app_commands.command(name="stats", description="Show rolling latency percentiles")
+        async def stats_slash(interaction: discord.Interaction):
+            """
+            Slash command with p50/p95/p99 of every sampled latency series
+            """
+            snapshot = self.sampler.snapshot()
+
+            embed = discord.Embed(
+                title="📊 Latency Stats",
+                color=self._get_latency_color(int(snapshot["websocket"]["p95"])),
+                timestamp=discord.utils.utcnow()
+            )
+
+            for name, label in SERIES.items():
+                summary = snapshot[name]
+                if not summary["count"]:
+                    value = "`no samples yet`"
+                else:
+                    value = (f"p50 `{summary['p50']:.1f}ms`\n"
+                             f"p95 `{summary['p95']:.1f}ms`\n"
+                             f"p99 `{summary['p99']:.1f}ms`\n"
+                             f"max `{summary['max']:.1f}ms`")
+                embed.add_field(name=label, value=value, inline=True)
+
+            embed.set_footer(text=f"Last {self.sampler.series['websocket'].size} samples per series")
+            await self.bot.outbound.respond(interaction, embed=embed)
+
+        # Register commands
         self.register_slash_command(ping_slash)
+        self.register_slash_command(stats_slash)
         self.register_prefix_command(ping_prefix)
         
         self.logger.info("Ping plugin loaded successfully")
     
+    async def _start_metrics_server(self):
+        # On hot reload the previous instance releases the port right after the swap
+        for attempt in range(5):
+            try:
+                await self.metrics_server.start()
+                return
+            except OSError as e:
+                if attempt == 4:
+                    self.logger.error(f"Could not start metrics endpoint: {e}")
+                    return
+                await asyncio.sleep(1)
+
+    async def teardown(self):
+        """Stop the sampler and metrics endpoint before removing commands"""
+        if getattr(self, "_metrics_task", None):
+            self._metrics_task.cancel()
+        if getattr(self, "metrics_server", None):
+            await self.metrics_server.stop()
+        if getattr(self, "sampler", None):
+            await self.sampler.stop()
+        await super().teardown()
+
     def _get_latency_color(self, latency: int) -> int:
         """
         Get color based on latency
@@ -0,0 +1,135 @@
+"""
+Rolling latency telemetry for the Ping plugin
+Samples gateway, REST, database and event loop latency into ring buffers
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from src.bot.utils.database import db
+from src.bot.utils.metrics import RingBuffer
+
+
+logger = logging.getLogger("plugins.PingPlugin.telemetry")
+
+SERIES = {
+    "websocket": "Gateway heartbeat latency",
+    "rest": "REST API round trip",
+    "database": "Database SELECT 1 round trip",
+    "event_loop": "Event loop lag",
+}
+
+
+class LatencySampler:
+    """Background sampler keeping the last N samples of each latency series"""
+
+    def __init__(self, bot, window: Optional[int] = None):
+        self.bot = bot
+        window = window or int(os.getenv("STATS_WINDOW", "512"))
+        self.series: Dict[str, RingBuffer] = {name: RingBuffer(window) for name in SERIES}
+        self.sample_interval = float(os.getenv("STATS_SAMPLE_INTERVAL", "15"))
+        self.rest_interval = float(os.getenv("STATS_REST_INTERVAL", "60"))
+        self.lag_interval = float(os.getenv("STATS_LAG_INTERVAL", "0.5"))
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._sample_loop(), name="telemetry-sampler"),
+            asyncio.create_task(self._rest_loop(), name="telemetry-rest"),
+            asyncio.create_task(self._lag_loop(), name="telemetry-loop-lag"),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def record(self, series: str, value_ms: float):
+        if math.isfinite(value_ms):
+            self.series[series].append(value_ms)
+
+    async def _sample_loop(self):
+        while True:
+            self.record("websocket", self.bot.latency * 1000)
+
+            if db.connected:
+                start = time.perf_counter()
+                try:
+                    await db.fetchval("SELECT 1", prepared=True)
+                    self.record("database", (time.perf_counter() - start) * 1000)
+                except Exception as e:
+                    logger.debug(f"Database latency sample failed: {e}")
+
+            await asyncio.sleep(self.sample_interval)
+
+    async def _rest_loop(self):
+        await self.bot.wait_until_ready()
+        while True:
+            start = time.perf_counter()
+            try:
+                await self.bot.fetch_user(self.bot.user.id)
+                self.record("rest", (time.perf_counter() - start) * 1000)
+            except Exception as e:
+                logger.debug(f"REST latency sample failed: {e}")
+            await asyncio.sleep(self.rest_interval)
+
+    async def _lag_loop(self):
+        # Any delay past the requested sleep is time the loop spent busy elsewhere
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.lag_interval)
+            self.record("event_loop", max(0.0, (time.perf_counter() - start - self.lag_interval) * 1000))
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {name: buffer.summary() for name, buffer in self.series.items()}
+
+    def prometheus(self) -> str:
+        """Renders the current percentiles in the Prometheus text exposition format"""
+        lines = [
+            "# HELP mizuki_latency_milliseconds Rolling latency percentiles",
+            "# TYPE mizuki_latency_milliseconds gauge",
+        ]
+        samples = [
+            "# HELP mizuki_latency_samples Samples in the rolling window",
+            "# TYPE mizuki_latency_samples gauge",
+        ]
+        for name, summary in self.snapshot().items():
+            for quantile in ("p50", "p95", "p99", "max"):
+                lines.append(f'mizuki_latency_milliseconds{{series="{name}",quantile="{quantile}"}} {summary[quantile]}')
+            samples.append(f'mizuki_latency_samples{{series="{name}"}} {summary["count"]}')
+        return "\n".join(lines + samples) + "\n"
+
+
+class MetricsServer:
+    """Local aiohttp endpoint serving the sampler in Prometheus format"""
+
+    def __init__(self, sampler: LatencySampler, host: str = "127.0.0.1", port: int = 9100):
+        self.sampler = sampler
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.sampler.prometheus(), content_type="text/plain", charset="utf-8")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Serving latency metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,289 @@
+"""
+In-memory caching utilities for Mizuki Bot
+Bounded LRU cache with optional TTL and hit/miss accounting, and a
+tag-invalidated cache for rendered command responses
+"""
+
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with an optional time-to-live"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """
+        Args:
+            maxsize: Maximum number of entries kept in memory
+            ttl: Seconds an entry stays valid, or None to never expire
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be greater than zero")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        """
+        Returns the cached value for a key
+
+        Args:
+            key: Cache key
+            default: Value returned when the key is missing or expired
+            count: Whether the lookup is recorded in the hit/miss counters
+
+        Returns:
+            The cached value or default
+        """
+        entry = self._data.get(key, _MISSING)
+        if entry is not _MISSING:
+            value, expires_at = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._data[key]
+            else:
+                self._data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+
+        if count:
+            self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Stores a value, evicting the least recently used entry when full
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Seconds this entry stays valid, overriding the cache TTL
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else 0.0
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def update(self, items: Iterable[Tuple[Hashable, Any]]) -> int:
+        """
+        Stores many values at once
+
+        Args:
+            items: Iterable of (key, value) pairs
+
+        Returns:
+            Number of entries written
+        """
+        written = 0
+        for key, value in items:
+            self.set(key, value)
+            written += 1
+        return written
+
+    def invalidate(self, key: Hashable) -> bool:
+        """
+        Removes a single entry
+
+        Returns:
+            bool: True if the key was cached
+        """
+        if self._data.pop(key, _MISSING) is _MISSING:
+            return False
+        self.invalidations += 1
+        return True
+
+    def clear(self) -> None:
+        """Removes every entry, keeping the counters"""
+        self.invalidations += len(self._data)
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns cache counters
+
+        Returns:
+            Dict with size, limits, hits, misses, evictions and hit ratio
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+# Tag invalidated whenever a plugin is loaded, unloaded or reloaded
+PLUGINS_TAG = "plugins"
+
+
+def plugin_tag(plugin_name: str) -> str:
+    """Tag carried by every response cached by a plugin"""
+    return f"plugin:{plugin_name}"
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Rough size in bytes of a cached value
+
+    Embeds and other objects with `to_dict` are measured by their JSON
+    payload, containers by their contents.
+    """
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return 8 * len(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    if hasattr(value, "to_dict"):
+        return len(json.dumps(value.to_dict(), default=str))
+    return sys.getsizeof(value)
+
+
+class ResponseCache:
+    """
+    Rendered command responses, bounded by entry count and total size.
+
+    Entries carry tags so they can be dropped as a group, e.g. everything
+    derived from the plugin list when a plugin is loaded or unloaded.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries or int(os.getenv("RESPONSE_CACHE_ENTRIES", "2048"))
+        self.max_bytes = max_bytes or int(os.getenv("RESPONSE_CACHE_BYTES", str(8 * 1024 * 1024)))
+        self._data: "OrderedDict[Hashable, Tuple[Any, int, Tuple[str, ...], float]]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is not None:
+            value, _, _, expires_at = entry
+            if expires_at and expires_at <= time.monotonic():
+                self._remove(key)
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None) -> bool:
+        """
+        Stores a rendered response
+
+        Args:
+            key: Cache key
+            value: Rendered value
+            tags: Tags the entry is invalidated with
+            ttl: Seconds the entry stays valid, or None until invalidated
+
+        Returns:
+            bool: False if the value is too large to be cached
+        """
+        if key in self._data:
+            self._remove(key)
+
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return False
+
+        tags = tuple(tags)
+        self._data[key] = (value, size, tags, time.monotonic() + ttl if ttl else 0.0)
+        self.bytes += size
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+        return True
+
+    def _remove(self, key: Hashable):
+        _, size, tags, _ = self._data.pop(key)
+        self.bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, key: Hashable) -> bool:
+        if key not in self._data:
+            return False
+        self._remove(key)
+        self.invalidations += 1
+        return True
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """
+        Removes every entry carrying any of the tags
+
+        Returns:
+            Number of entries removed
+        """
+        removed = 0
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                if key in self._data:
+                    self._remove(key)
+                    removed += 1
+        self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        self.invalidations += len(self._data)
+        self._data.clear()
+        self._tags.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
@@ -1,133 +1,1247 @@
 """
 Database connection utilities for Mizuki Bot
-Uses asyncpg for PostgreSQL async connections
+Uses asyncpg for PostgreSQL, or aiosqlite for an embedded local store
 """
 
+import asyncio
 import asyncpg
+import itertools
 import logging
 import os
-from typing import Optional
+import random
+import re
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.bot.utils.entity_cache import INVALIDATION_CHANNEL, EntityCache, InvalidationListener
+from src.bot.utils.metrics import LatencyHistogram
 
 
 logger = logging.getLogger("mizuki.database")
 
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|(?<![$\w])\d+(?:\.\d+)?")
+_WHITESPACE_RE = re.compile(r"\s+")
 
-class Database:
-    """Database connection manager for PostgreSQL"""
-    
-    def __init__(self):
+
+@lru_cache(maxsize=2048)
+def fingerprint(query: str) -> str:
+    """
+    Normalizes a query so that calls differing only in literals share stats
+
+    Args:
+        query: SQL query
+
+    Returns:
+        Query with collapsed whitespace and literals replaced by `?`
+    """
+    return _WHITESPACE_RE.sub(" ", _LITERAL_RE.sub("?", query)).strip()
+
+
+@lru_cache(maxsize=64)
+def merge_query(table: str, staging: str, key_columns: Tuple[str, ...], columns: Tuple[str, ...],
+                timestamp_column: Optional[str] = None) -> str:
+    """
+    Set-based upsert from a staging table that leaves unchanged rows untouched
+
+    Args:
+        table: Target table
+        staging: Staging table with the same columns
+        key_columns: Primary key columns used for ON CONFLICT
+        columns: Non-key columns updated on conflict
+        timestamp_column: Column set to CURRENT_TIMESTAMP when a row is updated, if any
+
+    Returns:
+        INSERT ... SELECT query valid on PostgreSQL and SQLite
+    """
+    all_columns = ", ".join(key_columns + columns)
+    if columns:
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+        if timestamp_column:
+            updates += f", {timestamp_column} = CURRENT_TIMESTAMP"
+        changed = " OR ".join(f"{table}.{column} IS DISTINCT FROM EXCLUDED.{column}" for column in columns)
+        conflict = f"DO UPDATE SET {updates} WHERE {changed}"
+    else:
+        conflict = "DO NOTHING"
+    # `WHERE true` lets SQLite tell the upsert clause from a join constraint
+    return (
+        f"INSERT INTO {table} ({all_columns}) SELECT {all_columns} FROM {staging} WHERE true "
+        f"ON CONFLICT ({', '.join(key_columns)}) {conflict}"
+    )
+
+
+class MizukiConnection(asyncpg.Connection):
+    """asyncpg connection that keeps the prepared statements of hot queries"""
+
+    __slots__ = ("prepared_limit", "_prepared")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_limit = 256
+        self._prepared: "OrderedDict[str, asyncpg.prepared_stmt.PreparedStatement]" = OrderedDict()
+
+    async def prepare_cached(self, query: str):
+        """
+        Returns a prepared statement, reusing the one already prepared for
+        this query on this connection when there is one
+
+        Statements are prepared with the public prepare() API and kept in a
+        per-connection LRU of `prepared_limit` entries; asyncpg closes the
+        server-side statement of an evicted entry once it is collected.
+
+        Args:
+            query: SQL query
+
+        Returns:
+            asyncpg PreparedStatement
+        """
+        statement = self._prepared.get(query)
+        if statement is not None:
+            self._prepared.move_to_end(query)
+            return statement
+
+        statement = await self.prepare(query)
+        self._prepared[query] = statement
+        while len(self._prepared) > self.prepared_limit:
+            self._prepared.popitem(last=False)
+        return statement
+
+    def forget_prepared(self, query: str):
+        """Drops the cached statement of a query, e.g. after a schema change invalidated it"""
+        self._prepared.pop(query, None)
+
+
+class QueryStats:
+    """Per-fingerprint latency histograms and pool wait accounting"""
+
+    MAX_FINGERPRINTS = 500
+
+    def __init__(self, slow_query_ms: float = 250.0):
+        self.slow_query_ms = slow_query_ms
+        self.queries: Dict[str, Dict[str, Any]] = {}
+        self.acquire_wait = LatencyHistogram()
+        self.pool_exhausted = 0
+
+    def record(self, query: str, elapsed_ms: float, error: bool = False, prepared: bool = False):
+        """
+        Records one query execution
+
+        Args:
+            query: SQL query
+            elapsed_ms: Execution time in milliseconds
+            error: Whether the query raised
+            prepared: Whether the query ran through a cached prepared statement
+        """
+        key = fingerprint(query)
+        entry = self.queries.get(key)
+        if entry is None:
+            if len(self.queries) >= self.MAX_FINGERPRINTS:
+                key = "<other>"
+                entry = self.queries.get(key)
+            if entry is None:
+                entry = self.queries[key] = {
+                    "histogram": LatencyHistogram(), "errors": 0, "slow": 0, "prepared": False
+                }
+
+        entry["histogram"].observe(elapsed_ms)
+        entry["prepared"] = entry["prepared"] or prepared
+        if error:
+            entry["errors"] += 1
+        if elapsed_ms >= self.slow_query_ms:
+            entry["slow"] += 1
+            logger.warning(f"Slow query ({elapsed_ms:.1f}ms): {key}")
+
+    def top(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Returns the queries that consumed the most total time
+
+        Args:
+            limit: Maximum number of queries returned
+
+        Returns:
+            List of per-query summaries
+        """
+        ranked = sorted(self.queries.items(), key=lambda item: item[1]["histogram"].total, reverse=True)
+        return [
+            {
+                "query": key,
+                "total_ms": round(entry["histogram"].total, 3),
+                "errors": entry["errors"],
+                "slow": entry["slow"],
+                "prepared": entry["prepared"],
+                **entry["histogram"].summary(),
+            }
+            for key, entry in ranked[:limit]
+        ]
+
+    def reset(self):
+        self.queries.clear()
+        self.acquire_wait = LatencyHistogram()
+        self.pool_exhausted = 0
+
+
+class UpsertBuffer:
+    """
+    Write-behind buffer that coalesces upserts by primary key
+
+    Rows are kept in memory keyed by their primary key, so repeated writes
+    for the same key collapse into one. The buffer is flushed with a single
+    `executemany` inside one transaction once it reaches `max_size` rows or
+    every `flush_interval` seconds, whichever comes first.
+    """
+
+    def __init__(self, database: "Database", table: str, key_columns: Sequence[str],
+                 columns: Sequence[str], max_size: int = 500, flush_interval: float = 5.0,
+                 max_pending: Optional[int] = None, timestamp_column: Optional[str] = None):
+        """
+        Args:
+            database: Database used to flush the buffer
+            table: Target table
+            key_columns: Primary key columns used for ON CONFLICT
+            columns: Non-key columns updated on conflict
+            max_size: Number of pending rows that triggers a flush
+            flush_interval: Maximum seconds a row waits before being flushed
+            max_pending: Rows kept while the database is down before the oldest are
+                dropped (20 flushes' worth by default)
+            timestamp_column: Column set to CURRENT_TIMESTAMP when a row is updated, if any
+        """
+        self.database = database
+        self.table = table
+        self.key_columns = tuple(key_columns)
+        self.columns = tuple(columns)
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending or max_size * 20
+        self.timestamp_column = timestamp_column
+
+        self._pending: Dict[Tuple[Any, ...], Tuple[Any, ...]] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.queued = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+
+        all_columns = self.key_columns + self.columns
+        placeholders = ", ".join(f"${i}" for i in range(1, len(all_columns) + 1))
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in self.columns)
+        if updates:
+            if timestamp_column:
+                updates += f", {timestamp_column} = CURRENT_TIMESTAMP"
+            # Like merge_query: rows that would not change are not written (nor notified)
+            changed = " OR ".join(f"{table}.{column} IS DISTINCT FROM EXCLUDED.{column}" for column in self.columns)
+            conflict = f"DO UPDATE SET {updates} WHERE {changed}"
+        else:
+            conflict = "DO NOTHING"
+        self.query = (
+            f"INSERT INTO {table} ({', '.join(all_columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({', '.join(self.key_columns)}) {conflict}"
+        )
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, *values) -> None:
+        """
+        Queues an upsert; values follow key_columns then columns order
+
+        Args:
+            *values: Row values
+        """
+        if len(values) != len(self.key_columns) + len(self.columns):
+            raise ValueError(f"Expected {len(self.key_columns) + len(self.columns)} values for {self.table}")
+
+        key = values[:len(self.key_columns)]
+        self._pending.pop(key, None)
+        self._pending[key] = values
+        self.queued += 1
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop(), name=f"upsert-buffer:{self.table}")
+
+        if len(self._pending) >= self.max_size and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Writes every pending row to the database
+
+        Returns:
+            Number of rows written
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            # Stable key order keeps concurrent writers from deadlocking
+            keys = sorted(batch)
+            written = 0
+            # Failed chunks are split in half until the rows that cannot be written are isolated
+            chunks = [keys]
+            while chunks:
+                chunk = chunks.pop()
+                try:
+                    await self.database.executemany(self.query, [batch[key] for key in chunk])
+                except asyncio.CancelledError:
+                    # Shutdown or reload mid-write: the transaction was rolled back, keep the rows
+                    self._requeue(batch, chunk + [key for rest in chunks for key in rest])
+                    raise
+                except (DatabaseUnavailable, *OUTAGE_ERRORS) as e:
+                    self.failures += 1
+                    unwritten = chunk + [key for rest in chunks for key in rest]
+                    logger.error(f"❌ Database unavailable flushing {len(unwritten)} rows into {self.table}, "
+                                 f"keeping them for the next flush: {e}")
+                    self._requeue(batch, unwritten)
+                    break
+                except Exception as e:
+                    self.failures += 1
+                    if len(chunk) > 1:
+                        middle = len(chunk) // 2
+                        chunks += [chunk[middle:], chunk[:middle]]
+                        continue
+                    self.dropped += 1
+                    logger.error(f"❌ Dropping row {chunk[0]} of {self.table}, it cannot be written: {e}")
+                    continue
+
+                written += len(chunk)
+                entity = self.database.entities.get(self.table)
+                if entity is not None and len(self.key_columns) == 1:
+                    # Read-your-writes without waiting for the notification, for rows that changed
+                    for key in chunk:
+                        entity.invalidate_changed(key[0], dict(zip(self.columns, batch[key][1:])))
+
+            if written:
+                self.flushed += written
+                self.flushes += 1
+                logger.debug(f"Flushed {written} rows into {self.table}")
+            return written
+
+    def _requeue(self, batch: Dict[Tuple[Any, ...], Tuple[Any, ...]], keys: Iterable[Tuple[Any, ...]]):
+        """
+        Puts unwritten rows back without overwriting newer writes
+
+        Pending rows stay ordered by their last write, so past max_pending the
+        rows that have waited longest are the ones dropped.
+
+        Args:
+            batch: Rows taken by the flush, in write order
+            keys: Keys of the rows that were not written
+        """
+        unwritten = set(keys)
+        rows = {key: values for key, values in batch.items() if key in unwritten}
+        for key, values in self._pending.items():
+            rows.pop(key, None)
+            rows[key] = values
+
+        overflow = len(rows) - self.max_pending
+        if overflow > 0:
+            for key in list(itertools.islice(rows, overflow)):
+                del rows[key]
+            self.dropped += overflow
+            logger.warning(f"{self.table} buffer is full while the database is down, "
+                           f"dropped the {overflow} oldest rows")
+        self._pending = rows
+
+    async def close(self):
+        """Stops the background flush and writes any pending rows"""
+        current = asyncio.current_task()
+        # A flush already writing is awaited rather than cancelled; the loop is
+        # cancelled, and a flush it was running puts its rows back
+        if self._task and not self._task.done() and self._task is not current:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._flush_task and not self._flush_task.done() and self._flush_task is not current:
+            try:
+                await self._flush_task
+            except Exception as e:
+                logger.error(f"Flush of {self.table} failed while closing: {e}")
+        self._task = self._flush_task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "table": self.table,
+            "pending": len(self._pending),
+            "queued": self.queued,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "coalesced": self.queued - self.flushed - self.dropped - len(self._pending),
+        }
+
+
+class DatabaseUnavailable(RuntimeError):
+    """Raised without touching the database while it is disconnected or the circuit is open"""
+
+
+# Errors that mean the server is unreachable or overloaded rather than a bad query
+OUTAGE_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.AdminShutdownError,
+    asyncpg.CrashShutdownError,
+    asyncpg.TooManyConnectionsError,
+)
+
+
+class CircuitBreaker:
+    """
+    Fails database calls fast during an outage
+
+    After `failure_threshold` consecutive outage errors the circuit opens and
+    every call is rejected at once with DatabaseUnavailable. Once
+    `reset_timeout` seconds have passed a single trial call is let through
+    (half-open): it closes the circuit if it succeeds and reopens it if not.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def available(self) -> bool:
+        """Whether a call made now would be let through"""
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return self.state == self.CLOSED
+
+    def before_call(self):
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            return
+        self.rejected += 1
+        raise DatabaseUnavailable(f"Database circuit is {self.state}: {self.last_error}")
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("✅ Database reachable again, circuit closed")
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self, error: BaseException):
+        self.failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            if self.state == self.CLOSED:
+                logger.error(f"❌ Database circuit opened after {self.failures} failures: {self.last_error}")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+
+    def cancel_trial(self):
+        """Reopens a half-open circuit whose trial call was cancelled, ready for another trial"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+    def reset(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+
+class _AdaptiveLimit:
+    """Concurrency limit that can be resized while callers are waiting"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def try_acquire(self) -> bool:
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+            return True
+        return False
+
+    async def acquire(self):
+        if self.try_acquire():
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may already have been handed over to us
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_use -= 1
+        self._wake()
+
+    def resize(self, limit: int):
+        self.limit = limit
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_use < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_use += 1
+                future.set_result(None)
+
+
+class PostgresBackend:
+    """
+    asyncpg connection pool with cached prepared statements for hot queries.
+
+    asyncpg cannot resize a pool once created, so the pool is opened with
+    the DB_POOL_MAX ceiling and an adaptive limit in front of it decides how
+    many connections may be checked out. Every DB_POOL_ADJUST_INTERVAL
+    seconds the limit grows when callers had to wait for a connection and
+    shrinks by one when less than half of it was used. Connections above
+    the limit stay idle and are closed after DB_POOL_IDLE_LIFETIME seconds.
+    """
+
+    name = "postgres"
+    supports_notify = True
+
+    def __init__(self, database: "Database"):
+        self.database = database
         self.pool: Optional[asyncpg.Pool] = None
         self.host = os.getenv("DB_HOST", "localhost")
         self.port = int(os.getenv("DB_PORT", "5432"))
         self.user = os.getenv("DB_USER", "mizuki")
         self.password = os.getenv("DB_PASSWORD", "")
-        self.database = os.getenv("DB_NAME", "mizuki_bot")
+        self.database_name = os.getenv("DB_NAME", "mizuki_bot")
+        self.min_size = int(os.getenv("DB_POOL_MIN", "5"))
+        self.max_size = max(int(os.getenv("DB_POOL_MAX", "20")), self.min_size)
+        self.statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+        self.connect_timeout = float(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+        self.acquire_timeout = float(os.getenv("DB_ACQUIRE_TIMEOUT", "10"))
+        self.command_timeout = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+        self.idle_lifetime = float(os.getenv("DB_POOL_IDLE_LIFETIME", "60"))
+        self.adjust_interval = float(os.getenv("DB_POOL_ADJUST_INTERVAL", "10"))
+        self.wait_target_ms = float(os.getenv("DB_POOL_WAIT_TARGET_MS", "5"))
+
+        self.limit = _AdaptiveLimit(max(self.min_size, self.max_size // 2))
+        self.resizes = 0
+        self._peak_in_use = 0
+        self._window_waited = 0
+        self._window_wait_ms = 0.0
+        self._adjust_task: Optional[asyncio.Task] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.pool is not None
+
+    async def connect(self):
+        logger.info(f"Connecting to PostgreSQL at {self.host}:{self.port}/{self.database_name}")
+
+        pool = await asyncpg.create_pool(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database_name,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            timeout=self.connect_timeout,
+            command_timeout=self.command_timeout,
+            max_inactive_connection_lifetime=self.idle_lifetime,
+            statement_cache_size=self.statement_cache_size,
+            connection_class=MizukiConnection,
+            init=self._init_connection
+        )
+
+        # Verify connection
+        try:
+            async with pool.acquire(timeout=self.acquire_timeout) as conn:
+                version = await conn.fetchval("SELECT version()")
+        except BaseException:
+            pool.terminate()
+            raise
+
+        self.pool = pool
+        logger.info(f"Successfully connected to PostgreSQL")
+        logger.debug(f"Version: {version}")
+        self._adjust_task = asyncio.create_task(self._adjust_loop(), name="db-pool-adjust")
+
+    async def open_connection(self) -> asyncpg.Connection:
+        """Opens a standalone connection outside the pool, e.g. for LISTEN"""
+        return await asyncpg.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database_name,
+            timeout=self.connect_timeout,
+        )
+
+    async def close(self):
+        if self._adjust_task:
+            self._adjust_task.cancel()
+            self._adjust_task = None
+        if self.pool:
+            logger.info("Closing database connection")
+            await self.pool.close()
+            self.pool = None
+
+    async def _init_connection(self, conn: MizukiConnection):
+        """Warms a new pool connection with the statements of hot queries"""
+        conn.prepared_limit = self.statement_cache_size
+        for query in list(self.database.hot_queries):
+            try:
+                await conn.prepare_cached(query)
+            except Exception as e:
+                logger.debug(f"Could not prepare hot query on new connection: {e}")
+
+    @asynccontextmanager
+    async def _acquire(self):
+        """Acquires a pool connection while recording how long the caller waited"""
+        if not self.pool:
+            raise DatabaseUnavailable("Database pool is not initialized")
+
+        stats = self.database.stats
+        limit = self.limit
+        start = time.perf_counter()
+        if not limit.try_acquire():
+            stats.pool_exhausted += 1
+            await asyncio.wait_for(limit.acquire(), self.acquire_timeout)
+        try:
+            if limit.in_use > self._peak_in_use:
+                self._peak_in_use = limit.in_use
+            async with self.pool.acquire(timeout=self.acquire_timeout) as conn:
+                waited = (time.perf_counter() - start) * 1000
+                stats.acquire_wait.observe(waited)
+                if waited >= self.wait_target_ms:
+                    self._window_waited += 1
+                    self._window_wait_ms += waited
+                yield conn
+        finally:
+            limit.release()
+
+    def adjust(self) -> int:
+        """
+        Resizes the connection limit from the usage seen since the last call
+
+        Returns:
+            The new limit
+        """
+        limit = self.limit
+        current = limit.limit
+        if (self._window_waited or limit.waiting) and self._peak_in_use >= current:
+            # Callers queued behind a saturated limit: grow by a quarter
+            target = min(self.max_size, current + max(1, current // 4))
+        elif not self._window_waited and self._peak_in_use < current // 2:
+            target = max(self.min_size, current - 1)
+        else:
+            target = current
+
+        if target != current:
+            self.resizes += 1
+            logger.debug(f"Database pool limit {current} -> {target} "
+                         f"(peak {self._peak_in_use}, {self._window_waited} slow acquires)")
+            limit.resize(target)
+
+        self._peak_in_use = limit.in_use
+        self._window_waited = 0
+        self._window_wait_ms = 0.0
+        return target
+
+    async def _adjust_loop(self):
+        while True:
+            await asyncio.sleep(self.adjust_interval)
+            try:
+                self.adjust()
+            except Exception as e:
+                logger.error(f"Database pool adjustment failed: {e}")
+
+    async def run(self, method: str, query: str, args: tuple, prepared: bool):
+        async with self._acquire() as conn:
+            start = time.perf_counter()
+            error = False
+            try:
+                if not prepared:
+                    return await getattr(conn, method)(query, *args)
+
+                self.database.note_hot_query(query)
+                try:
+                    return await self._run_prepared(conn, method, query, args)
+                except asyncpg.InvalidCachedStatementError:
+                    # The plan went stale after a schema change: prepare it again once
+                    conn.forget_prepared(query)
+                    return await self._run_prepared(conn, method, query, args)
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.database.stats.record(query, (time.perf_counter() - start) * 1000, error, prepared)
+
+    @staticmethod
+    async def _run_prepared(conn: MizukiConnection, method: str, query: str, args: tuple):
+        statement = await conn.prepare_cached(query)
+        if method == "execute":
+            await statement.fetch(*args)
+            return statement.get_statusmsg()
+        return await getattr(statement, method)(*args)
+
+    async def executemany(self, query: str, args):
+        async with self._acquire() as conn:
+            start = time.perf_counter()
+            error = False
+            try:
+                async with conn.transaction():
+                    return await conn.executemany(query, args)
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.database.stats.record(query, (time.perf_counter() - start) * 1000, error)
+
+    async def copy_merge(self, staging: str, table: str, columns: Sequence[str],
+                         records: List[tuple], merge: str) -> int:
+        async with self._acquire() as conn:
+            start = time.perf_counter()
+            error = False
+            try:
+                async with conn.transaction():
+                    # Per-connection temp table, emptied by every commit
+                    await conn.execute(
+                        f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS) "
+                        f"ON COMMIT DELETE ROWS"
+                    )
+                    await conn.copy_records_to_table(staging, records=records, columns=list(columns))
+                    status = await conn.execute(merge)
+                return int(status.rsplit(" ", 1)[-1])
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.database.stats.record(merge, (time.perf_counter() - start) * 1000, error)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        pool = {
+            "connected": self.connected,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "limit": self.limit.limit,
+            "in_use": self.limit.in_use,
+            "waiting": self.limit.waiting,
+            "resizes": self.resizes,
+        }
+        if self.pool:
+            pool.update(size=self.pool.get_size(), idle=self.pool.get_idle_size())
+        return pool
+
+
+class Database:
+    """
+    Database connection manager
+
+    Queries are written for PostgreSQL (`$1` placeholders, ON CONFLICT
+    upserts) and run on the backend selected with DB_BACKEND: `postgres`
+    (asyncpg pool, default) or `sqlite` (embedded aiosqlite store).
+
+    Calls go through a circuit breaker, so an outage fails them fast
+    instead of leaving them waiting on timeouts. If the first connection
+    fails, `connect(retry=True)` keeps retrying in the background with
+    exponential backoff and runs the connect callbacks once it succeeds.
+
+    Entity caches (`entity()`) serve keyed lookups from memory. On
+    PostgreSQL, a trigger on each watched table publishes every write with
+    NOTIFY and a dedicated LISTEN connection drops the written keys in
+    every bot process.
+    """
     
-    async def connect(self) -> bool:
+    def __init__(self, backend: Optional[str] = None):
+        self.buffers: Dict[str, UpsertBuffer] = {}
+        # Most recently prepared queries, warmed on new connections; no more than a connection keeps
+        self.hot_queries: "OrderedDict[str, None]" = OrderedDict()
+        self.hot_query_limit = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+        self.stats = QueryStats(slow_query_ms=float(os.getenv("DB_SLOW_QUERY_MS", "250")))
+        self.backend_name = (backend or os.getenv("DB_BACKEND", "postgres")).lower()
+        self.backend = self._create_backend(self.backend_name)
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("DB_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("DB_BREAKER_RESET", "10")),
+        )
+        self.reconnect_min = float(os.getenv("DB_RECONNECT_MIN", "1"))
+        self.reconnect_max = float(os.getenv("DB_RECONNECT_MAX", "60"))
+        self.reconnect_attempts = 0
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._connect_callbacks: List[Callable[[], Awaitable[Any]]] = []
+        self.entities: Dict[str, EntityCache] = {}
+        self.listener: Optional[InvalidationListener] = None
+
+    def _create_backend(self, name: str):
+        if name in ("postgres", "postgresql"):
+            return PostgresBackend(self)
+        if name == "sqlite":
+            # Imported lazily so PostgreSQL deployments never load aiosqlite
+            from src.bot.utils.sqlite_backend import SQLiteBackend
+            return SQLiteBackend(self)
+        raise ValueError(f"Unknown database backend {name!r}, expected postgres or sqlite")
+
+    @property
+    def connected(self) -> bool:
+        return self.backend.connected
+
+    @property
+    def available(self) -> bool:
+        """Whether a query made now would reach the database instead of failing fast"""
+        return self.backend.connected and self.breaker.available
+
+    @property
+    def pool(self) -> Optional[asyncpg.Pool]:
+        """asyncpg pool of the PostgreSQL backend, None on other backends"""
+        return getattr(self.backend, "pool", None)
+
+    def note_hot_query(self, query: str):
+        """
+        Marks a query as hot, evicting the least recently used one past the
+        statement cache size (ad-hoc SQL would otherwise grow the set forever)
+
+        Args:
+            query: SQL query run as a prepared statement
+        """
+        self.hot_queries[query] = None
+        self.hot_queries.move_to_end(query)
+        while len(self.hot_queries) > self.hot_query_limit:
+            self.hot_queries.popitem(last=False)
+
+    def add_connect_callback(self, callback: Callable[[], Awaitable[Any]]):
+        """
+        Registers a coroutine function run after every successful connect,
+        including one made later by the background reconnect
+
+        Args:
+            callback: Coroutine function without arguments
+        """
+        self._connect_callbacks.append(callback)
+
+    async def _on_connect(self):
+        self.breaker.reset()
+        self.reconnect_attempts = 0
+        if self.backend.supports_notify and self.listener is None:
+            self.listener = InvalidationListener(
+                self.backend.open_connection, self._apply_invalidation, self.invalidate_entities,
+                retry_min=self.reconnect_min, retry_max=self.reconnect_max,
+            )
+            self.listener.start()
+        if self.listener is not None and not await self.listener.wait_live(self.backend.connect_timeout):
+            logger.warning("Invalidation listener is not live yet, entity caches are bypassed until it is")
+        # Callbacks run once the listener is live: its first reset would otherwise drop what they warm
+        for callback in list(self._connect_callbacks):
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"❌ Error in database connect callback: {e}")
+
+    async def connect(self, retry: bool = False) -> bool:
         """
         Establishes connection to the database
         
+        Args:
+            retry: Keep retrying in the background if this attempt fails
+
         Returns:
             bool: True if connection was successful, False otherwise
         """
         try:
-            logger.info(f"Connecting to PostgreSQL at {self.host}:{self.port}/{self.database}")
-            
-            self.pool = await asyncpg.create_pool(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                min_size=5,
-                max_size=20,
-                command_timeout=60
-            )
-            
-            # Verify connection
-            async with self.pool.acquire() as conn:
-                version = await conn.fetchval("SELECT version()")
-                logger.info(f"Successfully connected to PostgreSQL")
-                logger.debug(f"Version: {version}")
-            
-            return True
+            await self.backend.connect()
             
         except Exception as e:
             logger.error(f"❌ Error connecting to database: {e}")
+            self.breaker.last_error = f"{type(e).__name__}: {e}"
+            if retry and (self._reconnect_task is None or self._reconnect_task.done()):
+                self._reconnect_task = asyncio.create_task(self._reconnect_loop(), name="db-reconnect")
             return False
+
+        await self._on_connect()
+        return True
+
+    async def _reconnect_loop(self):
+        delay = self.reconnect_min
+        while not self.backend.connected:
+            # Full jitter keeps several shards from reconnecting in lockstep
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            self.reconnect_attempts += 1
+            try:
+                await self.backend.connect()
+            except Exception as e:
+                self.breaker.last_error = f"{type(e).__name__}: {e}"
+                delay = min(delay * 2, self.reconnect_max)
+                logger.warning(f"Database reconnect attempt {self.reconnect_attempts} failed, "
+                               f"retrying in up to {delay:.1f}s: {e}")
+                continue
+
+            logger.info(f"✅ Database connected after {self.reconnect_attempts} reconnect attempts")
+            await self._on_connect()
     
     async def close(self):
-        """Closes the database connection"""
-        if self.pool:
-            logger.info("Closing database connection")
-            await self.pool.close()
-            self.pool = None
-    
-    async def execute(self, query: str, *args):
+        """Flushes pending buffered writes and closes the database connection"""
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self.listener:
+            await self.listener.stop()
+            self.listener = None
+        await self.close_buffers()
+        await self.backend.close()
+
+    async def _guarded(self, call: Awaitable[Any]):
+        """Runs a backend call through the circuit breaker"""
+        try:
+            self.breaker.before_call()
+        except DatabaseUnavailable:
+            call.close()
+            raise
+
+        try:
+            result = await call
+        except OUTAGE_ERRORS as e:
+            self.breaker.record_failure(e)
+            raise
+        except asyncio.CancelledError:
+            self.breaker.cancel_trial()
+            raise
+        except Exception:
+            # The server answered, the query itself was at fault
+            self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _run(self, method: str, query: str, args: tuple, prepared: bool):
+        if not self.backend.connected:
+            raise DatabaseUnavailable("Database is not connected")
+        return await self._guarded(self.backend.run(method, query, args, prepared))
+
+    async def execute(self, query: str, *args, prepared: bool = False):
         """
         Executes a query without returning results (INSERT, UPDATE, DELETE)
         
         Args:
             query: SQL query
             *args: Query parameters
+            prepared: Reuse a cached prepared statement (for hot queries)
         """
-        if not self.pool:
-            raise RuntimeError("Database pool is not initialized")
-        
-        async with self.pool.acquire() as conn:
-            return await conn.execute(query, *args)
+        return await self._run("execute", query, args, prepared)
     
-    async def fetch(self, query: str, *args):
+    async def executemany(self, query: str, args):
+        """
+        Executes a query once per argument tuple in a single transaction
+
+        Args:
+            query: SQL query
+            args: Iterable of parameter tuples
+        """
+        if not self.backend.connected:
+            raise DatabaseUnavailable("Database is not connected")
+        return await self._guarded(self.backend.executemany(query, args))
+
+    async def bulk_upsert(self, table: str, key_columns: Sequence[str], columns: Sequence[str],
+                          rows: Iterable[Sequence[Any]], timestamp_column: Optional[str] = None) -> int:
+        """
+        Loads rows into a staging table and merges them into `table` in one statement
+
+        On PostgreSQL the rows are sent with COPY (`copy_records_to_table`),
+        which is far cheaper than one INSERT per row. Rows whose stored
+        values are unchanged are not rewritten.
+
+        Args:
+            table: Target table
+            key_columns: Primary key columns
+            columns: Columns updated on conflict
+            rows: Row values, key columns first; later duplicates of a key win
+            timestamp_column: Column set to CURRENT_TIMESTAMP when a row is updated, if any
+
+        Returns:
+            Number of rows inserted or changed
+        """
+        key_columns, columns = tuple(key_columns), tuple(columns)
+        width = len(key_columns)
+        # ON CONFLICT cannot touch the same row twice in one statement
+        records = list({tuple(row[:width]): tuple(row) for row in rows}.values())
+        if not records:
+            return 0
+        if not self.backend.connected:
+            raise DatabaseUnavailable("Database is not connected")
+
+        staging = f"{table}_staging"
+        merge = merge_query(table, staging, key_columns, columns, timestamp_column)
+        written = await self._guarded(self.backend.copy_merge(staging, table, key_columns + columns, records, merge))
+
+        if not self.backend.supports_notify and written:
+            # PostgreSQL triggers only fire for the rows that changed; elsewhere drop them all
+            self.invalidate_entities(table, (record[0] for record in records) if width == 1 else None)
+        return written
+
+    async def fetch(self, query: str, *args, prepared: bool = False):
         """
         Executes a query and returns all results
         
         Args:
             query: SQL query
             *args: Query parameters
+            prepared: Reuse a cached prepared statement (for hot queries)
             
         Returns:
             List of records
         """
-        if not self.pool:
-            raise RuntimeError("Database pool is not initialized")
-        
-        async with self.pool.acquire() as conn:
-            return await conn.fetch(query, *args)
+        return await self._run("fetch", query, args, prepared)
     
-    async def fetchrow(self, query: str, *args):
+    async def fetchrow(self, query: str, *args, prepared: bool = False):
         """
         Executes a query and returns the first result
         
         Args:
             query: SQL query
             *args: Query parameters
+            prepared: Reuse a cached prepared statement (for hot queries)
             
         Returns:
             A record or None
         """
-        if not self.pool:
-            raise RuntimeError("Database pool is not initialized")
-        
-        async with self.pool.acquire() as conn:
-            return await conn.fetchrow(query, *args)
+        return await self._run("fetchrow", query, args, prepared)
     
-    async def fetchval(self, query: str, *args):
+    async def fetchval(self, query: str, *args, prepared: bool = False):
         """
         Executes a query and returns a single value
         
         Args:
             query: SQL query
             *args: Query parameters
+            prepared: Reuse a cached prepared statement (for hot queries)
             
         Returns:
             A value or None
         """
-        if not self.pool:
-            raise RuntimeError("Database pool is not initialized")
-        
-        async with self.pool.acquire() as conn:
-            return await conn.fetchval(query, *args)
-    
+        return await self._run("fetchval", query, args, prepared)
+
+    def get_stats(self, top: int = 10) -> Dict[str, Any]:
+        """
+        Returns pool, query and buffer statistics
+
+        Args:
+            top: Number of queries to include, ranked by total time
+
+        Returns:
+            Dict with pool usage, connection health, acquire wait, slowest
+            queries, buffers and entity caches
+        """
+        return {
+            "backend": self.backend.name,
+            "pool": {**self.backend.pool_stats(), "exhausted": self.stats.pool_exhausted},
+            "health": {
+                **self.breaker.stats(),
+                "reconnecting": self._reconnect_task is not None and not self._reconnect_task.done(),
+                "reconnect_attempts": self.reconnect_attempts,
+            },
+            "acquire_wait": self.stats.acquire_wait.summary(),
+            "slow_query_ms": self.stats.slow_query_ms,
+            "hot_queries": len(self.hot_queries),
+            "queries": self.stats.top(top),
+            "buffers": [buffer.stats() for buffer in self.buffers.values()],
+            "entities": [entity.stats() for entity in self.entities.values()],
+            "listener": self.listener.stats() if self.listener else None,
+        }
+
+    def buffer(self, table: str, key_columns: Sequence[str], columns: Sequence[str],
+               max_size: Optional[int] = None, flush_interval: Optional[float] = None,
+               timestamp_column: Optional[str] = None) -> UpsertBuffer:
+        """
+        Returns the write-behind buffer for a table, creating it on first use
+
+        Args:
+            table: Target table
+            key_columns: Primary key columns
+            columns: Columns updated on conflict
+            max_size: Pending rows that trigger a flush
+            flush_interval: Seconds between periodic flushes
+            timestamp_column: Column set to CURRENT_TIMESTAMP on update, e.g. "updated_at"
+
+        Returns:
+            UpsertBuffer
+        """
+        if table not in self.buffers:
+            self.buffers[table] = UpsertBuffer(
+                self, table, key_columns, columns,
+                max_size=max_size or int(os.getenv("DB_BUFFER_SIZE", "500")),
+                flush_interval=flush_interval or float(os.getenv("DB_BUFFER_INTERVAL", "5")),
+                max_pending=int(os.getenv("DB_BUFFER_MAX_PENDING", "0")) or None,
+                timestamp_column=timestamp_column,
+            )
+        return self.buffers[table]
+
+    def entity(self, table: str, key_column: str, columns: Sequence[str],
+               key_type: Callable[[str], Any] = int, maxsize: Optional[int] = None,
+               ttl: Optional[float] = None, negative_ttl: Optional[float] = None) -> EntityCache:
+        """
+        Returns the read-through cache of a table, creating it on first use
+
+        Tables created outside `init_tables` need `watch_table` once their
+        table exists, or other processes' writes will not invalidate them.
+
+        Args:
+            table: Source table
+            key_column: Primary key column
+            columns: Columns kept for each row
+            key_type: Type of the key, used to parse invalidation messages
+            maxsize: Maximum number of cached keys
+            ttl: Seconds a row stays cached, None to keep it until invalidated
+            negative_ttl: Seconds a missing row stays cached
+
+        Returns:
+            EntityCache
+        """
+        if table not in self.entities:
+            self.entities[table] = EntityCache(
+                self, table, key_column, columns, key_type=key_type,
+                maxsize=maxsize or int(os.getenv("ENTITY_CACHE_SIZE", "10000")),
+                ttl=ttl,
+                negative_ttl=negative_ttl if negative_ttl is not None else float(os.getenv("ENTITY_NEGATIVE_TTL", "60")),
+            )
+        return self.entities[table]
+
+    @property
+    def entities_consistent(self) -> bool:
+        """Whether writes made by other processes are currently reaching the entity caches"""
+        if not self.backend.supports_notify:
+            # Embedded backends are written by this process only
+            return True
+        return self.listener is not None and self.listener.live
+
+    def invalidate_entities(self, table: Optional[str] = None, keys: Optional[Iterable[Any]] = None):
+        """
+        Drops cached rows in this process; other processes learn about
+        writes through the table triggers
+
+        Args:
+            table: Table whose cache is invalidated, every table when omitted
+            keys: Keys to drop, the whole table when omitted
+        """
+        entities = self.entities.values() if table is None else filter(None, [self.entities.get(table)])
+        for entity in entities:
+            if keys is None:
+                entity.invalidate()
+            else:
+                for key in keys:
+                    entity.invalidate(key)
+
+    def _apply_invalidation(self, table: str, key: str):
+        entity = self.entities.get(table)
+        if entity is not None:
+            entity.invalidate_payload(key)
+
+    async def watch_table(self, table: str, key_column: str, columns: Optional[Sequence[str]] = None):
+        """
+        Installs the triggers that publish writes to a table on the
+        invalidation channel. No-op on backends without NOTIFY.
+
+        Updates are only published when one of `columns` (or the key)
+        actually changes, so upserts that rewrite the same values or only
+        bump a timestamp do not evict the row in every process.
+
+        Args:
+            table: Table to watch
+            key_column: Primary key column sent as the invalidated key
+            columns: Cached columns; any change to the row counts when omitted
+        """
+        if not self.backend.supports_notify:
+            return
+        await self.execute(f"""
+            CREATE OR REPLACE TRIGGER {table}_invalidate
+            AFTER INSERT OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION mizuki_notify_invalidation('{key_column}')
+        """)
+        if columns:
+            watched = (key_column,) + tuple(column for column in columns if column != key_column)
+            update = f"UPDATE OF {', '.join(watched)}"
+            changed = " OR ".join(f"OLD.{column} IS DISTINCT FROM NEW.{column}" for column in watched)
+        else:
+            update, changed = "UPDATE", "OLD.* IS DISTINCT FROM NEW.*"
+        await self.execute(f"""
+            CREATE OR REPLACE TRIGGER {table}_invalidate_update
+            AFTER {update} ON {table}
+            FOR EACH ROW WHEN ({changed})
+            EXECUTE FUNCTION mizuki_notify_invalidation('{key_column}')
+        """)
+
+    def queue_guild(self, guild_id: int, name: str):
+        """
+        Queues a guild upsert; the stored prefix is left untouched
+
+        Args:
+            guild_id: Discord guild ID
+            name: Guild name
+        """
+        self.buffer("guilds", ("guild_id",), ("name",), timestamp_column="updated_at").add(guild_id, name[:100])
+
+    def queue_user(self, user_id: int, username: str):
+        """
+        Queues a user upsert
+
+        Args:
+            user_id: Discord user ID
+            username: Username
+        """
+        self.buffer("users", ("user_id",), ("username",), timestamp_column="updated_at").add(user_id, username[:32])
+
+    async def flush_buffers(self) -> int:
+        """
+        Flushes every write-behind buffer
+
+        Returns:
+            Number of rows written
+        """
+        written = 0
+        for buffer in list(self.buffers.values()):
+            written += await buffer.flush()
+        return written
+
+    async def close_buffers(self):
+        """Stops every write-behind buffer after a final flush"""
+        for buffer in list(self.buffers.values()):
+            try:
+                await buffer.close()
+            except Exception as e:
+                logger.error(f"❌ Error closing {buffer.table} buffer: {e}")
+
     async def init_tables(self):
         """Initializes the necessary database tables"""
         try:
@@ -154,6 +1268,34 @@ class Database:
                 )
             """)
             
+            # Delayed jobs that survive restarts, see src/bot/core/scheduler.py
+            await self.execute("""
+                CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                    job_id VARCHAR(32) PRIMARY KEY,
+                    owner VARCHAR(100) NOT NULL,
+                    name VARCHAR(100) NOT NULL,
+                    run_at DOUBLE PRECISION NOT NULL,
+                    payload TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            if self.backend.supports_notify:
+                # Publishes "table:key" for every written row; delivered on commit
+                await self.execute(f"""
+                    CREATE OR REPLACE FUNCTION mizuki_notify_invalidation() RETURNS trigger AS $$
+                    BEGIN
+                        PERFORM pg_notify(
+                            '{INVALIDATION_CHANNEL}',
+                            TG_TABLE_NAME || ':' || (to_jsonb(COALESCE(NEW, OLD)) ->> TG_ARGV[0])
+                        );
+                        RETURN NULL;
+                    END;
+                    $$ LANGUAGE plpgsql
+                """)
+                for entity in list(self.entities.values()):
+                    await self.watch_table(entity.table, entity.key_column, entity.columns)
+
             logger.info("✅ Tables initialized successfully")
             
         except Exception as e:
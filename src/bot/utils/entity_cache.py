@@ -0,0 +1,296 @@
+"""
+Read-through entity cache for Mizuki Bot
+Serves keyed row lookups from memory and keeps them consistent across
+bot processes with PostgreSQL LISTEN/NOTIFY
+"""
+
+import asyncio
+import asyncpg
+import logging
+import random
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Sequence, Set
+
+from src.bot.utils.cache import LRUCache
+
+
+logger = logging.getLogger("mizuki.database.entities")
+
+# Channel the invalidation triggers notify, payload is "table:key"
+INVALIDATION_CHANNEL = "mizuki_invalidate"
+
+_MISSING = object()
+# Cached for keys without a row, so repeated misses do not reach the database
+_ABSENT = object()
+
+
+def _retrieve(task: asyncio.Task):
+    # Marks the error of a load retrieved when every caller gave up on it
+    if not task.cancelled():
+        task.exception()
+
+
+class EntityCache:
+    """
+    Read-through cache of the rows of one table, keyed by primary key.
+
+    Lookups are answered from a bounded LRU. A miss runs one query, shared
+    by concurrent callers of the same key, and caches the result, including
+    "no such row" for `negative_ttl` seconds. Writes to the table drop the
+    key in every process (see `Database.watch_table`). A lookup still in
+    flight when its key is invalidated is returned but not cached, since it
+    may have read the row before the write committed.
+    """
+
+    def __init__(self, database, table: str, key_column: str, columns: Sequence[str],
+                 key_type: Callable[[str], Hashable] = int, maxsize: int = 10000,
+                 ttl: Optional[float] = None, negative_ttl: float = 60.0):
+        """
+        Args:
+            database: Database the rows are loaded from
+            table: Source table
+            key_column: Primary key column
+            columns: Columns kept for each row
+            key_type: Converts a key received in a notification back to its type
+            maxsize: Maximum number of keys kept in memory
+            ttl: Seconds a row stays cached, or None to keep it until invalidated
+            negative_ttl: Seconds a missing row stays cached
+        """
+        self.database = database
+        self.table = table
+        self.key_column = key_column
+        self.columns = tuple(columns)
+        self.key_type = key_type
+        self.negative_ttl = negative_ttl
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.query = f"SELECT {key_column}, {', '.join(self.columns)} FROM {table} WHERE {key_column} = $1"
+
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+        self._stale: Set[Hashable] = set()
+
+        self.loads = 0
+        self.bypassed = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.cache
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns the row stored under a key, from memory when possible
+
+        Args:
+            key: Primary key value
+
+        Returns:
+            The row, or None if there is no row for the key
+        """
+        if not self.database.entities_consistent:
+            # Invalidations may be getting lost: cached rows cannot be trusted and nothing new is cached
+            self.bypassed += 1
+            return await self.database.fetchrow(self.query, key, prepared=True)
+
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return None if value is _ABSENT else value
+
+        pending = self._pending.get(key)
+        if pending is None:
+            # The load runs on its own task, so a caller that gives up does not cancel it for the others
+            pending = self._pending[key] = asyncio.create_task(self._load(key), name=f"entity-load:{self.table}")
+            pending.add_done_callback(_retrieve)
+        return await asyncio.shield(pending)
+
+    async def _load(self, key: Hashable) -> Optional[Any]:
+        try:
+            row = await self.database.fetchrow(self.query, key, prepared=True)
+        finally:
+            del self._pending[key]
+            stale = key in self._stale
+            self._stale.discard(key)
+
+        self.loads += 1
+        if not stale:
+            self.prime(key, row)
+        return row
+
+    def prime(self, key: Hashable, row: Optional[Any]):
+        """
+        Stores a row loaded elsewhere, e.g. by a bulk warm-up query
+
+        Args:
+            key: Primary key value
+            row: Row with at least the cached columns, or None if there is none
+        """
+        if row is None:
+            self.cache.set(key, _ABSENT, ttl=self.negative_ttl)
+        else:
+            self.cache.set(key, row)
+
+    def prime_many(self, rows: Iterable[Any]) -> int:
+        """
+        Stores many rows, keyed by their key column
+
+        Returns:
+            Number of rows stored
+        """
+        stored = 0
+        for row in rows:
+            self.prime(row[self.key_column], row)
+            stored += 1
+        return stored
+
+    def invalidate(self, key: Hashable = _MISSING):
+        """Drops one key, or every key when none is given"""
+        if key is _MISSING:
+            self.cache.clear()
+            self._stale.update(self._pending)
+            return
+
+        self.cache.invalidate(key)
+        if key in self._pending:
+            self._stale.add(key)
+
+    def invalidate_changed(self, key: Hashable, values: Dict[str, Any]):
+        """
+        Drops a key after this process wrote it, unless the cached row already holds the written values
+
+        Args:
+            key: Primary key value
+            values: Written column values
+        """
+        cached = self.cache.get(key, _MISSING, count=False)
+        if cached is _MISSING:
+            if key in self._pending:
+                self._stale.add(key)
+            return
+        if cached is not _ABSENT and all(cached[column] == value for column, value in values.items()
+                                         if column in self.columns):
+            return
+        self.invalidate(key)
+
+    def invalidate_payload(self, key: str):
+        """Drops a key received as text in a notification"""
+        try:
+            self.invalidate(self.key_type(key))
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalidation of {self.table} with malformed key {key!r}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "table": self.table,
+            **self.cache.stats(),
+            "loads": self.loads,
+            "bypassed": self.bypassed,
+        }
+
+
+class InvalidationListener:
+    """
+    Dedicated LISTEN connection that applies the invalidations of every process.
+
+    Notifications sent while the connection is down are lost, so the entity
+    caches are only trusted while it is up: they are emptied when it drops
+    and again when it reconnects, and lookups skip the cache in between.
+    """
+
+    def __init__(self, connect: Callable[[], Awaitable[asyncpg.Connection]],
+                 on_invalidate: Callable[[str, str], None], on_reset: Callable[[], None],
+                 retry_min: float = 1.0, retry_max: float = 60.0, keepalive: float = 30.0):
+        """
+        Args:
+            connect: Opens a new connection outside the pool
+            on_invalidate: Called with the table and key of every notification
+            on_reset: Called when notifications may have been missed
+            retry_min: Initial seconds between reconnect attempts
+            retry_max: Maximum seconds between reconnect attempts
+            keepalive: Seconds between liveness checks of an idle connection
+        """
+        self._connect = connect
+        self._on_invalidate = on_invalidate
+        self._on_reset = on_reset
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        self.keepalive = keepalive
+
+        self.live = False
+        self.notifications = 0
+        self.reconnects = 0
+        self._task: Optional[asyncio.Task] = None
+        self._live = asyncio.Event()
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(), name="db-invalidation-listener")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait_live(self, timeout: float) -> bool:
+        """
+        Waits until notifications are being received
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Whether the listener is live
+        """
+        try:
+            await asyncio.wait_for(self._live.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.live
+
+    def _notify(self, connection, pid: int, channel: str, payload: str):
+        self.notifications += 1
+        table, _, key = payload.partition(":")
+        self._on_invalidate(table, key)
+
+    async def _run(self):
+        delay = self.retry_min
+        while True:
+            conn = None
+            lost = asyncio.Event()
+            try:
+                conn = await self._connect()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(INVALIDATION_CHANNEL, self._notify)
+
+                # Anything cached so far may have missed a notification
+                self._on_reset()
+                self.live = True
+                self._live.set()
+                delay = self.retry_min
+                logger.info(f"Listening for cache invalidations on {INVALIDATION_CHANNEL}")
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        # An idle socket does not notice a dead peer on its own
+                        await conn.execute("SELECT 1", timeout=self.keepalive)
+                logger.warning("Invalidation listener connection lost, entity caches bypassed until it is back")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Invalidation listener failed, retrying in up to {delay:.1f}s: {e}")
+            finally:
+                if self.live:
+                    # Rows cached so far may already be stale; do not keep them until the reconnect
+                    self._on_reset()
+                self.live = False
+                self._live.clear()
+                if conn is not None and not conn.is_closed():
+                    conn.terminate()
+
+            self.reconnects += 1
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            delay = min(delay * 2, self.retry_max)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"live": self.live, "notifications": self.notifications, "reconnects": self.reconnects}
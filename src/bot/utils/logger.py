@@ -1,32 +1,225 @@
+import atexit
+import json
 import logging
 import logging.handlers
+import os
+import queue
+import random
 import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+
+TEXT_FORMAT = '%(asctime)s | %(name)-20s | %(levelname)-8s | %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Thins out high-frequency records below WARNING before they are queued.
+
+    Each logger gets a token bucket of `rate_limit` records per second, and
+    loggers matching a `sample_rates` prefix only keep that fraction of
+    their records. Warnings and errors always pass.
+    """
+
+    def __init__(self, rate_limit: float = 0, sample_rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.rate_limit = rate_limit
+        # Longest prefix first so "plugins.PingPlugin" wins over "plugins"
+        self.sample_rates: List[Tuple[str, float]] = sorted(
+            (sample_rates or {}).items(), key=lambda item: len(item[0]), reverse=True
+        )
+        self._buckets: Dict[str, List[float]] = {}
+        self.sampled_out = 0
+        self.rate_limited = 0
+
+    def _sample_rate(self, name: str) -> float:
+        for prefix, rate in self.sample_rates:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        if self.sample_rates:
+            rate = self._sample_rate(record.name)
+            if rate < 1.0 and random.random() >= rate:
+                self.sampled_out += 1
+                return False
+
+        if self.rate_limit > 0:
+            now = time.monotonic()
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = [self.rate_limit, now]
+            tokens = min(self.rate_limit, bucket[0] + (now - bucket[1]) * self.rate_limit)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                self.rate_limited += 1
+                return False
+            bucket[0] = tokens - 1
+
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller.
+
+    Records below WARNING are dropped once `capacity` records are waiting;
+    warnings and errors may use the rest of the queue, so a burst of debug
+    output cannot push out an error. Dropped records are counted and, once
+    there is room again, a single warning reports how many were lost.
+    """
+
+    def __init__(self, log_queue: queue.Queue, capacity: int):
+        super().__init__(log_queue)
+        self.capacity = capacity
+        self.dropped = 0
+        self._unreported = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the arguments here; formatting, including tracebacks,
+        # happens on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if record.levelno < logging.WARNING and self.queue.qsize() >= self.capacity:
+                raise queue.Full
+            if self._unreported:
+                with self._lock:
+                    unreported, self._unreported = self._unreported, 0
+                if unreported:
+                    self.queue.put_nowait(logging.makeLogRecord({
+                        "name": "mizuki.logging",
+                        "levelno": logging.WARNING,
+                        "levelname": "WARNING",
+                        "msg": f"Log queue full, dropped {unreported} records",
+                    }))
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                self._unreported += 1
+
+
+def _parse_sample_rates(value: str) -> Dict[str, float]:
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+
+def get_log_stats() -> Dict[str, int]:
+    """
+    Counters of the logging pipeline
+
+    Returns:
+        Dict with queued, dropped, sampled_out and rate_limited records
+    """
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0, "sampled_out": 0, "rate_limited": 0}
+
+    sampling = next((f for f in _queue_handler.filters if isinstance(f, SamplingFilter)), None)
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "sampled_out": sampling.sampled_out if sampling else 0,
+        "rate_limited": sampling.rate_limited if sampling else 0,
+    }
+
+
+def stop_logger():
+    """Flushes the queue, stops the background writer and closes its handlers"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            pass
+        # The file handler keeps its log file open until closed (and setup_logger opens a new one)
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
 
 def setup_logger():
-    formatter = logging.Formatter(
-        '%(asctime)s | %(name)-20s | %(levelname)-8s | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    global _listener, _queue_handler
+    stop_logger()
+
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT)
 
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
 
     file_handler = logging.handlers.RotatingFileHandler(
-        filename='bot.log',
+        filename=os.getenv("LOG_FILE", "bot.log"),
         maxBytes=1048576,
         backupCount=5,
         encoding='utf-8'
     )
     file_handler.setFormatter(formatter)
 
+    # Console and file I/O (and rotation) run on the listener's thread, so the
+    # event loop only pays for putting the record on the queue
+    capacity = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=capacity * 2), capacity)
+    _queue_handler.addFilter(SamplingFilter(
+        rate_limit=float(os.getenv("LOG_RATE_LIMIT", "0")),
+        sample_rates=_parse_sample_rates(os.getenv("LOG_SAMPLING", "")),
+    ))
+    _listener = logging.handlers.QueueListener(
+        _queue_handler.queue, console_handler, file_handler, respect_handler_level=True
+    )
+
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
 
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
 
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
+    root_logger.addHandler(_queue_handler)
+    _listener.start()
 
     logging.getLogger('discord').setLevel(logging.WARNING)
-    logging.getLogger('discord.http').setLevel(logging.INFO)
\ No newline at end of file
+    logging.getLogger('discord.http').setLevel(logging.INFO)
+
+
+atexit.register(stop_logger)
@@ -0,0 +1,174 @@
+"""
+Lightweight metrics primitives for Mizuki Bot
+Fixed-bucket latency histograms and sample windows cheap enough for hot paths
+"""
+
+import math
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+
+# Bucket upper bounds in milliseconds; the last bucket catches everything else
+DEFAULT_BUCKETS_MS = (
+    0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+)
+
+
+class LatencyHistogram:
+    """Latency histogram with fixed millisecond buckets"""
+
+    __slots__ = ("buckets", "counts", "count", "total", "max")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        """
+        Records one sample
+
+        Args:
+            value_ms: Sample in milliseconds
+        """
+        self.counts[bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimates a percentile from the buckets
+
+        Args:
+            q: Percentile between 0 and 100
+
+        Returns:
+            Upper bound of the bucket holding the percentile, in milliseconds
+        """
+        if not self.count:
+            return 0.0
+
+        rank = self.count * q / 100
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index < len(self.buckets):
+                    return min(self.buckets[index], self.max)
+                return self.max
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean, 3),
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class RingBuffer:
+    """Fixed-size window of the most recent samples with exact percentiles"""
+
+    __slots__ = ("size", "_values", "_index", "_count")
+
+    def __init__(self, size: int = 512):
+        self.size = size
+        self._values = [0.0] * size
+        self._index = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, value: float) -> None:
+        self._values[self._index] = value
+        self._index = (self._index + 1) % self.size
+        if self._count < self.size:
+            self._count += 1
+
+    def values(self) -> List[float]:
+        """Samples in insertion order, oldest first"""
+        if self._count < self.size:
+            return self._values[:self._count]
+        return self._values[self._index:] + self._values[:self._index]
+
+    @property
+    def last(self) -> float:
+        return self._values[self._index - 1] if self._count else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Nearest-rank percentiles over the current window
+
+        Returns:
+            Dict with count, last, p50, p95, p99 and max
+        """
+        ordered = sorted(self._values[:self._count])
+        if not ordered:
+            return {"count": 0, "last": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+        def rank(q: float) -> float:
+            return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+        return {
+            "count": len(ordered),
+            "last": round(self.last, 3),
+            "p50": round(rank(50), 3),
+            "p95": round(rank(95), 3),
+            "p99": round(rank(99), 3),
+            "max": round(ordered[-1], 3),
+        }
+
+
+class CommandStats:
+    """Invocation, latency and error accounting for a single command"""
+
+    __slots__ = ("invocations", "errors", "throttled", "error_types", "wall", "first_response")
+
+    def __init__(self):
+        self.invocations = 0
+        self.errors = 0
+        self.throttled = 0
+        self.error_types: Dict[str, int] = {}
+        self.wall = LatencyHistogram()
+        self.first_response = LatencyHistogram()
+
+    def record(self, wall_ms: float, first_response_ms: Optional[float] = None,
+               error: Optional[BaseException] = None) -> None:
+        """
+        Records one invocation
+
+        Args:
+            wall_ms: Total time spent in the command
+            first_response_ms: Time until the interaction was first answered, if it was
+            error: Exception raised by the command, if any
+        """
+        self.invocations += 1
+        self.wall.observe(wall_ms)
+        if first_response_ms is not None:
+            self.first_response.observe(first_response_ms)
+        if error is not None:
+            self.errors += 1
+            name = type(error).__name__
+            self.error_types[name] = self.error_types.get(name, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "invocations": self.invocations,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "error_types": dict(self.error_types),
+            "wall": self.wall.summary(),
+            "first_response": self.first_response.summary(),
+        }
@@ -0,0 +1,202 @@
+"""
+Statistical profiler and stack attribution for the event loop thread
+Samples another thread's Python stack with sys._current_frames(), so the
+profiled code runs unmodified and nothing is installed while idle
+"""
+
+import collections
+import os
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+
+PLUGINS_PACKAGE = "src.bot.plugins"
+
+# Innermost frames of an event loop waiting for I/O or timers
+IDLE_FRAMES = {("selectors.py", "select")}
+
+# (function, file, first line) of a frame's code object
+FunctionKey = Tuple[str, str, int]
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def plugin_of(frame: Optional[FrameType]) -> Optional[str]:
+    """
+    Package name of the innermost plugin whose code is on the stack
+
+    Args:
+        frame: Innermost frame of the stack
+
+    Returns:
+        Plugin package name (as used by /reload), or None when no plugin code is running
+    """
+    while frame is not None:
+        parts = frame.f_globals.get("__name__", "").split(".")
+        # src.bot.plugins.<package>.<module>; base_plugin is shared plugin machinery
+        if len(parts) > 4 and ".".join(parts[:3]) == PLUGINS_PACKAGE:
+            return parts[3]
+        frame = frame.f_back
+    return None
+
+
+def short_path(filename: str) -> str:
+    """Path relative to the project, or the last two components for library code"""
+    if filename.startswith(_ROOT + os.sep):
+        return os.path.relpath(filename, _ROOT)
+    return os.path.join(*filename.split(os.sep)[-2:]) if os.sep in filename else filename
+
+
+def function_key(frame: FrameType) -> FunctionKey:
+    code = frame.f_code
+    return code.co_qualname, short_path(code.co_filename), code.co_firstlineno
+
+
+def format_stack(frame: Optional[FrameType], limit: int = 20) -> List[str]:
+    """
+    Innermost-last lines of a stack, `function (file:line)`
+
+    Args:
+        frame: Innermost frame
+        limit: Frames kept, counting from the innermost one
+
+    Returns:
+        One line per frame
+    """
+    lines = []
+    while frame is not None and len(lines) < limit:
+        name, path, _ = function_key(frame)
+        lines.append(f"{name} ({path}:{frame.f_lineno})")
+        frame = frame.f_back
+    return lines[::-1]
+
+
+def is_idle(frame: Optional[FrameType]) -> bool:
+    # uvloop waits in C, leaving no Python frame on the stack
+    if frame is None:
+        return True
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread at a fixed interval
+
+    Samples taken while the event loop waits for I/O count as idle; the
+    function and plugin tables only cover busy samples, which is what
+    competes with the gateway heartbeats.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005, max_depth: int = 64):
+        """
+        Args:
+            thread_id: Thread to sample, normally the event loop's
+            interval: Seconds between samples
+            max_depth: Frames kept per sample, counting from the innermost one
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+
+        self.samples = 0
+        self.idle = 0
+        self.duration = 0.0
+        self.self_counts: Dict[FunctionKey, int] = collections.Counter()
+        self.total_counts: Dict[FunctionKey, int] = collections.Counter()
+        self.plugins: Dict[str, int] = collections.Counter()
+        self.stacks: Dict[Tuple[FunctionKey, ...], int] = collections.Counter()
+
+    def run(self, duration: float):
+        """
+        Samples for `duration` seconds; blocks, so call it from a worker thread
+
+        Args:
+            duration: Seconds to sample for
+        """
+        if self.thread_id == threading.get_ident():
+            raise RuntimeError("A thread cannot sample itself")
+
+        # The sampler needs the GIL to look at the stack. With the default 5ms
+        # switch interval the loop thread only hands it over when it goes idle,
+        # hiding short busy stretches; a shorter interval removes that bias.
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch_interval, self.interval / 20))
+        start = time.perf_counter()
+        deadline = start + duration
+        try:
+            while time.perf_counter() < deadline:
+                self._sample(sys._current_frames().get(self.thread_id))
+                time.sleep(self.interval)
+        finally:
+            sys.setswitchinterval(switch_interval)
+            self.duration += time.perf_counter() - start
+
+    def _sample(self, frame: Optional[FrameType]):
+        self.samples += 1
+        if is_idle(frame):
+            self.idle += 1
+            return
+
+        self.plugins[plugin_of(frame) or "(core)"] += 1
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            stack.append(function_key(frame))
+            frame = frame.f_back
+        self.self_counts[stack[0]] += 1
+        # Recursive functions count once per sample
+        for key in set(stack):
+            self.total_counts[key] += 1
+        self.stacks[tuple(reversed(stack))] += 1
+
+    @property
+    def busy(self) -> int:
+        return self.samples - self.idle
+
+    def summary(self, top: int = 5) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "busy": self.busy,
+            "busy_ratio": self.busy / self.samples if self.samples else 0.0,
+            "duration": self.duration,
+            "plugins": self.plugins.most_common(top),
+            "functions": [(f"{name} ({path})", count) for (name, path, _), count in self.self_counts.most_common(top)],
+        }
+
+    def report(self, top: int = 25, header: Optional[List[str]] = None) -> str:
+        """
+        Plain text report of the collected samples
+
+        Args:
+            top: Rows per table
+            header: Extra lines printed under the title
+
+        Returns:
+            Report with the plugin share, the functions by self and total
+            time, and the hottest stacks in folded format (one line per
+            stack, outermost frame first), ready for flamegraph tools
+        """
+        busy = self.busy or 1
+        lines = [
+            "Mizuki sampling profile",
+            f"{self.duration:.1f}s at {self.interval * 1000:g}ms intervals: {self.samples} samples, "
+            f"{self.busy} busy ({self.busy / (self.samples or 1):.1%}), {self.idle} idle",
+        ]
+        lines += header or []
+
+        lines += ["", "Busy samples by plugin", f"{'share':>7} {'samples':>8}  plugin"]
+        lines += [f"{count / busy:>7.1%} {count:>8}  {plugin}" for plugin, count in self.plugins.most_common(top)]
+
+        for title, counter in (("self", self.self_counts), ("total", self.total_counts)):
+            lines += ["", f"Top functions by {title} time", f"{'self':>7} {'total':>7}  function"]
+            for key, _ in counter.most_common(top):
+                name, path, line = key
+                lines.append(f"{self.self_counts[key] / busy:>7.1%} {self.total_counts[key] / busy:>7.1%}  "
+                             f"{name} ({path}:{line})")
+
+        lines += ["", "Hottest stacks (folded)"]
+        for stack, count in self.stacks.most_common(top):
+            lines.append(";".join(f"{name} ({path}:{line})" for name, path, line in stack) + f" {count}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,210 @@
+"""
+Shared rate-limit engine for plugin commands
+
+Every limit is a token bucket implemented with GCRA: the only state kept per
+key is the bucket's "theoretical arrival time", a single float. Keys whose
+bucket has refilled completely carry no information and are removed by a
+timing-wheel sweep, so memory only grows with the keys that are actually
+being throttled.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from typing import Dict, Hashable, List, NamedTuple, Optional, Set, Tuple
+
+
+logger = logging.getLogger("mizuki.ratelimit")
+
+# Scopes a limit can be keyed by; "plugin" is one bucket shared by every caller
+SCOPES = ("user", "channel", "guild", "plugin")
+
+# Slots in each bucket's timing wheel; a full turn spans the limit's period
+WHEEL_SLOTS = 64
+
+# Waits shorter than this are float rounding error from adding up emission
+# intervals (7 * (30 / 7) is not exactly 30), not a real limit
+EPSILON = 1e-6
+
+# Limits by scope as (calls, seconds); None disables an inherited limit
+RateLimits = Dict[str, Optional[Tuple[int, float]]]
+
+
+class RateLimit(NamedTuple):
+    """Allows `rate` calls every `per` seconds, with bursts of up to `rate` calls"""
+    rate: int
+    per: float
+
+
+class Bucket:
+    """Token buckets for one limit, one float of state per key"""
+
+    __slots__ = ("limit", "interval", "tolerance", "resolution", "_tat", "_wheel", "_tick")
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        # GCRA: each call pushes the arrival time forward by one emission
+        # interval and a call is allowed while it is at most `per` ahead
+        self.interval = limit.per / limit.rate
+        self.tolerance = limit.per - self.interval
+        self.resolution = max(limit.per / WHEEL_SLOTS, 0.05)
+        self._tat: Dict[Hashable, float] = {}
+        # A key's arrival time is never more than `per` ahead of now, so one
+        # turn of the wheel covers every live key
+        self._wheel: List[Set[Hashable]] = [set() for _ in range(math.ceil(limit.per / self.resolution) + 2)]
+        self._tick = int(time.monotonic() // self.resolution)
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def _slot(self, when: float) -> Set[Hashable]:
+        return self._wheel[int(when // self.resolution) % len(self._wheel)]
+
+    def retry_after(self, key: Hashable, now: float) -> float:
+        """Seconds until `key` may call again, 0 if it may call now"""
+        tat = self._tat.get(key)
+        if tat is None:
+            return 0.0
+        wait = tat - self.tolerance - now
+        return wait if wait > EPSILON else 0.0
+
+    def consume(self, key: Hashable, now: float):
+        tat = self._tat.get(key)
+        if tat is None or tat < now:
+            if tat is None:
+                self._slot(now + self.interval).add(key)
+            tat = now
+        self._tat[key] = tat + self.interval
+
+    def hit(self, key: Hashable, now: Optional[float] = None) -> float:
+        """
+        Checks and consumes one call
+
+        Args:
+            key: Id of the user, channel, guild... being limited
+            now: Current monotonic time
+
+        Returns:
+            0 if the call is allowed, otherwise the seconds to wait
+        """
+        now = time.monotonic() if now is None else now
+        tat = self._tat.get(key)
+        if tat is None:
+            self._slot(now + self.interval).add(key)
+            tat = now
+        elif tat < now:
+            tat = now
+        elif tat - self.tolerance - now > EPSILON:
+            return tat - self.tolerance - now
+        self._tat[key] = tat + self.interval
+        return 0.0
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Removes the keys whose bucket is full again
+
+        Only the wheel slots that elapsed since the last sweep are visited.
+        Keys that were used again in the meantime are moved to the slot of
+        their new expiry.
+
+        Returns:
+            Number of keys removed
+        """
+        now = time.monotonic() if now is None else now
+        current = int(now // self.resolution)
+        slots = len(self._wheel)
+        first = max(self._tick, current - slots + 1)
+        removed = 0
+
+        for tick in range(first, current + 1):
+            index = tick % slots
+            keys, self._wheel[index] = self._wheel[index], set()
+            for key in keys:
+                tat = self._tat.get(key)
+                if tat is None:
+                    continue
+                if tat <= now:
+                    del self._tat[key]
+                    removed += 1
+                else:
+                    self._slot(tat).add(key)
+
+        self._tick = current
+        return removed
+
+
+class RateLimiter:
+    """
+    Registry of named buckets shared by every plugin, plus the sweep task.
+
+    Buckets are identified by name (plugin, command, scope), so a reloaded
+    plugin keeps throttling the same callers.
+    """
+
+    def __init__(self, sweep_interval: Optional[float] = None):
+        self.sweep_interval = sweep_interval or float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", "1.0"))
+        self.buckets: Dict[Tuple[str, ...], Bucket] = {}
+        self.throttled = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def bucket(self, name: Tuple[str, ...], limit: RateLimit) -> Bucket:
+        """Returns the bucket registered under `name`, replacing it if the limit changed"""
+        bucket = self.buckets.get(name)
+        if bucket is None or bucket.limit != limit:
+            bucket = self.buckets[name] = Bucket(limit)
+        return bucket
+
+    def check(self, checks: List[Tuple[Bucket, Hashable]]) -> float:
+        """
+        Consumes one call from every bucket, or from none of them
+
+        Args:
+            checks: Bucket and key pairs that all have to allow the call
+
+        Returns:
+            0 if the call is allowed, otherwise the longest wait
+        """
+        now = time.monotonic()
+        retry = max((bucket.retry_after(key, now) for bucket, key in checks), default=0.0)
+        if retry:
+            self.throttled += 1
+            return retry
+
+        for bucket, key in checks:
+            bucket.consume(key, now)
+        return 0.0
+
+    def sweep(self) -> int:
+        now = time.monotonic()
+        return sum(bucket.sweep(now) for bucket in self.buckets.values())
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(), name="rate-limit-sweeper")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Rate limit sweep failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buckets": len(self.buckets),
+            "keys": sum(len(bucket) for bucket in self.buckets.values()),
+            "throttled": self.throttled,
+        }
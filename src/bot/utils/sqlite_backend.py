@@ -0,0 +1,336 @@
+"""
+Embedded SQLite backend for Mizuki Bot
+Runs the PostgreSQL-flavoured queries of `Database` on a local aiosqlite store
+"""
+
+import asyncio
+import aiosqlite
+import logging
+import os
+import re
+import sqlite3
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger("mizuki.database.sqlite")
+
+_PLACEHOLDER_RE = re.compile(r"'(?:[^']|'')*'|\$(\d+)")
+_READ_RE = re.compile(r"\s*(?:SELECT|WITH|VALUES)\b", re.IGNORECASE)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_WRITE_RE = re.compile(r"\b(?:INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=2048)
+def translate(query: str) -> str:
+    """
+    Rewrites PostgreSQL `$1` placeholders as SQLite numbered `?1` parameters
+
+    Args:
+        query: SQL query written for PostgreSQL
+
+    Returns:
+        Query SQLite binds positionally, string literals left untouched
+    """
+    return _PLACEHOLDER_RE.sub(lambda match: f"?{match.group(1)}" if match.group(1) else match.group(0), query)
+
+
+@lru_cache(maxsize=2048)
+def is_read_only(query: str) -> bool:
+    """
+    Whether a query can run on a read-only connection
+
+    Args:
+        query: SQL query
+
+    Returns:
+        True for SELECT/VALUES statements, and WITH statements whose body
+        does not write (`WITH ... INSERT/UPDATE/DELETE ... RETURNING` is a write)
+    """
+    if not _READ_RE.match(query):
+        return False
+    return not _WRITE_RE.search(_LITERAL_RE.sub("", query))
+
+
+def _status(query: str, rowcount: int) -> str:
+    """asyncpg-style status string, e.g. `INSERT 0 1` or `UPDATE 3`"""
+    verb = query.lstrip().split(None, 1)[0].upper()
+    if rowcount < 0:
+        return verb
+    if verb == "INSERT":
+        return f"INSERT 0 {rowcount}"
+    return f"{verb} {rowcount}"
+
+
+class _Write:
+    __slots__ = ("method", "query", "args", "many", "future", "queued_at")
+
+    def __init__(self, method: str, query: str, args, many: bool, future: asyncio.Future):
+        self.method = method
+        self.query = query
+        self.args = args
+        self.many = many
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+
+class SQLiteBackend:
+    """
+    aiosqlite store in WAL mode with a single writer and a pool of readers.
+
+    Every statement that can write goes through one queue drained by a
+    single writer connection. Whatever is waiting when the writer becomes
+    free is committed together in one transaction (group commit), so a
+    burst of small writes costs one fsync instead of one per statement.
+    Callers are only answered once their batch is committed. Reads run
+    concurrently on read-only connections, which WAL lets proceed while
+    the writer commits.
+    """
+
+    name = "sqlite"
+    supports_notify = False
+
+    def __init__(self, database):
+        self.database = database
+        self.path = os.getenv("DB_SQLITE_PATH", "data/mizuki.db")
+        self.readers = int(os.getenv("DB_SQLITE_READERS", "4"))
+        self.batch_size = int(os.getenv("DB_SQLITE_BATCH", "256"))
+        self.statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+        # A private in-memory database only exists on the connection that created it
+        if self.path == ":memory:":
+            self.readers = 0
+
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._reader_pool: "asyncio.Queue[aiosqlite.Connection]" = asyncio.Queue()
+        self._reader_connections: List[aiosqlite.Connection] = []
+        self._writes: "asyncio.Queue[Optional[_Write]]" = asyncio.Queue()
+        self._writer_task: Optional[asyncio.Task] = None
+
+        self.commits = 0
+        self.batched_writes = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    async def _open(self, read_only: bool) -> aiosqlite.Connection:
+        if read_only:
+            conn = await aiosqlite.connect(
+                f"file:{self.path}?mode=ro", uri=True, isolation_level=None,
+                cached_statements=self.statement_cache_size
+            )
+        else:
+            conn = await aiosqlite.connect(
+                self.path, isolation_level=None, cached_statements=self.statement_cache_size
+            )
+        conn.row_factory = sqlite3.Row
+        await conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    async def connect(self):
+        directory = os.path.dirname(self.path)
+        if self.path != ":memory:" and directory:
+            os.makedirs(directory, exist_ok=True)
+
+        logger.info(f"Opening SQLite database at {self.path}")
+        self._writer = await self._open(read_only=False)
+        for pragma in ("journal_mode = WAL", "synchronous = NORMAL", "foreign_keys = ON", "temp_store = MEMORY"):
+            await self._writer.execute(f"PRAGMA {pragma}")
+
+        for _ in range(self.readers):
+            conn = await self._open(read_only=True)
+            self._reader_connections.append(conn)
+            self._reader_pool.put_nowait(conn)
+
+        self._writer_task = asyncio.create_task(self._writer_loop(), name="sqlite-writer")
+        version = await self.run("fetchval", "SELECT sqlite_version()", (), False)
+        logger.info(f"Successfully opened SQLite {version} ({self.readers} readers, WAL)")
+
+    async def close(self):
+        if self._writer_task:
+            # Let queued writes finish before closing
+            self._writes.put_nowait(None)
+            await self._writer_task
+            self._writer_task = None
+
+        for conn in self._reader_connections:
+            await conn.close()
+        self._reader_connections.clear()
+        self._reader_pool = asyncio.Queue()
+
+        if self._writer:
+            logger.info("Closing database connection")
+            await self._writer.close()
+            self._writer = None
+
+    # Writes
+
+    async def _writer_loop(self):
+        while True:
+            job = await self._writes.get()
+            if job is None:
+                return
+
+            batch = [job]
+            stop = False
+            while len(batch) < self.batch_size and not self._writes.empty():
+                job = self._writes.get_nowait()
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+
+            try:
+                await self._commit_batch(batch)
+            except Exception as e:
+                # The writer must outlive any batch, or every later write would wait forever
+                logger.exception(f"SQLite write batch failed: {e}")
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+            if stop:
+                return
+
+    async def _commit_batch(self, batch: List[_Write]):
+        conn = self._writer
+        stats = self.database.stats
+        results = []
+
+        try:
+            await conn.execute("BEGIN IMMEDIATE")
+        except Exception as e:
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        for job in batch:
+            start = time.perf_counter()
+            stats.acquire_wait.observe((start - job.queued_at) * 1000)
+            error = False
+            try:
+                results.append((job, await self._execute_write(conn, job), None))
+            except Exception as e:
+                # A failed statement only undoes itself; the batch goes on
+                error = True
+                results.append((job, None, e))
+            finally:
+                stats.record(job.query, (time.perf_counter() - start) * 1000, error)
+
+        try:
+            if conn.in_transaction:
+                await conn.execute("COMMIT")
+            else:
+                # Severe errors (disk full, I/O) roll the whole transaction back
+                raise sqlite3.OperationalError("Transaction was rolled back")
+        except Exception as e:
+            if conn.in_transaction:
+                try:
+                    await conn.execute("ROLLBACK")
+                except Exception as rollback_error:
+                    logger.error(f"SQLite rollback failed: {rollback_error}")
+            results = [(job, None, e) for job, _, _ in results]
+        else:
+            self.commits += 1
+            self.batched_writes += len(batch)
+
+        for job, result, error in results:
+            if job.future.done():
+                continue
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+    async def _execute_write(self, conn: aiosqlite.Connection, job: _Write):
+        if job.method == "copy":
+            return await self._copy_merge(conn, job.query, *job.args)
+
+        query = translate(job.query)
+        if job.many:
+            await conn.executemany(query, job.args)
+            return None
+        if job.method == "execute":
+            cursor = await conn.execute(query, job.args)
+            return _status(job.query, cursor.rowcount)
+        return self._shape(job.method, await conn.execute_fetchall(query, job.args))
+
+    @staticmethod
+    async def _copy_merge(conn: aiosqlite.Connection, merge: str, staging: str, table: str,
+                          columns: Tuple[str, ...], records: List[tuple]) -> int:
+        # Same staging + merge shape as PostgreSQL, without COPY
+        await conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging} AS SELECT * FROM {table} WHERE 0")
+        placeholders = ", ".join("?" for _ in columns)
+        await conn.executemany(f"INSERT INTO {staging} ({', '.join(columns)}) VALUES ({placeholders})", records)
+        try:
+            cursor = await conn.execute(merge)
+            return cursor.rowcount
+        finally:
+            await conn.execute(f"DELETE FROM {staging}")
+
+    def _submit(self, method: str, query: str, args, many: bool = False) -> asyncio.Future:
+        if self._writer is None:
+            raise RuntimeError("SQLite database is not connected")
+        future = asyncio.get_running_loop().create_future()
+        self._writes.put_nowait(_Write(method, query, args, many, future))
+        return future
+
+    # Reads
+
+    @staticmethod
+    def _shape(method: str, rows: List[sqlite3.Row]) -> Any:
+        if method == "fetch":
+            return list(rows)
+        row = rows[0] if rows else None
+        if method == "fetchrow":
+            return row
+        return row[0] if row is not None else None
+
+    async def _read(self, method: str, query: str, args: tuple) -> Any:
+        stats = self.database.stats
+        if self._reader_pool.empty():
+            stats.pool_exhausted += 1
+
+        start = time.perf_counter()
+        conn = await self._reader_pool.get()
+        stats.acquire_wait.observe((time.perf_counter() - start) * 1000)
+        try:
+            start = time.perf_counter()
+            error = False
+            try:
+                return self._shape(method, await conn.execute_fetchall(translate(query), args))
+            except Exception:
+                error = True
+                raise
+            finally:
+                stats.record(query, (time.perf_counter() - start) * 1000, error)
+        finally:
+            self._reader_pool.put_nowait(conn)
+
+    async def run(self, method: str, query: str, args: tuple, prepared: bool):
+        # sqlite3 keeps its own per-connection statement cache, so `prepared`
+        # needs no extra work here
+        if method != "execute" and self.readers and is_read_only(query):
+            return await self._read(method, query, args)
+        return await self._submit(method, query, args)
+
+    async def executemany(self, query: str, args):
+        return await self._submit("execute", query, list(args), many=True)
+
+    async def copy_merge(self, staging: str, table: str, columns: Sequence[str],
+                         records: List[tuple], merge: str) -> int:
+        return await self._submit("copy", merge, (staging, table, tuple(columns), records))
+
+    def pool_stats(self) -> Dict[str, Any]:
+        size = self.readers + 1 if self.connected else 0
+        return {
+            "connected": self.connected,
+            "min_size": self.readers + 1,
+            "max_size": self.readers + 1,
+            "size": size,
+            "idle": self._reader_pool.qsize() + (1 if self.connected and self._writes.empty() else 0),
+            "write_queue": self._writes.qsize(),
+            "commits": self.commits,
+            "writes_per_commit": round(self.batched_writes / self.commits, 2) if self.commits else 0.0,
+        }
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the database backends on typical bot queries
+
+Runs the same workload against every reachable backend. PostgreSQL uses
+the DB_* variables from the environment; SQLite uses a temporary file.
+Only rows with negative ids, which no Discord snowflake can have, are
+written, and exactly those are deleted afterwards.
+
+    python -m src.scripts.bench_database --backends sqlite postgres
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+from src.bot.utils.database import Database
+
+
+GUILDS = 2000
+USERS = 500
+# Discord snowflakes are positive: ids below this never belong to a real guild or user
+BENCH_ID_BASE = -(10 ** 17)
+PREFIX_LOOKUP = "SELECT prefix FROM guilds WHERE guild_id = $1"
+PREFIX_UPSERT = """
+    INSERT INTO guilds (guild_id, name, prefix)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (guild_id) DO UPDATE SET prefix = EXCLUDED.prefix, updated_at = CURRENT_TIMESTAMP
+"""
+WARM_QUERY = "SELECT guild_id, prefix FROM guilds ORDER BY updated_at DESC LIMIT $1"
+
+
+async def timed(operations: int, concurrency: int, operation) -> dict:
+    """Runs `operation` `operations` times from `concurrency` tasks and returns latency stats"""
+    latencies = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            start = time.perf_counter()
+            await operation()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    per_worker = operations // concurrency
+    await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "ops_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+async def bench_backend(name: str, operations: int, concurrency: int) -> dict:
+    db = Database(name)
+    if not await db.connect():
+        return {}
+
+    guild_ids = [BENCH_ID_BASE - i for i in range(GUILDS)]
+    user_ids = [BENCH_ID_BASE - i for i in range(USERS)]
+    try:
+        await db.init_tables()
+        try:
+            return await bench_queries(db, guild_ids, user_ids, operations, concurrency)
+        finally:
+            await db.executemany("DELETE FROM users WHERE user_id = $1", [(user_id,) for user_id in user_ids])
+            await db.executemany("DELETE FROM guilds WHERE guild_id = $1", [(guild_id,) for guild_id in guild_ids])
+    finally:
+        await db.close()
+
+
+async def bench_queries(db: Database, guild_ids, user_ids, operations: int, concurrency: int) -> dict:
+    await db.executemany(
+        "INSERT INTO guilds (guild_id, name) VALUES ($1, $2) ON CONFLICT (guild_id) DO NOTHING",
+        [(guild_id, f"guild {guild_id}") for guild_id in guild_ids]
+    )
+
+    results = {
+        "prefix lookup": await timed(operations, concurrency, lambda: db.fetchval(
+            PREFIX_LOOKUP, random.choice(guild_ids), prepared=True
+        )),
+        "prefix upsert": await timed(operations // 4, concurrency, lambda: db.execute(
+            PREFIX_UPSERT, random.choice(guild_ids), "bench", random.choice("!?$.")
+        )),
+        "warm 1000 prefixes": await timed(max(operations // 100, concurrency), concurrency, lambda: db.fetch(
+            WARM_QUERY, 1000
+        )),
+    }
+
+    async def buffered_users():
+        for user_id in user_ids:
+            db.queue_user(user_id, f"user {user_id}")
+        await db.flush_buffers()
+
+    results[f"flush {len(user_ids)} user upserts"] = await timed(max(operations // 200, 1), 1, buffered_users)
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare the database backends")
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "postgres"], choices=["sqlite", "postgres"])
+    parser.add_argument("--operations", type=int, default=5000, help="Lookups per backend")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent tasks")
+    args = parser.parse_args()
+
+    load_dotenv()
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DB_SQLITE_PATH"] = os.path.join(directory, "bench.db")
+
+        for backend in args.backends:
+            results = await bench_backend(backend, args.operations, args.concurrency)
+            if not results:
+                print(f"{backend}: not reachable, skipped")
+                continue
+
+            print(f"\n{backend}")
+            for workload, stats in results.items():
+                print(f"  {workload:<24} {stats['ops_per_s']:>9.0f} ops/s   "
+                      f"p50 {stats['p50_ms']:>7.3f}ms   p99 {stats['p99_ms']:>7.3f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the command rate limiter
+
+Measures the cost of a check and the memory held per million tracked keys.
+
+    python -m src.scripts.bench_ratelimit --keys 1000000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from src.bot.utils.ratelimit import Bucket, RateLimit, RateLimiter
+
+
+def bench_checks(keys: int, calls: int):
+    limiter = RateLimiter()
+    user = limiter.bucket(("bench", "cmd", "user"), RateLimit(5, 10.0))
+    guild = limiter.bucket(("bench", "cmd", "guild"), RateLimit(50, 10.0))
+    # Snowflake-sized ids, like real user and guild ids
+    ids = [random.getrandbits(62) for _ in range(keys)]
+    samples = [random.choice(ids) for _ in range(calls)]
+
+    start = time.perf_counter()
+    for key in samples:
+        user.hit(key)
+    single = (time.perf_counter() - start) / calls * 1e9
+
+    start = time.perf_counter()
+    for key in samples:
+        limiter.check([(user, key), (guild, key >> 8)])
+    combined = (time.perf_counter() - start) / calls * 1e9
+
+    print(f"Bucket.hit:               {single:8.1f} ns/call ({calls} calls over {keys} keys)")
+    print(f"RateLimiter.check x2:     {combined:8.1f} ns/call (user + guild scope)")
+
+
+def bench_memory(keys: int):
+    gc.collect()
+    tracemalloc.start()
+    bucket = Bucket(RateLimit(5, 10.0))
+    now = time.monotonic()
+    for key in range(10 ** 17, 10 ** 17 + keys):
+        bucket.hit(key, now)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_key = current / keys
+    print(f"Memory:                   {per_key:8.1f} bytes/key, {per_key * 1_000_000 / 2 ** 20:.1f} MiB per million keys")
+
+    start = time.perf_counter()
+    removed = bucket.sweep(now + 11)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Sweep after expiry:       {elapsed:8.1f} ms to remove {removed} keys, {len(bucket)} left")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the command rate limiter")
+    parser.add_argument("--keys", type=int, default=1_000_000, help="Distinct keys to track")
+    parser.add_argument("--calls", type=int, default=1_000_000, help="Checks to time")
+    args = parser.parse_args()
+
+    bench_checks(args.keys, args.calls)
+    bench_memory(args.keys)
+
+
+if __name__ == "__main__":
+    main()
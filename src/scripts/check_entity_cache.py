@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Checks cross-process entity cache invalidation against a local PostgreSQL
+
+Two Database instances stand in for two bot processes sharing the DB_*
+database from the environment. One writes, the other must stop serving
+its cached row once the NOTIFY arrives.
+
+    python -m src.scripts.check_entity_cache
+"""
+import asyncio
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from src.bot.utils.database import Database
+
+
+GUILD_ID = 1
+
+
+async def wait_until(predicate, timeout: float = 5.0) -> float:
+    """Polls `predicate` and returns how long it took to become true"""
+    start = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError("Invalidation did not arrive")
+        await asyncio.sleep(0.005)
+    return (time.perf_counter() - start) * 1000
+
+
+async def main() -> int:
+    load_dotenv()
+    writer, reader = Database("postgres"), Database("postgres")
+    writer_guilds = writer.entity("guilds", "guild_id", ("prefix",))
+    reader_guilds = reader.entity("guilds", "guild_id", ("prefix",))
+
+    if not await writer.connect() or not await reader.connect():
+        print("PostgreSQL is not reachable, check the DB_* variables")
+        return 1
+
+    try:
+        await writer.init_tables()
+        await writer.execute("DELETE FROM guilds WHERE guild_id = $1", GUILD_ID)
+        await wait_until(lambda: writer.entities_consistent and reader.entities_consistent)
+
+        # Negative entry, dropped by an insert made in the other process
+        assert await reader_guilds.get(GUILD_ID) is None
+        assert GUILD_ID in reader_guilds
+        await writer.execute(
+            "INSERT INTO guilds (guild_id, name, prefix) VALUES ($1, 'check', '?')", GUILD_ID
+        )
+        elapsed = await wait_until(lambda: GUILD_ID not in reader_guilds)
+        assert (await reader_guilds.get(GUILD_ID))["prefix"] == "?"
+        print(f"insert invalidated the other process after {elapsed:.1f}ms")
+
+        # Cached row, dropped by an update
+        await writer.execute("UPDATE guilds SET prefix = '$' WHERE guild_id = $1", GUILD_ID)
+        elapsed = await wait_until(lambda: GUILD_ID not in reader_guilds)
+        assert (await reader_guilds.get(GUILD_ID))["prefix"] == "$"
+        print(f"update invalidated the other process after {elapsed:.1f}ms")
+
+        # Buffered writes go through the same trigger
+        await writer_guilds.get(GUILD_ID)
+        writer.queue_guild(GUILD_ID, "renamed")
+        await writer.flush_buffers()
+        assert GUILD_ID not in writer_guilds
+        elapsed = await wait_until(lambda: GUILD_ID not in reader_guilds)
+        print(f"buffered upsert invalidated the other process after {elapsed:.1f}ms")
+
+        await reader_guilds.get(GUILD_ID)
+        await writer.execute("DELETE FROM guilds WHERE guild_id = $1", GUILD_ID)
+        elapsed = await wait_until(lambda: GUILD_ID not in reader_guilds)
+        assert await reader_guilds.get(GUILD_ID) is None
+        print(f"delete invalidated the other process after {elapsed:.1f}ms")
+
+        print("✅ Entity caches stay consistent across processes")
+        return 0
+    finally:
+        await reader.close()
+        await writer.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
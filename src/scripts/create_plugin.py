@@ -14,6 +14,9 @@ class {class_name}(BasePlugin):
     PLUGIN_VERSION = "1.0.0"
     PLUGIN_DESCRIPTION = "{description}"
     PLUGIN_AUTHOR = "{author}"
+    REQUIRED_INTENTS = ("guild_messages", "message_content")
+    # Shared throttling for every command: scope -> (calls, seconds)
+    RATE_LIMITS = {{"user": (5, 10.0)}}
 
     async def setup(self):
         self.logger.info("Loading {name}...")
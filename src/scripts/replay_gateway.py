@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Replays a gateway recording into the bot with no network access
+
+Events recorded with GATEWAY_RECORD are fed to the connection state's
+parsers exactly as the websocket would, so the real plugin set handles
+them. REST calls and interaction responses are answered locally. The
+database is a temporary SQLite file unless --database is given.
+
+    python -m src.scripts.replay_gateway data/gateway.jsonl.gz               # as recorded (1x)
+    python -m src.scripts.replay_gateway data/gateway.jsonl.gz --speed 10
+    python -m src.scripts.replay_gateway data/gateway.jsonl.gz --speed max --output replay.json
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context
+from dotenv import load_dotenv
+
+from src.bot.core.gateway_recorder import read_recording
+
+
+BOT_USER = {"id": "1", "username": "Mizuki", "discriminator": "0", "avatar": None, "bot": True}
+APPLICATION = {
+    "id": "1", "name": "Mizuki", "icon": None, "description": "", "bot_public": True,
+    "bot_require_code_grant": False, "verify_key": "", "flags": 0, "owner": BOT_USER,
+}
+
+
+class StubHTTP:
+    """Answers REST calls with payloads shaped enough for discord.py to build its models"""
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self._ids = itertools.count(10 ** 18)
+
+    def install(self, bot):
+        bot.http.request = self.request
+        # Interaction responses and followups go through the webhook adapter
+        async_context.set(StubWebhookAdapter(self))
+
+    async def request(self, route, **kwargs):
+        return self.respond(route, kwargs.get("json"))
+
+    def message(self, route, payload: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        payload = payload or {}
+        return {
+            "id": str(next(self._ids)), "channel_id": str(getattr(route, "channel_id", None) or 0),
+            "author": BOT_USER, "content": payload.get("content") or "", "embeds": payload.get("embeds") or [],
+            "timestamp": "2025-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False,
+            "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+            "pinned": False, "type": 0,
+        }
+
+    def respond(self, route, payload: Optional[Dict[str, Any]]):
+        self.calls[f"{route.method} {route.path}"] += 1
+        if route.path == "/users/@me":
+            return BOT_USER
+        if route.path == "/oauth2/applications/@me":
+            return APPLICATION
+        if route.path.endswith("/callback"):
+            return {"interaction": {"id": str(route.webhook_id), "type": 2}}
+        if "/messages" in route.path or route.path.startswith("/webhooks/"):
+            if route.method in ("POST", "PATCH"):
+                return self.message(route, payload)
+        return [] if route.method == "PUT" else {}
+
+
+class StubWebhookAdapter(AsyncWebhookAdapter):
+    def __init__(self, http: StubHTTP):
+        super().__init__()
+        self.http = http
+
+    async def request(self, route, session, *, payload=None, multipart=None, **kwargs):
+        if payload is None and multipart:
+            payload = json.loads(multipart[0]["value"])
+        # Interaction callbacks wrap the message under "data"
+        return self.http.respond(route, (payload or {}).get("data", payload))
+
+
+async def drain(timeout: float):
+    """Waits for the event handler tasks discord.py spawned to finish"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        pending = [task for task in asyncio.all_tasks() if task.get_name().startswith("discord.py: ")]
+        if not pending:
+            return
+        await asyncio.wait(pending, timeout=deadline - time.perf_counter())
+
+
+async def start_offline_bot(shards: Optional[Dict[int, int]] = None):
+    """
+    Creates a bot and runs its setup hook with REST answered by StubHTTP
+
+    Args:
+        shards: Shard id to shard count, as found in the READY events
+
+    Returns:
+        (bot, StubHTTP) tuple; release it with stop_offline_bot()
+    """
+    # Imported late: the bot reads its configuration from the environment when created
+    from src.bot.core.bot import Bot
+
+    class ReplayBot(Bot):
+        # There are no shard connections to measure; report an idle gateway instead of NaN
+        @property
+        def latency(self) -> float:
+            return 0.0
+
+        @property
+        def latencies(self):
+            return [(shard_id, 0.0) for shard_id in self._connection.shard_ids]
+
+    shards = shards or {}
+    bot = ReplayBot()
+    http = StubHTTP()
+    http.install(bot)
+    await bot.login("replay")
+
+    state = bot._connection
+    # Normally set when the shards are launched; READY waits for all of them
+    state.shard_count = bot.shard_count = max(shards.values(), default=1)
+    state.shard_ids = sorted(shards) or [0]
+    return bot, http
+
+
+async def stop_offline_bot(bot):
+    """Stops what start_offline_bot() started (Bot.close() expects shard connections)"""
+    from src.bot.utils.database import db
+
+    await bot.watchdog.stop()
+    for name in list(bot.plugins.plugins):
+        await bot.plugins.unload_plugin(name)
+    await bot.scheduler.stop()
+    await bot.rate_limiter.stop()
+    await bot.outbound.close()
+    await bot.http.close()
+    await db.close()
+
+
+async def replay(path: str, speed: float, limit: Optional[int], drain_timeout: float) -> Dict[str, Any]:
+    shards = {data["shard"][0]: data["shard"][1]
+              for _, event, data in read_recording(path) if event == "READY" and data.get("shard")}
+    bot, http = await start_offline_bot(shards)
+
+    parsers = bot._connection.parsers
+    loop = asyncio.get_running_loop()
+    fed = 0
+    counts: Dict[str, int] = collections.Counter()
+    errors: Dict[str, int] = collections.Counter()
+    start = loop.time()
+
+    try:
+        for timestamp, event, data in itertools.islice(read_recording(path), limit):
+            if speed:
+                delay = start + timestamp / 1000 / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            parser = parsers.get(event)
+            if parser is None:
+                continue
+            try:
+                parser(data)
+            except Exception as e:
+                errors[event] += 1
+                if errors[event] == 1:
+                    print(f"{event}: {type(e).__name__}: {e}", file=sys.stderr)
+            fed += 1
+            counts[event] += 1
+            # The websocket yields between messages; so does the replay
+            await asyncio.sleep(0)
+
+        fed_in = loop.time() - start
+        await drain(drain_timeout)
+        elapsed = loop.time() - start
+
+        return {
+            "recording": path,
+            "speed": speed or "max",
+            "events": fed,
+            "feed_seconds": round(fed_in, 3),
+            "seconds": round(elapsed, 3),
+            "events_per_s": round(fed / elapsed, 1) if elapsed else 0,
+            "event_types": dict(counts.most_common()),
+            "parse_errors": dict(errors),
+            "handlers": bot.events.stats(),
+            "commands": {name: plugin.get_command_stats() for name, plugin in bot.plugins.plugins.items()},
+            "rest_calls": dict(http.calls.most_common()),
+        }
+    finally:
+        await stop_offline_bot(bot)
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"{report['events']} events in {report['seconds']}s "
+          f"({report['events_per_s']} events/s, fed in {report['feed_seconds']}s at speed {report['speed']})")
+    for event, count in list(report["event_types"].items())[:10]:
+        print(f"  {event:<32} {count:>8}")
+    if report["parse_errors"]:
+        print(f"Parse errors: {report['parse_errors']}")
+
+    print("\nHandlers")
+    for event, stats in sorted(report["handlers"].items()):
+        for handler in stats["handlers"]:
+            print(f"  {event:<24} {handler['handler']:<36} {handler['calls']:>7} calls  "
+                  f"p50 {handler['p50_ms']:>7}ms  p99 {handler['p99_ms']:>7}ms  "
+                  f"{handler['errors']} errors  {handler['dropped']} dropped")
+
+    print("\nCommands")
+    for plugin, stats in sorted(report["commands"].items()):
+        for kind in ("prefix", "slash"):
+            for command, summary in stats[kind].items():
+                if summary["invocations"]:
+                    wall = summary["wall"]
+                    print(f"  {plugin:<12} {kind:<6} {command:<20} {summary['invocations']:>7} calls  "
+                          f"p50 {wall['p50_ms']:>7}ms  p99 {wall['p99_ms']:>7}ms  {summary['errors']} errors")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay a gateway recording into the bot offline")
+    parser.add_argument("recording", help="File written with GATEWAY_RECORD")
+    parser.add_argument("--speed", default="1", help="Playback speed multiplier, or 'max' for no pacing")
+    parser.add_argument("--limit", type=int, help="Only replay the first N events")
+    parser.add_argument("--drain-timeout", type=float, default=30.0,
+                        help="Seconds to wait for handlers still running after the last event")
+    parser.add_argument("--database", action="store_true", help="Use the DB_* database instead of a temporary SQLite file")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    speed = 0.0 if args.speed == "max" else float(args.speed)
+    load_dotenv()
+    # Never record the replay itself
+    os.environ.pop("GATEWAY_RECORD", None)
+    with tempfile.TemporaryDirectory() as directory:
+        if not args.database:
+            os.environ["DB_BACKEND"] = "sqlite"
+            os.environ["DB_SQLITE_PATH"] = os.path.join(directory, "replay.db")
+        os.environ["PLUGIN_MANIFEST"] = os.path.join(directory, "plugin_manifest.json")
+        os.environ["COMMAND_SYNC_STATE"] = os.path.join(directory, "command_sync.json")
+        report = asyncio.run(replay(args.recording, speed, args.limit, args.drain_timeout))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
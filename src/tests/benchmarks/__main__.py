@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for Mizuki Bot
+
+Runs without a Discord connection: commands are dispatched with fake
+contexts and interactions, plugins are loaded into a bot that never logs
+in, and the database benchmarks use a temporary SQLite file (plus
+PostgreSQL from the DB_* variables when asked for).
+
+    python -m src.tests.benchmarks                       # all suites, compared to the baseline
+    python -m src.tests.benchmarks --suites dispatch logging --output results.json
+    python -m src.tests.benchmarks --suites runtime      # default vs PERFORMANCE_PROFILE
+    python -m src.tests.benchmarks --save-baseline       # store this run as the new baseline
+
+Results are written as JSON. When a baseline exists, every metric that got
+worse by more than --tolerance is reported and the exit code is 1.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+from dotenv import load_dotenv
+
+from src.tests.benchmarks import bench_database, bench_dispatch, bench_logging, bench_plugins, bench_runtime
+from src.tests.benchmarks.harness import (DEFAULT_BASELINE, Metrics, build_results, compare,
+                                          load_results, save_results)
+
+
+SUITES = ("plugins", "dispatch", "database", "logging", "runtime")
+
+
+async def run_suites(args: argparse.Namespace) -> Metrics:
+    metrics: Metrics = {}
+
+    if "plugins" in args.suites or "dispatch" in args.suites:
+        # Imported late: the bot reads PLUGIN_MANIFEST and friends when it is created
+        from src.bot.core.bot import Bot
+
+        bot = Bot()
+        try:
+            if "plugins" in args.suites:
+                metrics.update(await bench_plugins.run(bot, args.repeat))
+            if "dispatch" in args.suites:
+                metrics.update(await bench_dispatch.run(bot, args.calls))
+        finally:
+            for name in list(bot.plugins.plugins):
+                await bot.plugins.unload_plugin(name)
+            # Bot.close() expects a gateway connection; stop only what the suites started
+            await bot.scheduler.stop()
+            await bot.outbound.close()
+            await bot.http.close()
+
+    if "database" in args.suites:
+        for backend in args.backends:
+            results = await bench_database.run(backend, args.operations, args.concurrency)
+            if not results:
+                print(f"database: {backend} not reachable, skipped", file=sys.stderr)
+            metrics.update(results)
+
+    if "logging" in args.suites:
+        metrics.update(bench_logging.run(args.records))
+
+    if "runtime" in args.suites:
+        # Child processes: the profile must be chosen before their event loop starts
+        metrics.update(bench_runtime.run(args.guilds, args.events))
+    return metrics
+
+
+def print_report(metrics: Metrics, comparison):
+    for name in sorted(metrics):
+        current = metrics[name]
+        line = f"{name:<48} {current['value']:>14.3f} {current['unit']:<9}"
+        if name in comparison:
+            delta = comparison[name]
+            line += f" {delta['change']:>+8.1%} vs {delta['baseline']:.3f}"
+            if delta["regression"]:
+                line += "  ⚠️ REGRESSION"
+        print(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the Mizuki Bot benchmark suite")
+    parser.add_argument("--suites", nargs="+", default=list(SUITES), choices=SUITES)
+    parser.add_argument("--backends", nargs="+", default=["sqlite"], choices=["sqlite", "postgres"])
+    parser.add_argument("--output", help="Write the results JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Results JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Fraction a metric may get worse by before it is flagged (default 0.2)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions of each plugin lifecycle step")
+    parser.add_argument("--calls", type=int, default=20000, help="Command invocations per timing round")
+    parser.add_argument("--operations", type=int, default=5000, help="Database lookups per backend")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent database tasks")
+    parser.add_argument("--records", type=int, default=100000, help="Log records per format")
+    parser.add_argument("--guilds", type=int, default=200, help="Guilds loaded at startup by the runtime suite")
+    parser.add_argument("--events", type=int, default=50000, help="Gateway events per runtime profile")
+    args = parser.parse_args()
+
+    load_dotenv()
+    # Keep the bot's state files out of the repo
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DB_SQLITE_PATH"] = os.path.join(directory, "bench.db")
+        os.environ["PLUGIN_MANIFEST"] = os.path.join(directory, "plugin_manifest.json")
+        os.environ["COMMAND_SYNC_STATE"] = os.path.join(directory, "command_sync.json")
+        metrics = asyncio.run(run_suites(args))
+
+    results = build_results(metrics)
+    baseline = load_results(args.baseline)
+    comparison = compare(metrics, baseline["metrics"], args.tolerance) if baseline else {}
+    results["comparison"] = comparison
+
+    print_report(metrics, comparison)
+    if args.output:
+        save_results(results, args.output)
+    if args.save_baseline:
+        save_results(build_results(metrics), args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+
+    regressions = sorted(name for name, delta in comparison.items() if delta["regression"])
+    if regressions and not args.save_baseline:
+        print(f"\n{len(regressions)} metrics regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Database throughput on the queries the bot runs most
+
+SQLite runs against a temporary file; PostgreSQL uses the DB_* variables
+and is skipped when it cannot be reached. The benchmark only writes rows with
+negative ids, which no Discord snowflake can have, and deletes exactly those
+rows afterwards, so running it against a live database leaves real guilds and
+users untouched.
+"""
+import asyncio
+import random
+import statistics
+import time
+from typing import List
+
+from src.bot.utils.database import Database
+from src.tests.benchmarks.harness import Metrics, metric, percentile
+
+
+GUILDS = 2000
+USERS = 10000
+# Discord snowflakes are positive: ids below this never belong to a real guild or user
+BENCH_ID_BASE = -(10 ** 17)
+PREFIX_LOOKUP = "SELECT prefix FROM guilds WHERE guild_id = $1"
+PREFIX_UPSERT = """
+    INSERT INTO guilds (guild_id, name, prefix)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (guild_id) DO UPDATE SET prefix = EXCLUDED.prefix, updated_at = CURRENT_TIMESTAMP
+"""
+
+
+async def throughput(operations: int, concurrency: int, operation) -> dict:
+    """Runs `operation` from `concurrency` tasks; returns ops/s and latency percentiles"""
+    latencies: List[float] = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            start = time.perf_counter()
+            await operation()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(operations // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "ops_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": percentile(latencies, 0.99),
+    }
+
+
+async def run(backend: str, operations: int, concurrency: int) -> Metrics:
+    db = Database(backend)
+    if not await db.connect():
+        return {}
+
+    metrics: Metrics = {}
+    guild_ids = [BENCH_ID_BASE - i for i in range(GUILDS)]
+    user_ids = [BENCH_ID_BASE - i for i in range(USERS)]
+    try:
+        await db.init_tables()
+        try:
+            await bench_queries(db, backend, guild_ids, user_ids, operations, concurrency, metrics)
+        finally:
+            await db.executemany("DELETE FROM users WHERE user_id = $1", [(user_id,) for user_id in user_ids])
+            await db.executemany("DELETE FROM guilds WHERE guild_id = $1", [(guild_id,) for guild_id in guild_ids])
+        return metrics
+    finally:
+        await db.close()
+
+
+async def bench_queries(db: Database, backend: str, guild_ids: List[int], user_ids: List[int],
+                        operations: int, concurrency: int, metrics: Metrics):
+    await db.bulk_upsert("guilds", ("guild_id",), ("name",), [(guild_id, "bench") for guild_id in guild_ids],
+                         timestamp_column="updated_at")
+
+    workloads = {
+        "prefix_lookup": (operations, lambda: db.fetchval(
+            PREFIX_LOOKUP, random.choice(guild_ids), prepared=True
+        )),
+        "prefix_upsert": (operations // 4, lambda: db.execute(
+            PREFIX_UPSERT, random.choice(guild_ids), "bench", random.choice("!?$.")
+        )),
+    }
+    for name, (count, operation) in workloads.items():
+        result = await throughput(count, concurrency, operation)
+        prefix = f"db.{backend}.{name}"
+        metrics[f"{prefix}.ops_per_s"] = metric(result["ops_per_s"], "ops/s", higher_is_better=True)
+        metrics[f"{prefix}.p50_ms"] = metric(result["p50_ms"], "ms")
+        metrics[f"{prefix}.p99_ms"] = metric(result["p99_ms"], "ms")
+
+    # Member ingestion path: staging table + merge, alternating inserts and no-op updates
+    rows = [(user_id, f"user {user_id}") for user_id in user_ids]
+    start = time.perf_counter()
+    for offset in range(0, len(rows), 1000):
+        await db.bulk_upsert("users", ("user_id",), ("username",), rows[offset:offset + 1000],
+                             timestamp_column="updated_at")
+    inserted = time.perf_counter() - start
+    start = time.perf_counter()
+    for offset in range(0, len(rows), 1000):
+        await db.bulk_upsert("users", ("user_id",), ("username",), rows[offset:offset + 1000],
+                             timestamp_column="updated_at")
+    unchanged = time.perf_counter() - start
+    metrics[f"db.{backend}.bulk_insert.rows_per_s"] = metric(len(rows) / inserted, "rows/s", higher_is_better=True)
+    metrics[f"db.{backend}.bulk_unchanged.rows_per_s"] = metric(len(rows) / unchanged, "rows/s", higher_is_better=True)
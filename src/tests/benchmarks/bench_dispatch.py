@@ -0,0 +1,86 @@
+"""
+Per-command overhead added by BasePlugin's instrumentation
+
+Prefix commands are invoked through discord.py's own invoke path twice:
+once through the wrapper BasePlugin installed (stats, rate limits) and once
+through the unwrapped class method. Slash commands are invoked with the
+command tree's hooks (timing, stats) and the rate limit check, and compared
+with a plain copy of the same callback. The difference is what every
+invocation pays for the instrumentation.
+"""
+import types
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from src.bot.plugins.base_plugin import BasePlugin
+from src.tests.benchmarks.fakes import FakeInteraction, make_context
+from src.tests.benchmarks.harness import Metrics, metric, per_call_us
+
+# The commands take no options, so the parsed option namespace is empty
+NAMESPACE = types.SimpleNamespace()
+
+
+class BenchPlugin(BasePlugin):
+    PLUGIN_NAME = "Bench"
+
+    async def setup(self):
+        @commands.command(name="bench")
+        async def bench_prefix(ctx: commands.Context):
+            pass
+
+        @commands.command(name="bench_limited")
+        async def bench_prefix_limited(ctx: commands.Context):
+            pass
+
+        @app_commands.command(name="bench", description="Benchmark command")
+        async def bench_slash(interaction: discord.Interaction):
+            pass
+
+        @app_commands.command(name="bench_limited", description="Benchmark command")
+        async def bench_slash_limited(interaction: discord.Interaction):
+            pass
+
+        self.register_prefix_command(bench_prefix)
+        self.register_slash_command(bench_slash)
+        # Limits nobody reaches, so every call pays for the checks and none is throttled
+        limits = {"user": (10 ** 9, 1.0), "guild": (10 ** 9, 1.0)}
+        self.register_prefix_command(bench_prefix_limited, rate_limits=limits)
+        self.register_slash_command(bench_slash_limited, rate_limits=limits)
+
+        self.prefix = {command.name: command for command in self._prefix_commands}
+        self.slash = {command.name: command for command in self._slash_commands}
+
+
+async def run(bot, calls: int) -> Metrics:
+    plugin = BenchPlugin(bot)
+    await plugin.setup()
+
+    metrics: Metrics = {}
+    for name in ("bench", "bench_limited"):
+        command = plugin.prefix[name]
+        ctx = make_context(bot, command)
+        bare = await per_call_us(lambda: commands.Command.invoke(command, ctx), calls)
+        wrapped = await per_call_us(lambda: command.invoke(ctx), calls)
+        metrics[f"dispatch.prefix.{name}.us_per_call"] = metric(wrapped, "us")
+        metrics[f"dispatch.prefix.{name}.overhead_us"] = metric(max(wrapped - bare, 0.0), "us")
+
+        command = plugin.slash[name]
+        plain = app_commands.Command(name=command.name, description=command.description, callback=command.callback)
+
+        async def invoke_bare():
+            await plain._invoke_with_namespace(FakeInteraction(bot), NAMESPACE)
+
+        async def invoke_wrapped():
+            # What the tree does around the command: interaction_check, then completion
+            interaction = FakeInteraction(bot)
+            await bot.tree.interaction_check(interaction)
+            await command._invoke_with_namespace(interaction, NAMESPACE)
+            bot.tree.record(interaction, command)
+
+        bare = await per_call_us(invoke_bare, calls)
+        wrapped = await per_call_us(invoke_wrapped, calls)
+        metrics[f"dispatch.slash.{name}.us_per_call"] = metric(wrapped, "us")
+        metrics[f"dispatch.slash.{name}.overhead_us"] = metric(max(wrapped - bare, 0.0), "us")
+    return metrics
@@ -0,0 +1,69 @@
+"""
+Logging pipeline throughput
+
+Builds the same queue handler and background listener as setup_logger(),
+writing to a null stream, and measures both the cost a log call adds to
+the event loop and how fast the listener thread drains the queue.
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+from src.bot.utils.logger import DATE_FORMAT, TEXT_FORMAT, JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+from src.tests.benchmarks.harness import Metrics, metric
+
+
+def _pipeline(formatter: logging.Formatter, capacity: int):
+    stream = open(os.devnull, "w", encoding="utf-8")
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(formatter)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=capacity * 2), capacity)
+    queue_handler.addFilter(SamplingFilter())
+    listener = logging.handlers.QueueListener(queue_handler.queue, handler)
+
+    logger = logging.getLogger("mizuki.bench")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.handlers = [queue_handler]
+    return logger, queue_handler, listener, stream
+
+
+def run(records: int) -> Metrics:
+    metrics: Metrics = {}
+    formats = {"text": logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT), "json": JsonFormatter()}
+
+    for name, formatter in formats.items():
+        # Room for every record, so nothing is dropped and the whole run is drained
+        logger, queue_handler, listener, stream = _pipeline(formatter, records)
+        try:
+            start = time.perf_counter()
+            for i in range(records):
+                logger.info("Command %s invoked by %d in %d", "ping", i, 123456789)
+            enqueued = time.perf_counter() - start
+
+            listener.start()
+            listener.stop()
+            drained = time.perf_counter() - start
+        finally:
+            logger.handlers = []
+            stream.close()
+
+        metrics[f"logging.{name}.call_us"] = metric(enqueued / records * 1e6, "us")
+        metrics[f"logging.{name}.records_per_s"] = metric(records / drained, "records/s", higher_is_better=True)
+        if queue_handler.dropped:
+            metrics[f"logging.{name}.dropped"] = metric(queue_handler.dropped, "records")
+
+    # Filtered out by level: what a disabled debug line costs
+    logger, _, _, stream = _pipeline(formats["text"], 1)
+    try:
+        start = time.perf_counter()
+        for i in range(records):
+            logger.debug("Cache miss for %d", i)
+        metrics["logging.disabled_call_us"] = metric((time.perf_counter() - start) / records * 1e6, "us")
+    finally:
+        logger.handlers = []
+        stream.close()
+    return metrics
@@ -0,0 +1,35 @@
+"""
+Plugin lifecycle timings: loading every plugin and hot-reloading each one
+"""
+import statistics
+
+from src.tests.benchmarks.harness import Metrics, metric, sample_ms
+
+
+async def run(bot, repeat: int) -> Metrics:
+    manager = bot.plugins
+    metrics: Metrics = {}
+
+    # The first load imports every plugin module; later ones reuse them
+    first = await sample_ms(manager.load_plugins, 1)
+    metrics["plugins.load_all.first_ms"] = metric(first[0], "ms")
+    for name, timings in manager.load_timings.items():
+        if "import_ms" in timings:
+            metrics[f"plugins.import.{name}.ms"] = metric(timings["import_ms"], "ms")
+
+    async def unload_and_load():
+        for name in list(manager.plugins):
+            await manager.unload_plugin(name)
+        await manager.load_plugins()
+
+    samples = await sample_ms(unload_and_load, repeat)
+    metrics["plugins.load_all.ms"] = metric(statistics.median(samples), "ms")
+
+    for name in sorted(manager.plugins):
+        # reload_plugin re-executes the plugin's modules from disk every time
+        samples = await sample_ms(lambda: manager.reload_plugin(name), repeat)
+        metrics[f"plugins.reload.{name}.ms"] = metric(statistics.median(samples), "ms")
+
+    for name in list(manager.plugins):
+        await manager.unload_plugin(name)
+    return metrics
@@ -0,0 +1,174 @@
+"""
+Startup and steady-state cost of the runtime profile
+
+Each profile runs in its own child process, since the event loop, GC
+thresholds and frozen heap are per process. The child starts an offline
+bot (see src.scripts.replay_gateway), feeds it READY and one GUILD_CREATE
+per synthetic guild, waits for on_ready, then streams MESSAGE_CREATE
+payloads as raw JSON text through the same decoder and parser the
+websocket uses. CPU time per event and every GC pause are measured.
+
+    python -m src.tests.benchmarks.bench_runtime --guilds 200 --events 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from src.tests.benchmarks.harness import Metrics, metric
+
+
+PROFILES = {"default": "false", "tuned": "true"}
+TIMESTAMP = "2025-01-01T00:00:00+00:00"
+
+
+def _user(user_id: int) -> Dict[str, Any]:
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "avatar": None}
+
+
+def _guild(guild_id: int, channels: int, members: int) -> Dict[str, Any]:
+    return {
+        "id": str(guild_id), "name": f"guild {guild_id}", "owner_id": "2", "unavailable": False,
+        "member_count": members, "features": [], "emojis": [], "stickers": [], "threads": [],
+        "voice_states": [], "presences": [], "joined_at": TIMESTAMP,
+        "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [{"id": str(guild_id * 1000 + index), "type": 0, "name": f"channel-{index}",
+                      "position": index, "permission_overwrites": []} for index in range(channels)],
+        "members": [{"user": _user(guild_id * 100000 + index), "roles": [], "joined_at": TIMESTAMP,
+                     "deaf": False, "mute": False, "flags": 0} for index in range(members)],
+    }
+
+
+def _message(index: int, guild_id: int, channel_id: int, author_id: int) -> str:
+    return json.dumps({
+        "id": str(10 ** 17 + index), "channel_id": str(channel_id), "guild_id": str(guild_id),
+        "author": _user(author_id), "content": "!ping" if index % 100 == 0 else f"message {index}",
+        "member": {"roles": [], "joined_at": TIMESTAMP, "deaf": False, "mute": False, "flags": 0},
+        "timestamp": TIMESTAMP, "edited_timestamp": None, "tts": False, "mention_everyone": False,
+        "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0,
+    })
+
+
+async def _measure(guilds: int, channels: int, members: int, events: int) -> Dict[str, Any]:
+    import discord.utils
+
+    from src.bot.utils.performance import profile
+    from src.scripts.replay_gateway import drain, start_offline_bot, stop_offline_bot
+
+    guild_ids = [10 ** 6 + index for index in range(guilds)]
+    payloads = [_guild(guild_id, channels, members) for guild_id in guild_ids]
+    # Built up front: only decoding and parsing belong to the steady state
+    messages = [
+        _message(index, guild_ids[index % guilds], guild_ids[index % guilds] * 1000 + index % channels,
+                 guild_ids[index % guilds] * 100000 + index % members)
+        for index in range(events)
+    ]
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    bot, _ = await start_offline_bot()
+    try:
+        state = bot._connection
+        # on_ready fires once no GUILD_CREATE has arrived for this long
+        state.guild_ready_timeout = 0.05
+        state.parsers["READY"]({
+            "v": 10, "shard": [0, 1], "session_id": "bench", "resume_gateway_url": "wss://localhost",
+            "user": {**_user(1), "bot": True}, "application": {"id": "1", "flags": 0},
+            "guilds": [{"id": str(guild_id), "unavailable": True} for guild_id in guild_ids],
+        })
+        for payload in payloads:
+            state.parsers["GUILD_CREATE"](payload)
+        del payloads
+        await asyncio.wait_for(bot.wait_until_ready(), 60)
+        await drain(30)
+        startup_ms = (time.perf_counter() - start) * 1000
+        startup_cpu_ms = (time.process_time() - cpu_start) * 1000
+
+        # Only the steady state counts towards the pause figures
+        profile.reset_gc_stats()
+        parse = state.parsers["MESSAGE_CREATE"]
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        for raw in messages:
+            parse(discord.utils._from_json(raw))
+            # The websocket yields between messages
+            await asyncio.sleep(0)
+        await drain(30)
+        seconds = time.perf_counter() - start
+        cpu_us = (time.process_time() - cpu_start) / events * 1e6
+    finally:
+        await stop_offline_bot(bot)
+
+    stats = profile.stats()
+    return {
+        "loop": stats["loop"],
+        "json": stats["json"],
+        "frozen": stats["frozen"],
+        "startup_ms": startup_ms,
+        "startup_cpu_ms": startup_cpu_ms,
+        "cpu_us_per_event": cpu_us,
+        "events_per_s": events / seconds,
+        "gc_collections": sum(stats["collections"]),
+        "gc_pause_total_ms": profile.pauses.total,
+        "gc_pause_p99_ms": stats["pauses"]["p99_ms"],
+        "gc_pause_max_ms": stats["pauses"]["max_ms"],
+    }
+
+
+def _child(args: List[str], env: Dict[str, str]) -> Dict[str, Any]:
+    result = subprocess.run([sys.executable, "-m", "src.tests.benchmarks.bench_runtime", *args],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"Runtime benchmark child failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(guilds: int, events: int, channels: int = 10, members: int = 100) -> Metrics:
+    metrics: Metrics = {}
+    database = os.environ.get("DB_SQLITE_PATH", "bench.db")
+
+    for name, enabled in PROFILES.items():
+        env = dict(os.environ, PERFORMANCE_PROFILE=enabled, DB_BACKEND="sqlite",
+                   # A fresh database per child, so the second one does not start warm
+                   DB_SQLITE_PATH=f"{database}.{name}")
+        env.pop("GATEWAY_RECORD", None)
+        result = _child(["--guilds", str(guilds), "--events", str(events),
+                         "--channels", str(channels), "--members", str(members)], env)
+
+        print(f"runtime: {name} profile on {result['loop']} with {result['json']}, "
+              f"{result['frozen']} objects frozen", file=sys.stderr)
+        prefix = f"runtime.{name}"
+        metrics[f"{prefix}.startup_ms"] = metric(result["startup_ms"], "ms")
+        metrics[f"{prefix}.startup_cpu_ms"] = metric(result["startup_cpu_ms"], "ms")
+        metrics[f"{prefix}.cpu_us_per_event"] = metric(result["cpu_us_per_event"], "us")
+        metrics[f"{prefix}.events_per_s"] = metric(result["events_per_s"], "events/s", higher_is_better=True)
+        metrics[f"{prefix}.gc_collections"] = metric(result["gc_collections"], "count")
+        metrics[f"{prefix}.gc_pause_total_ms"] = metric(result["gc_pause_total_ms"], "ms")
+        metrics[f"{prefix}.gc_pause_p99_ms"] = metric(result["gc_pause_p99_ms"], "ms")
+        metrics[f"{prefix}.gc_pause_max_ms"] = metric(result["gc_pause_max_ms"], "ms")
+    return metrics
+
+
+def main() -> int:
+    # Child process entry point of run(); PERFORMANCE_PROFILE picks the profile
+    parser = argparse.ArgumentParser(description="Measure the runtime profile of this process as JSON")
+    parser.add_argument("--guilds", type=int, default=200)
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--events", type=int, default=50000)
+    args = parser.parse_args()
+
+    from src.bot.utils.performance import profile
+
+    result = profile.run(_measure(args.guilds, args.channels, args.members, args.events))
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
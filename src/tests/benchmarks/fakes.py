@@ -0,0 +1,71 @@
+"""
+Stand-ins for the discord objects commands receive
+
+They carry just what discord.py's invoke path and the BasePlugin wrappers
+read, so commands can be dispatched without a gateway connection.
+"""
+import itertools
+
+import discord
+from discord.ext import commands
+from discord.ext.commands.view import StringView
+
+
+class FakeUser:
+    def __init__(self, user_id: int = 1, bot: bool = False):
+        self.id = user_id
+        self.bot = bot
+        self.name = f"user{user_id}"
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int = 10):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int = 100, guild: FakeGuild = None):
+        self.id = channel_id
+        self.guild = guild
+
+
+class FakeMessage:
+    def __init__(self, content: str = "", author: FakeUser = None, channel: FakeChannel = None):
+        self.author = author or FakeUser()
+        self.channel = channel or FakeChannel(guild=FakeGuild())
+        self.guild = self.channel.guild
+        self.content = content
+        self.id = 1000
+        self.attachments = []
+        self._state = None
+
+
+class FakeInteraction:
+    """Interaction with a real InteractionResponse that never reaches Discord"""
+
+    _ids = itertools.count(10 ** 18)
+
+    def __init__(self, client, user: FakeUser = None, channel: FakeChannel = None):
+        self.id = next(self._ids)
+        self.type = discord.InteractionType.application_command
+        self.client = client
+        self.user = user or FakeUser()
+        self.channel = channel or FakeChannel(guild=FakeGuild())
+        self.guild = self.channel.guild
+        self.channel_id = self.channel.id
+        self.guild_id = self.guild.id if self.guild else None
+        self.command = None
+        # discord.Interaction caches its response under this name
+        self._cs_response = discord.InteractionResponse(self)
+
+    @property
+    def response(self) -> discord.InteractionResponse:
+        return self._cs_response
+
+
+def make_context(bot: commands.Bot, command: commands.Command, message: FakeMessage = None) -> commands.Context:
+    """Context for invoking `command` as if its name had just been typed"""
+    message = message or FakeMessage(content=f"!{command.name}")
+    return commands.Context(message=message, bot=bot, view=StringView(""), prefix="!",
+                            command=command, invoked_with=command.name)
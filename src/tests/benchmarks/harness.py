@@ -0,0 +1,135 @@
+"""
+Timing, result and baseline helpers shared by the benchmarks
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+RESULTS_VERSION = 1
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+Metrics = Dict[str, Dict[str, Any]]
+
+
+def metric(value: float, unit: str, higher_is_better: bool = False) -> Dict[str, Any]:
+    """
+    One benchmark measurement
+
+    Args:
+        value: Measured value
+        unit: Unit shown next to the value, e.g. "ms" or "ops/s"
+        higher_is_better: Whether a larger value is an improvement
+
+    Returns:
+        Dict stored under the metric name in the results file
+    """
+    return {"value": round(value, 4), "unit": unit, "higher_is_better": higher_is_better}
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def per_call_us(operation: Callable[[], Awaitable[Any]], calls: int, rounds: int = 5) -> float:
+    """
+    Median cost of one awaited call, in microseconds
+
+    Each round times `calls` back-to-back calls; the median of the rounds
+    keeps a single slow round (GC, scheduler noise) from skewing the result.
+    """
+    for _ in range(min(calls, 1000)):
+        await operation()
+
+    results = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls):
+            await operation()
+        results.append((time.perf_counter() - start) / calls * 1e6)
+    return statistics.median(results)
+
+
+async def sample_ms(operation: Callable[[], Awaitable[Any]], repeat: int) -> List[float]:
+    """Wall time of `repeat` sequential runs of `operation`, in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await operation()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def build_results(metrics: Metrics) -> Dict[str, Any]:
+    """Wraps metrics with what is needed to tell runs apart"""
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "metrics": metrics,
+    }
+
+
+def save_results(results: Dict[str, Any], path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_results(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return results if results.get("version") == RESULTS_VERSION else None
+
+
+def compare(metrics: Metrics, baseline: Metrics, tolerance: float) -> Dict[str, Dict[str, Any]]:
+    """
+    Relative change of every metric also present in the baseline
+
+    Args:
+        metrics: Metrics of this run
+        baseline: Metrics of the stored baseline
+        tolerance: Fraction a metric may get worse by before it is a regression
+
+    Returns:
+        Dict of metric name to its baseline value, change and regression flag
+    """
+    comparison = {}
+    for name, current in metrics.items():
+        reference = baseline.get(name)
+        if not reference or not reference["value"]:
+            continue
+
+        change = (current["value"] - reference["value"]) / reference["value"]
+        # Positive means worse, whichever direction the metric improves in
+        worse_by = -change if current["higher_is_better"] else change
+        comparison[name] = {
+            "baseline": reference["value"],
+            "change": round(change, 4),
+            "regression": worse_by > tolerance,
+        }
+    return comparison
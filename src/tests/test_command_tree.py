@@ -0,0 +1,75 @@
+import asyncio
+import types
+
+import discord
+import yarl
+from discord import app_commands
+
+from src.bot.core.command_tree import COMMAND_STATS, MizukiCommandTree, RateLimited
+from src.bot.plugins.base_plugin import BasePlugin
+from src.bot.utils.ratelimit import RateLimiter
+from src.tests.benchmarks.fakes import FakeInteraction
+
+NAMESPACE = types.SimpleNamespace()
+
+
+class CommandsPlugin(BasePlugin):
+    PLUGIN_NAME = "Commands"
+
+    async def setup(self):
+        self.throttled = []
+
+        @app_commands.command(name="hello", description="Says hello")
+        async def hello(interaction: discord.Interaction):
+            pass
+
+        @app_commands.command(name="broken", description="Always fails")
+        async def broken(interaction: discord.Interaction):
+            raise KeyError("boom")
+
+        self.register_slash_command(hello, rate_limits={"user": (1, 60.0)})
+        self.register_slash_command(broken)
+        self.hello, self.broken = hello, broken
+
+    async def on_rate_limited(self, target, retry_after: float):
+        self.throttled.append(retry_after)
+
+
+async def invoke(tree: MizukiCommandTree, client, command, respond: bool = False):
+    """What the tree does around a command, with the response callback seen by the HTTP trace"""
+    interaction = FakeInteraction(client)
+    interaction.command = command
+    await tree.interaction_check(interaction)
+    try:
+        if respond:
+            url = yarl.URL(f"https://discord.com/api/v10/interactions/{interaction.id}/token/callback")
+            await tree.timer._on_request_end(None, None, types.SimpleNamespace(url=url))
+        await command._invoke_with_namespace(interaction, NAMESPACE)
+    except app_commands.AppCommandError as e:
+        await tree.on_error(interaction, e)
+        return e
+    tree.record(interaction, command)
+
+
+def test_commands_are_timed_and_throttled_through_public_hooks():
+    async def scenario():
+        client = discord.Client(intents=discord.Intents.none())
+        tree = MizukiCommandTree(client)
+        plugin = CommandsPlugin(types.SimpleNamespace(rate_limiter=RateLimiter()))
+        await plugin.setup()
+
+        assert await invoke(tree, client, plugin.hello, respond=True) is None
+        throttled = await invoke(tree, client, plugin.hello)
+        failed = await invoke(tree, client, plugin.broken)
+        return plugin, throttled, failed, tree
+
+    plugin, throttled, failed, tree = asyncio.run(scenario())
+    hello = plugin.hello.extras[COMMAND_STATS]
+    assert hello.invocations == 1 and hello.first_response.count == 1
+    assert isinstance(throttled, RateLimited) and hello.throttled == 1 and len(plugin.throttled) == 1
+
+    broken = plugin.broken.extras[COMMAND_STATS]
+    assert isinstance(failed, app_commands.CommandInvokeError)
+    assert broken.errors == 1 and broken.error_types == {"KeyError": 1}
+    # Nothing is left behind in the timer
+    assert not tree.timer._started and not tree.timer._responded
@@ -0,0 +1,108 @@
+import asyncio
+
+from src.bot.utils.entity_cache import EntityCache
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.entities_consistent = True
+        self.rows = {1: {"user_id": 1, "username": "mizuki"}}
+        self.queries = 0
+
+    async def fetchrow(self, query, key, prepared=False):
+        self.queries += 1
+        return self.rows.get(key)
+
+
+def test_cached_rows_are_bypassed_while_invalidations_may_be_lost():
+    async def scenario():
+        database = FakeDatabase()
+        users = EntityCache(database, "users", "user_id", ("username",))
+        assert (await users.get(1))["username"] == "mizuki"
+        assert (await users.get(1))["username"] == "mizuki"
+        assert database.queries == 1
+
+        # Listener down: another process renames the user and the notification is lost
+        database.entities_consistent = False
+        database.rows[1] = {"user_id": 1, "username": "renamed"}
+        row = await users.get(1)
+        return row, database.queries, users.bypassed
+
+    row, queries, bypassed = asyncio.run(scenario())
+    assert row["username"] == "renamed"
+    assert queries == 2 and bypassed == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_load():
+    async def scenario():
+        database = FakeDatabase()
+        release = asyncio.Event()
+        fetchrow = database.fetchrow
+
+        async def slow_fetchrow(query, key, prepared=False):
+            await release.wait()
+            return await fetchrow(query, key, prepared)
+
+        database.fetchrow = slow_fetchrow
+        users = EntityCache(database, "users", "user_id", ("username",))
+        first = asyncio.create_task(users.get(1))
+        second = asyncio.create_task(users.get(1))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        row = await second
+        return first.cancelled(), row, database.queries, 1 in users
+
+    cancelled, row, queries, cached = asyncio.run(scenario())
+    assert cancelled and row["username"] == "mizuki"
+    assert queries == 1 and cached
+
+
+class FakeListenConnection:
+    def add_termination_listener(self, callback):
+        pass
+
+    async def add_listener(self, channel, callback):
+        pass
+
+    async def execute(self, query, timeout=None):
+        pass
+
+    def is_closed(self):
+        return False
+
+    def terminate(self):
+        pass
+
+
+def test_connect_callbacks_warm_the_cache_after_the_listener_reset(tmp_path, monkeypatch):
+    from src.bot.utils.database import Database
+
+    async def scenario():
+        monkeypatch.setenv("DB_SQLITE_PATH", str(tmp_path / "test.db"))
+        database = Database("sqlite")
+        users = database.entity("users", "user_id", ("username",))
+
+        async def open_connection():
+            # The listener connects after the pool
+            await asyncio.sleep(0.05)
+            return FakeListenConnection()
+
+        backend = database.backend
+        monkeypatch.setattr(type(backend), "supports_notify", True)
+        backend.open_connection = open_connection
+        backend.connect_timeout = 5.0
+
+        async def warm():
+            users.prime(1, {"user_id": 1, "username": "mizuki"})
+
+        database.add_connect_callback(warm)
+        assert await database.connect()
+        try:
+            await asyncio.sleep(0.01)
+            return database.entities_consistent, 1 in users
+        finally:
+            await database.close()
+
+    assert asyncio.run(scenario()) == (True, True)
@@ -0,0 +1,102 @@
+import asyncio
+import types
+
+from src.bot.core.events import EventBus, EventHandler, compile_filters
+
+
+class FakeBot:
+    def __init__(self):
+        self.listeners = {}
+
+    def add_listener(self, listener, event):
+        self.listeners[event] = listener
+
+    def remove_listener(self, listener, event):
+        self.listeners.pop(event, None)
+
+
+def make_bus():
+    bot = FakeBot()
+    return bot, EventBus(bot, max_pending=2)
+
+
+def test_failing_check_does_not_leak_slots_of_other_handlers():
+    bot, bus = make_bus()
+    calls = []
+
+    async def first(message):
+        calls.append(message)
+
+    async def second(message):
+        calls.append(message)
+
+    def broken(message):
+        raise KeyError("boom")
+
+    good = EventHandler("on_message", first, "A", max_pending=2)
+    bad = EventHandler("on_message", second, "B", compile_filters(check=broken), max_pending=2)
+    bus.add(good)
+    bus.add(bad)
+
+    for index in range(5):
+        asyncio.run(bot.listeners["on_message"](types.SimpleNamespace(content=str(index))))
+
+    assert len(calls) == 5
+    assert good.in_flight == 0 and good.dropped == 0
+    assert bad.errors == 5 and bad.filtered == 5 and bad.calls == 0
+
+
+def test_builtin_filters_accept_events_without_arguments():
+    bot, bus = make_bus()
+    calls = []
+
+    async def on_ready():
+        calls.append(True)
+
+    bots_ignored = EventHandler("on_ready", on_ready, "A", compile_filters(ignore_bots=True))
+    guild_only = EventHandler("on_ready", on_ready, "B", compile_filters(guild_ids=[1], startswith="!"))
+    bus.add(bots_ignored)
+    bus.add(guild_only)
+
+    asyncio.run(bot.listeners["on_ready"]())
+
+    assert calls == [True]
+    assert bots_ignored.errors == 0 and guild_only.errors == 0
+    assert guild_only.filtered == 1
+    assert bots_ignored.in_flight == 0 and guild_only.in_flight == 0
+
+
+def test_saturated_handler_drops_events():
+    bot, bus = make_bus()
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def slow(message):
+            await gate.wait()
+
+        handler = EventHandler("on_message", slow, "A", max_pending=2)
+        bus.add(handler)
+        tasks = [asyncio.create_task(bot.listeners["on_message"](object())) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert handler.in_flight == 2 and handler.dropped == 1
+        gate.set()
+        await asyncio.gather(*tasks)
+        return handler
+
+    handler = asyncio.run(scenario())
+    assert handler.in_flight == 0 and handler.calls == 2
+
+
+def test_filters_select_matching_events():
+    predicates = compile_filters(guild_ids=[10], ignore_bots=True, startswith=("!", "?"))
+    guild = types.SimpleNamespace(id=10)
+    human = types.SimpleNamespace(bot=False)
+
+    def passes(message):
+        return all(predicate((message,)) for predicate in predicates)
+
+    assert passes(types.SimpleNamespace(guild=guild, author=human, content="!ping"))
+    assert not passes(types.SimpleNamespace(guild=guild, author=human, content="hello"))
+    assert not passes(types.SimpleNamespace(guild=guild, author=types.SimpleNamespace(bot=True), content="!ping"))
+    assert not passes(types.SimpleNamespace(guild_id=11, author=human, content="!ping"))
@@ -0,0 +1,64 @@
+import threading
+
+from src.bot.core.gateway_recorder import GatewayRecorder, read_recording
+
+
+def test_recording_round_trip_redacts_content(tmp_path):
+    path = str(tmp_path / "gateway.jsonl.gz")
+    recorder = GatewayRecorder(path, flush_interval=0.1)
+    recorder.start()
+    recorder.record("MESSAGE_CREATE", {"id": "1", "content": "secret", "author": {"id": "2", "username": "u"}})
+    recorder.close()
+
+    events = list(read_recording(path))
+    assert [(event, data) for _, event, data in events] == [
+        ("MESSAGE_CREATE", {"id": "1", "content": "", "author": {"id": "2", "username": ""}})
+    ]
+
+
+def test_close_returns_when_the_writer_failed(tmp_path):
+    # A directory cannot be opened as the recording file
+    recorder = GatewayRecorder(str(tmp_path), max_queue=1, flush_interval=0.1)
+    recorder.start()
+    recorder._thread.join(5)
+    for _ in range(3):
+        recorder.record("MESSAGE_CREATE", {"id": "1"})
+
+    closer = threading.Thread(target=recorder.close, daemon=True)
+    closer.start()
+    closer.join(5)
+
+    assert not closer.is_alive()
+    assert recorder.failed and recorder.recorded == 0 and recorder.dropped == 3
+
+
+def test_interaction_input_embeds_and_attachments_are_redacted(tmp_path):
+    path = str(tmp_path / "gateway.jsonl.gz")
+    recorder = GatewayRecorder(path, flush_interval=0.1)
+    recorder.start()
+    recorder.record("INTERACTION_CREATE", {
+        "id": "1",
+        "type": 2,
+        "data": {
+            "name": "remind",
+            "options": [{"name": "text", "type": 3, "value": "call the doctor"},
+                        {"name": "minutes", "type": 4, "value": 30}],
+            "resolved": {"attachments": {"5": {"id": "5", "filename": "scan.pdf",
+                                               "url": "https://cdn.example/scan.pdf"}}},
+        },
+        "message": {
+            "id": "2",
+            "embeds": [{"title": "Private", "description": "details",
+                        "fields": [{"name": "a", "value": "b"}], "footer": {"text": "me"}}],
+            "attachments": [{"id": "6", "filename": "photo.png", "url": "https://cdn.example/photo.png",
+                             "proxy_url": "https://media.example/photo.png"}],
+        },
+    })
+    recorder.close()
+
+    [(_, event, data)] = list(read_recording(path))
+    assert data["data"]["name"] == "remind"
+    assert [(option["name"], option["value"]) for option in data["data"]["options"]] == [("text", ""), ("minutes", None)]
+    assert data["data"]["resolved"]["attachments"]["5"] == {"id": "5", "filename": "", "url": ""}
+    assert data["message"]["embeds"] == [{"title": "", "description": "", "fields": None, "footer": {"text": ""}}]
+    assert data["message"]["attachments"] == [{"id": "6", "filename": "", "url": "", "proxy_url": ""}]
@@ -0,0 +1,40 @@
+import asyncio
+import types
+
+import pytest
+
+import src.bot.core.ingest as ingest_module
+from src.bot.core.ingest import MemberIngestor
+from src.bot.utils.database import merge_query
+
+
+class FailingDatabase:
+    async def bulk_upsert(self, *args, **kwargs):
+        # Long enough for the fetch to fill the queue
+        await asyncio.sleep(0.01)
+        raise RuntimeError("merge failed")
+
+
+def make_guild(members: int):
+    people = [types.SimpleNamespace(id=index, name=f"user {index}") for index in range(members)]
+    return types.SimpleNamespace(id=1, chunked=True, members=people)
+
+
+def test_failed_write_does_not_leave_the_fetch_task_behind(monkeypatch):
+    monkeypatch.setattr(ingest_module, "db", FailingDatabase())
+
+    async def scenario():
+        ingestor = MemberIngestor(bot=None, chunk_size=10, queue_chunks=1)
+        with pytest.raises(RuntimeError):
+            await ingestor.ingest_members(make_guild(100))
+        await asyncio.sleep(0)
+        return [task.get_name() for task in asyncio.all_tasks() if task.get_name().startswith("member-fetch")]
+
+    assert asyncio.run(asyncio.wait_for(scenario(), 5)) == []
+
+
+def test_merge_query_only_sets_the_timestamp_column_when_given():
+    plain = merge_query("xp", "xp_staging", ("user_id",), ("points",))
+    stamped = merge_query("users", "users_staging", ("user_id",), ("username",), "updated_at")
+    assert "updated_at" not in plain
+    assert "updated_at = CURRENT_TIMESTAMP" in stamped
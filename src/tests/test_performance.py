@@ -0,0 +1,30 @@
+import gc
+
+from src.bot.utils.performance import RuntimeProfile
+
+
+def test_unfreeze_releases_frozen_objects(monkeypatch):
+    monkeypatch.setenv("PERFORMANCE_PROFILE", "true")
+    profile = RuntimeProfile()
+    try:
+        profile.freeze()
+        assert profile.frozen > 0
+        assert gc.get_freeze_count() > 0
+
+        profile.unfreeze("reloading plugin test")
+        assert profile.frozen == 0
+        assert gc.get_freeze_count() == 0
+
+        # A later freeze() would pin the reloaded modules again
+        profile.freeze()
+        assert gc.get_freeze_count() == 0
+    finally:
+        gc.unfreeze()
+
+
+def test_freeze_is_off_without_the_profile(monkeypatch):
+    monkeypatch.delenv("PERFORMANCE_PROFILE", raising=False)
+    profile = RuntimeProfile()
+    profile.freeze()
+    assert profile.frozen == 0
+    assert gc.get_freeze_count() == 0
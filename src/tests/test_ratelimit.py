@@ -0,0 +1,17 @@
+from src.bot.utils.ratelimit import Bucket, RateLimit, RateLimiter
+
+
+def test_full_burst_is_allowed_despite_float_rounding():
+    # 30 / 7 does not add up to exactly 30 again
+    for rate, per in ((7, 30.0), (3, 1.0), (10, 0.7)):
+        bucket = Bucket(RateLimit(rate, per))
+        assert [bucket.hit("user", now=100.0) for _ in range(rate)] == [0.0] * rate
+        assert bucket.hit("user", now=100.0) > 0
+
+
+def test_limiter_check_allows_the_full_burst():
+    limiter = RateLimiter(sweep_interval=1.0)
+    bucket = limiter.bucket(("plugin", "command", "user"), RateLimit(7, 30.0))
+    results = [limiter.check([(bucket, 1)]) for _ in range(8)]
+    assert results[:7] == [0.0] * 7
+    assert results[7] > 0 and limiter.throttled == 1
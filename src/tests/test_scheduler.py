@@ -0,0 +1,138 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from src.bot.core.scheduler import CronSchedule, Job, Scheduler
+
+
+def utc(*args) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_cron_next_after():
+    assert CronSchedule("*/15 * * * *").next_after(utc(2024, 1, 1, 10, 7, 30)) == utc(2024, 1, 1, 10, 15)
+    # Strictly after a matching minute
+    assert CronSchedule("0 9 * * *").next_after(utc(2024, 1, 1, 9, 0)) == utc(2024, 1, 2, 9, 0)
+    # Weekdays only: Saturday 2024-01-06 rolls to Monday
+    assert CronSchedule("0 9 * * 1-5").next_after(utc(2024, 1, 5, 10, 0)) == utc(2024, 1, 8, 9, 0)
+    assert CronSchedule("@monthly").next_after(utc(2024, 1, 31, 23, 59)) == utc(2024, 2, 1)
+    # Both day fields restricted: either one matches (the 13th, or any Friday)
+    assert CronSchedule("0 0 13 * 5").next_after(utc(2024, 1, 1)) == utc(2024, 1, 5)
+    assert CronSchedule("0 0 29 2 *").next_after(utc(2023, 3, 1)) == utc(2024, 2, 29)
+
+
+def test_cron_rejects_invalid_expressions():
+    for expression in ("* * * *", "60 * * * *", "0 0 30 2 *"):
+        with pytest.raises(ValueError):
+            CronSchedule(expression).next_after(utc(2024, 1, 1))
+
+
+def test_interval_after_a_stall_skips_to_the_next_slot():
+    job = Job("tick", "test", None, interval=10.0)
+    assert job.first_run(100.0) == 110.0
+    assert job.following_run(110.0) == 120.0
+    # Stalled until 145: the missed slots are skipped and the cadence kept
+    assert job.following_run(145.0) == 150.0
+    # Exactly on a slot: that slot has passed
+    assert job.following_run(160.0) == 170.0
+
+
+def test_timer_runs_jobs_in_order_and_drops_cancelled_ones():
+    async def scenario():
+        scheduler = Scheduler()
+        order = []
+
+        def recorder(name):
+            async def callback():
+                order.append(name)
+            return callback
+
+        scheduler.start()
+        scheduler.add(Job("late", "test", recorder("late"), run_at=time.time() + 0.06))
+        scheduler.add(Job("early", "test", recorder("early"), run_at=time.time() + 0.02))
+        cancelled = scheduler.add(Job("cancelled", "test", recorder("cancelled"), run_at=time.time() + 0.04))
+        scheduler.cancel(cancelled)
+        await asyncio.sleep(0.15)
+        await scheduler.stop()
+        return order, scheduler.jobs
+
+    order, jobs = asyncio.run(scenario())
+    assert order == ["early", "late"]
+    # One-shot jobs are forgotten once they ran
+    assert jobs == {}
+
+
+def test_stall_does_not_fire_an_interval_job_twice():
+    async def scenario():
+        scheduler = Scheduler()
+        runs = []
+
+        async def callback():
+            runs.append(time.time())
+
+        scheduler.start()
+        job = scheduler.add(Job("tick", "test", callback, interval=0.1, max_concurrency=2))
+        await asyncio.sleep(0.15)
+        # Block the loop across several slots
+        time.sleep(0.5)
+        await asyncio.sleep(0.02)
+        await scheduler.stop()
+        return job, runs
+
+    job, runs = asyncio.run(scenario())
+    assert job.skipped == 0
+    assert len(runs) == 2
+
+
+class FakeJobStore:
+    def __init__(self, job_id):
+        self.rows = {job_id}
+
+    async def fetchval(self, query, job_id):
+        if job_id in self.rows:
+            self.rows.discard(job_id)
+            return job_id
+        return None
+
+    async def execute(self, query, job_id, *args):
+        self.rows.add(job_id)
+
+
+def test_persisted_runs_survive_cancel_and_are_restored_on_stop(monkeypatch):
+    import src.bot.core.scheduler as scheduler_module
+
+    async def scenario():
+        scheduler = Scheduler()
+        store = FakeJobStore("a")
+        monkeypatch.setattr(scheduler_module, "db", store)
+        started, release = asyncio.Event(), asyncio.Event()
+        done = []
+
+        async def handler(payload):
+            started.set()
+            await release.wait()
+            done.append(payload)
+
+        scheduler.start()
+        job = scheduler.add(Job("remind", "test", handler, run_at=time.time(), job_id="a",
+                                payload=1, persisted=True))
+        await started.wait()
+        # Plugin unload: the claimed run keeps going
+        scheduler.cancel(job)
+        release.set()
+        await asyncio.sleep(0.01)
+        assert done == [1] and store.rows == set()
+
+        store.rows.add("b")
+        release.clear()
+        started.clear()
+        scheduler.add(Job("remind", "test", handler, run_at=time.time(), job_id="b", payload=2, persisted=True))
+        await started.wait()
+        # Shutdown mid-run: the row is stored again
+        await scheduler.stop()
+        return done, store.rows
+
+    done, rows = asyncio.run(scenario())
+    assert done == [1] and rows == {"b"}
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from src.bot.utils.database import Database
+from src.bot.utils.sqlite_backend import is_read_only
+
+
+def test_only_read_only_statements_go_to_the_readers():
+    assert is_read_only("SELECT prefix FROM guilds WHERE guild_id = $1")
+    assert is_read_only("WITH recent AS (SELECT * FROM users) SELECT count(*) FROM recent")
+    assert is_read_only("SELECT 'delete me' AS label")
+    assert not is_read_only("WITH old AS (SELECT user_id FROM users) DELETE FROM users WHERE user_id IN "
+                            "(SELECT user_id FROM old) RETURNING user_id")
+    assert not is_read_only("INSERT INTO users (user_id) VALUES ($1) RETURNING user_id")
+
+
+def test_writer_survives_a_failing_batch(tmp_path, monkeypatch):
+    async def scenario():
+        monkeypatch.setenv("DB_SQLITE_PATH", str(tmp_path / "test.db"))
+        database = Database("sqlite")
+        assert await database.connect()
+        try:
+            backend = database.backend
+            commit_batch = backend._commit_batch
+
+            async def broken(batch):
+                raise OSError("disk I/O error")
+
+            backend._commit_batch = broken
+            with pytest.raises(OSError):
+                await asyncio.wait_for(database.execute("CREATE TABLE t (id INTEGER)"), 5)
+
+            backend._commit_batch = commit_batch
+            await asyncio.wait_for(database.execute("CREATE TABLE t (id INTEGER)"), 5)
+            # A CTE that writes must run on the writer, not a read-only connection
+            return await database.fetch("WITH new (id) AS (VALUES (1), (2)) INSERT INTO t SELECT id FROM new RETURNING id")
+        finally:
+            await database.close()
+
+    assert sorted(row[0] for row in asyncio.run(scenario())) == [1, 2]
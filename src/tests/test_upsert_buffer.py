@@ -0,0 +1,138 @@
+import asyncio
+
+from src.bot.utils.database import Database, DatabaseUnavailable
+
+
+async def open_database(tmp_path, monkeypatch) -> Database:
+    monkeypatch.setenv("DB_SQLITE_PATH", str(tmp_path / "test.db"))
+    database = Database("sqlite")
+    assert await database.connect()
+    await database.execute(
+        "CREATE TABLE xp (guild_id BIGINT, user_id BIGINT, points INTEGER NOT NULL CHECK (points >= 0), "
+        "PRIMARY KEY (guild_id, user_id))"
+    )
+    return database
+
+
+def test_bad_rows_are_dropped_and_the_rest_written(tmp_path, monkeypatch):
+    async def scenario():
+        database = await open_database(tmp_path, monkeypatch)
+        try:
+            # No timestamp column on this table
+            buffer = database.buffer("xp", ("guild_id", "user_id"), ("points",))
+            for user_id in range(10):
+                buffer.add(1, user_id, -1 if user_id == 3 else user_id)
+            written = await buffer.flush()
+            stored = await database.fetchval("SELECT count(*) FROM xp")
+            return written, stored, buffer.stats()
+        finally:
+            await database.close()
+
+    written, stored, stats = asyncio.run(scenario())
+    assert written == stored == 9
+    assert stats["dropped"] == 1 and stats["pending"] == 0
+
+
+def test_outage_keeps_rows_up_to_max_pending(tmp_path, monkeypatch):
+    async def scenario():
+        database = await open_database(tmp_path, monkeypatch)
+        try:
+            buffer = database.buffer("xp", ("guild_id", "user_id"), ("points",))
+            buffer.max_pending = 15
+            executemany = database.executemany
+
+            async def unavailable(*args, **kwargs):
+                raise DatabaseUnavailable("down")
+
+            database.executemany = unavailable
+            for user_id in range(20):
+                buffer.add(1, user_id, user_id)
+            assert await buffer.flush() == 0
+            assert len(buffer) == 15 and buffer.dropped == 5
+
+            database.executemany = executemany
+            assert await buffer.flush() == 15
+            # The oldest rows were the ones dropped
+            return await database.fetchval("SELECT min(user_id) FROM xp")
+        finally:
+            await database.close()
+
+    assert asyncio.run(scenario()) == 5
+
+
+def test_unchanged_rows_keep_their_cache_entry(tmp_path, monkeypatch):
+    async def scenario():
+        database = await open_database(tmp_path, monkeypatch)
+        try:
+            await database.init_tables()
+            users = database.entity("users", "user_id", ("username",))
+            buffer = database.buffer("users", ("user_id",), ("username",), timestamp_column="updated_at")
+            buffer.add(1, "mizuki")
+            await buffer.flush()
+            assert (await users.get(1))["username"] == "mizuki"
+
+            buffer.add(1, "mizuki")
+            await buffer.flush()
+            unchanged = 1 in users
+
+            buffer.add(1, "renamed")
+            await buffer.flush()
+            return unchanged, 1 in users, (await users.get(1))["username"]
+        finally:
+            await database.close()
+
+    unchanged, cached_after_rename, username = asyncio.run(scenario())
+    assert unchanged and not cached_after_rename
+    assert username == "renamed"
+
+
+def test_outage_drops_the_least_recently_written_rows(tmp_path, monkeypatch):
+    async def scenario():
+        database = await open_database(tmp_path, monkeypatch)
+        try:
+            buffer = database.buffer("xp", ("guild_id", "user_id"), ("points",))
+            buffer.max_pending = 2
+
+            async def unavailable(*args, **kwargs):
+                raise DatabaseUnavailable("down")
+
+            database.executemany = unavailable
+            # Written in this order: the smallest key is the newest row
+            for user_id in (3, 2, 1):
+                buffer.add(1, user_id, user_id)
+            await buffer.flush()
+            return sorted(key[1] for key in buffer._pending)
+        finally:
+            await database.close()
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_cancelled_flush_keeps_its_rows(tmp_path, monkeypatch):
+    async def scenario():
+        database = await open_database(tmp_path, monkeypatch)
+        try:
+            buffer = database.buffer("xp", ("guild_id", "user_id"), ("points",))
+            executemany = database.executemany
+            started = asyncio.Event()
+
+            async def slow(*args, **kwargs):
+                started.set()
+                await asyncio.sleep(10)
+
+            database.executemany = slow
+            for user_id in range(5):
+                buffer.add(1, user_id, user_id)
+            flush = asyncio.create_task(buffer.flush())
+            await started.wait()
+            flush.cancel()
+            await asyncio.gather(flush, return_exceptions=True)
+            assert len(buffer) == 5
+
+            database.executemany = executemany
+            await buffer.close()
+            return await database.fetchval("SELECT count(*) FROM xp")
+        finally:
+            await database.close()
+
+    assert asyncio.run(scenario()) == 5